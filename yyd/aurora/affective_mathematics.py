@@ -11,11 +11,15 @@ Mathematical Foundation:
 Distance metric: d(s₁, s₂) = ||s₁ - s₂|| = √[(v₁-v₂)² + (a₁-a₂)² + (d₁-d₂)²]
 """
 
+import os
 import numpy as np
-from typing import Dict, Tuple, List, Optional
+from typing import Any, Dict, Tuple, List, Optional, Union
 from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
 import re
 
+from lexicon_store import VADLexiconStore, load_lexicon_store
+
 @dataclass
 class AffectiveState:
     """Represents an emotional state in ℝ³"""
@@ -106,6 +110,511 @@ INTENSIFIERS = {
 
 NEGATIONS = ["not", "no", "never", "neither", "nor", "não", "nunca", "jamais", "tampoco"]
 
+TOKEN_PATTERN = re.compile(r'\b\w+\b')
+
+# Multi-word expressions (tokenized with TOKEN_PATTERN, so "can't" → "can t")
+AFFECT_PHRASES = {
+    # English
+    "can't wait": (0.8, 0.9, 0.6),
+    "looking forward": (0.7, 0.6, 0.6),
+    "fed up": (-0.7, 0.6, 0.4),
+    "let down": (-0.6, 0.4, 0.3),
+    "freaked out": (-0.6, 0.8, 0.2),
+    "in a bad mood": (-0.5, 0.5, 0.4),
+    "in a good mood": (0.6, 0.5, 0.6),
+    
+    # Portuguese
+    "muito mal": (-0.7, 0.5, 0.3),
+    "não vejo a hora": (0.8, 0.9, 0.6),
+    "de mau humor": (-0.6, 0.6, 0.4),
+    "de bom humor": (0.6, 0.5, 0.6),
+    "com medo": (-0.6, 0.7, 0.2),
+    "de saco cheio": (-0.7, 0.6, 0.4),
+    
+    # Spanish
+    "muy mal": (-0.7, 0.5, 0.3),
+    "de mal humor": (-0.6, 0.6, 0.4),
+    "de buen humor": (0.6, 0.5, 0.6),
+    "con miedo": (-0.6, 0.7, 0.2),
+    "me encanta": (0.8, 0.6, 0.6),
+    "tengo ganas": (0.7, 0.7, 0.6),
+}
+
+NEGATION_PHRASES = [
+    "don't", "doesn't", "didn't", "isn't", "aren't", "wasn't", "weren't",
+    "won't", "can't", "couldn't", "wouldn't", "no longer",
+    "ya no", "já não", "de jeito nenhum",
+]
+
+INTENSIFIER_PHRASES = {
+    "so much": 1.3,
+    "a bit": 0.8,
+    "a little": 0.8,
+    "kind of": 0.8,
+    "sort of": 0.8,
+    "um pouco": 0.8,
+    "un poco": 0.8,
+}
+
+# Emphasis that follows the negated emotion it modifies ("not happy at all")
+POST_INTENSIFIERS = {
+    "at all": 1.3,
+    "nem um pouco": 1.3,
+    "para nada": 1.3,
+    "en absoluto": 1.3,
+}
+
+# Negation reaches this many units (words or phrases) forward
+NEGATION_SCOPE = int(os.getenv("AURORA_NEGATION_SCOPE", "2"))
+
+# Base confidence for a lexicon match
+LEXICON_MATCH_CONFIDENCE = 0.8
+
+# Smoothing factor for the per-conversation EMA of valence
+TRAJECTORY_EMA_ALPHA = float(os.getenv("AURORA_TRAJECTORY_EMA_ALPHA", "0.4"))
+
+# Emotion classification grid cells per axis (resolution³ cells)
+PROTOTYPE_GRID_RESOLUTION = int(os.getenv("AURORA_EMOTION_GRID_RESOLUTION", "16"))
+
+# Batch analysis: fan out to a process pool above this many texts
+BATCH_PROCESS_POOL_THRESHOLD = int(os.getenv("AURORA_AFFECT_BATCH_POOL_THRESHOLD", "20000"))
+BATCH_PROCESS_POOL_WORKERS = int(os.getenv("AURORA_AFFECT_BATCH_WORKERS", str(min(os.cpu_count() or 1, 4))))
+
+
+class CompiledLexicon:
+    """
+    Lexicon compiled once into contiguous arrays
+    
+    Every known token (emotion word, intensifier, negation) gets an integer
+    code. Per-code tables hold the VAD row index, intensifier multiplier and
+    negation flag, so a message is scored with array gathers instead of
+    per-word dict lookups and np.clip calls.
+    
+    Tokens unknown to the built-in tables are looked up in the optional
+    memory-mapped VADLexiconStore and encoded as size + store row.
+    
+    Multi-word phrases live in a token trie. encode() walks the token stream
+    once, collapsing the longest phrase match at each position into a single
+    unit code, so scoring treats "can t wait" like one emotion word and
+    "don t" like one negation.
+    """
+    
+    def __init__(self, lexicon: Dict[str, Tuple[float, float, float]],
+                 intensifiers: Dict[str, float], negations: List[str],
+                 store: Optional[VADLexiconStore] = None,
+                 phrases: Optional[Dict[str, Tuple[float, float, float]]] = None,
+                 negation_phrases: Optional[List[str]] = None,
+                 intensifier_phrases: Optional[Dict[str, float]] = None,
+                 post_intensifiers: Optional[Dict[str, float]] = None,
+                 negation_scope: int = NEGATION_SCOPE):
+        self.store = store  # Optional large memory-mapped lexicon
+        self.negation_scope = negation_scope
+        
+        # Phrases are keyed by their space-joined tokens
+        key = lambda phrase: " ".join(TOKEN_PATTERN.findall(phrase.lower()))
+        emotions = dict(lexicon)
+        emotions.update({key(p): vad for p, vad in (phrases or {}).items()})
+        intensifiers = {**intensifiers, **{key(p): f for p, f in (intensifier_phrases or {}).items()}}
+        negations = list(negations) + [key(p) for p in negation_phrases or []]
+        post = {key(p): f for p, f in (post_intensifiers or {}).items()}
+        
+        self.words = list(emotions)
+        # VAD rows in lexicon order (row i ↔ self.words[i])
+        self.vad = np.array([emotions[w] for w in self.words], dtype=np.float64).reshape(-1, 3)
+        
+        # Code 0 = unknown token
+        vocabulary = list(dict.fromkeys(self.words + list(intensifiers) + negations + list(post)))
+        self.codes = {token: i + 1 for i, token in enumerate(vocabulary)}
+        
+        size = len(vocabulary) + 1
+        self.size = size  # Codes >= size index the external store (code - size)
+        self.row = np.full(size, -1, dtype=np.int64)
+        self.multiplier = np.ones(size, dtype=np.float64)
+        self.post_multiplier = np.ones(size, dtype=np.float64)
+        self.negation = np.zeros(size, dtype=bool)
+        
+        for i, word in enumerate(self.words):
+            self.row[self.codes[word]] = i
+        for word, factor in intensifiers.items():
+            self.multiplier[self.codes[word]] = factor
+        for word in negations:
+            self.negation[self.codes[word]] = True
+        for word, factor in post.items():
+            self.post_multiplier[self.codes[word]] = factor
+        
+        # Token trie of multi-word entries: node[token] → child, node[None] → code
+        self.trie: Dict = {}
+        for entry in vocabulary:
+            tokens = entry.split(" ")
+            if len(tokens) < 2:
+                continue
+            node = self.trie
+            for token in tokens:
+                node = node.setdefault(token, {})
+            node[None] = self.codes[entry]
+        
+        # Plain-list copies of the per-code tables for the scalar path
+        self._row_list = self.row.tolist()
+        self._vad_list = [tuple(r) for r in self.vad.tolist()]
+        self._multiplier_list = self.multiplier.tolist()
+        self._post_multiplier_list = self.post_multiplier.tolist()
+        self._negation_list = self.negation.tolist()
+    
+    def units(self, tokens: List[str]) -> Tuple[List[int], List[str]]:
+        """Unit codes (0 = unknown) and their first tokens, phrases collapsed"""
+        get = self.codes.get
+        codes = [get(t, 0) for t in tokens]
+        if self.trie.keys().isdisjoint(tokens):
+            return codes, tokens
+        matches = self._match_phrases(tokens)
+        if not matches:
+            return codes, tokens
+        
+        # Splice each phrase match into a single unit
+        unit_codes, units, i = [], [], 0
+        for start, end, code in matches:
+            unit_codes += codes[i:start]
+            units += tokens[i:start]
+            unit_codes.append(code)
+            units.append(tokens[start])
+            i = end
+        return unit_codes + codes[i:], units + tokens[i:]
+    
+    def encode(self, tokens: List[str]) -> np.ndarray:
+        """Map tokens to unit codes (0 = unknown), collapsing phrases"""
+        unit_codes, units = self.units(tokens)
+        codes = np.array(unit_codes, dtype=np.int64)
+        
+        # Built-in words take precedence; remaining tokens go to the store
+        if self.store is not None:
+            unknown = np.flatnonzero(codes == 0)
+            if len(unknown):
+                found = self.store.lookup([units[i] for i in unknown])
+                hit = found >= 0
+                codes[unknown[hit]] = self.size + found[hit]
+        return codes
+    
+    def _match_phrases(self, tokens: List[str]) -> List[Tuple[int, int, int]]:
+        """Single left-to-right pass; longest trie match wins at each position"""
+        matches = []
+        trie = self.trie
+        i, n = 0, len(tokens)
+        while i < n:
+            node = trie.get(tokens[i])
+            if node is None:
+                i += 1
+                continue
+            
+            match_code, match_end = None, i
+            j = i
+            while node is not None:
+                code = node.get(None)
+                if code is not None:
+                    match_code, match_end = code, j + 1
+                j += 1
+                if j >= n:
+                    break
+                node = node.get(tokens[j])
+            
+            if match_code is not None:
+                matches.append((i, match_end, match_code))
+                i = match_end
+            else:
+                i += 1
+        return matches
+    
+    def score_message(self, tokens: List[str]) -> List[Tuple[float, float, float]]:
+        """
+        VAD rows of one message's emotion units, modifiers applied
+        
+        A chat message has a handful of tokens and one or two matches, so
+        per-call array overhead would dominate: without a store this walks
+        the matched units in plain Python (same rules as _modify). Batches
+        and store lookups use the array path.
+        """
+        if self.store is not None:
+            vad = self.score(self.encode(tokens))
+            return [] if vad is None else [tuple(r) for r in vad.tolist()]
+        
+        codes, _ = self.units(tokens)
+        row, vad_rows = self._row_list, self._vad_list
+        negation, scope = self._negation_list, self.negation_scope
+        multiplier, post_multiplier = self._multiplier_list, self._post_multiplier_list
+        n = len(codes)
+        scored = []
+        for i, code in enumerate(codes):
+            r = row[code]
+            if r < 0:
+                continue
+            v, a, d = vad_rows[r]
+            factor = multiplier[codes[i - 1]] if i else 1.0
+            if any(negation[codes[j]] for j in range(max(0, i - scope), i)):
+                v = -v
+                if i + 1 < n:
+                    factor *= post_multiplier[codes[i + 1]]
+            v, a, d = v * factor, a * factor, d * factor
+            scored.append((min(max(v, -1.0), 1.0), min(max(a, 0.0), 1.0), min(max(d, 0.0), 1.0)))
+        return scored
+    
+    def score(self, codes: np.ndarray) -> Optional[np.ndarray]:
+        """
+        VAD rows for emotion tokens with negation/intensifier applied
+        
+        Negation looks back negation_scope units, intensifiers 1 unit
+        (post-intensifiers apply to the unit before them).
+        Returns (k, 3) array or None if no emotion token matched.
+        """
+        matched, vad = self.score_tokens(codes)
+        return vad if len(vad) else None
+    
+    def score_tokens(self, codes: np.ndarray,
+                     positions: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score a flat token stream, possibly holding several messages
+        
+        `positions` is each unit's index within its own message, so
+        negation/intensifier look-back never crosses a message boundary.
+        Returns (matched mask (n,), VAD rows (k, 3) of the matched tokens).
+        """
+        external = codes >= self.size
+        if external.any():
+            return self._score_with_store(codes, positions, external)
+        
+        rows = self.row[codes]
+        matched = rows >= 0
+        if not matched.any():
+            return matched, np.empty((0, 3), dtype=np.float64)
+        
+        vad = self.vad[rows[matched]]  # gather (k, 3) copy
+        return matched, self._modify(vad, matched, self.negation[codes], self.multiplier[codes],
+                                     self.post_multiplier[codes], positions)
+    
+    def _score_with_store(self, codes: np.ndarray, positions: Optional[np.ndarray],
+                          external: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """score_tokens for streams containing store codes"""
+        builtin_codes = np.where(external, 0, codes)
+        rows = self.row[builtin_codes]
+        matched = (rows >= 0) | external
+        
+        vad = np.empty((int(matched.sum()), 3), dtype=np.float64)
+        from_store = external[matched]
+        vad[~from_store] = self.vad[rows[matched & ~external]]
+        vad[from_store] = self.store.vad[codes[external] - self.size]  # float16 → float64
+        
+        # Modifiers are built-in only (code 0 has multiplier 1, no negation)
+        return matched, self._modify(vad, matched, self.negation[builtin_codes],
+                                     self.multiplier[builtin_codes],
+                                     self.post_multiplier[builtin_codes], positions)
+    
+    def _modify(self, vad: np.ndarray, matched: np.ndarray, negation: np.ndarray,
+                multiplier: np.ndarray, post_multiplier: np.ndarray,
+                positions: Optional[np.ndarray]) -> np.ndarray:
+        """Apply negation scope and intensifiers (before/after), then clip"""
+        n = len(matched)
+        negated = np.zeros(n, dtype=bool)
+        intensity = np.ones(n, dtype=np.float64)
+        for k in range(1, min(self.negation_scope, n - 1) + 1):
+            if positions is None:
+                negated[k:] |= negation[:-k]
+            else:
+                negated[k:] |= negation[:-k] & (positions[k:] >= k)
+        if n > 1:
+            # Post-intensifiers ("at all", "para nada") only emphasize negated units
+            if positions is None:
+                intensity[1:] = multiplier[:-1]
+                intensity[:-1] *= np.where(negated[:-1], post_multiplier[1:], 1.0)
+            else:
+                same_message = positions[1:] >= 1
+                intensity[1:] = np.where(same_message, multiplier[:-1], 1.0)
+                intensity[:-1] *= np.where(same_message & negated[:-1], post_multiplier[1:], 1.0)
+        
+        vad[negated[matched], 0] *= -1.0
+        vad *= intensity[matched, None]
+        np.clip(vad, [-1.0, 0.0, 0.0], [1.0, 1.0, 1.0], out=vad)
+        return vad
+
+
+class PrototypeIndex:
+    """
+    Exact nearest-prototype lookup on a quantized 3-D grid
+    
+    The VAD box is split into resolution³ cells. For every cell we keep only
+    the prototypes that can be nearest to some point inside it: prototype p
+    is a candidate if its minimum distance to the cell is not larger than the
+    smallest maximum distance of any prototype to the cell. A query then
+    compares against a handful of candidates instead of the whole lexicon.
+    
+    Candidates are stored in lexicon order and argmin keeps the first
+    minimum; near-ties are re-decided with the original scalar formula, so
+    results match the linear scan exactly. Points outside the grid box fall
+    back to a full vectorized scan.
+    """
+    
+    # Valid affective domain: v ∈ [-1, 1], a, d ∈ [0, 1]
+    DOMAIN_LOW = np.array([-1.0, 0.0, 0.0])
+    DOMAIN_HIGH = np.array([1.0, 1.0, 1.0])
+    
+    def __init__(self, prototypes: Dict[str, Tuple[float, float, float]],
+                 resolution: int = PROTOTYPE_GRID_RESOLUTION):
+        self.labels = list(prototypes)
+        self.vectors = np.array([prototypes[w] for w in self.labels], dtype=np.float64).reshape(-1, 3)
+        self.resolution = resolution
+        
+        if len(self.labels) == 0:
+            self.low, self.high = self.DOMAIN_LOW, self.DOMAIN_HIGH
+            self.cell_size = (self.high - self.low) / resolution
+            self.candidates = np.full((resolution ** 3, 1), -1, dtype=np.int64)
+            return
+        
+        # Duplicate VAD rows can never win over their first occurrence
+        _, first = np.unique(self.vectors, axis=0, return_index=True)
+        self.distinct = np.sort(first)
+        
+        self.low = np.minimum(self.vectors.min(axis=0), self.DOMAIN_LOW)
+        self.high = np.maximum(self.vectors.max(axis=0), self.DOMAIN_HIGH)
+        self.cell_size = (self.high - self.low) / resolution
+        self.candidates = self._build_candidates()
+        
+        # Unpadded per-cell candidates + their vectors for the single-point path
+        self._cell_candidates = [row[row >= 0] for row in self.candidates]
+        self._cell_points = [
+            [(int(k), *self.vectors[k].tolist()) for k in row]
+            for row in self._cell_candidates
+        ]
+        self._low = self.low.tolist()
+        self._high = self.high.tolist()
+        self._inv_cell = (1.0 / self.cell_size).tolist()
+    
+    def _build_candidates(self, chunk: int = 2048) -> np.ndarray:
+        """(cells, width) candidate table, padded with -1"""
+        r = self.resolution
+        cells = np.indices((r, r, r)).reshape(3, -1).T  # C-order cell ids
+        vectors = self.vectors[self.distinct]
+        per_cell: List[np.ndarray] = []
+        
+        for start in range(0, len(cells), chunk):
+            box_low = self.low + cells[start:start + chunk] * self.cell_size
+            box_high = box_low + self.cell_size
+            lo = box_low[:, None, :] - vectors[None, :, :]
+            hi = vectors[None, :, :] - box_high[:, None, :]
+            
+            gap = np.maximum(np.maximum(lo, hi), 0.0)
+            min_d2 = (gap * gap).sum(axis=2)
+            far = np.maximum(np.abs(lo), np.abs(box_high[:, None, :] - vectors[None, :, :]))
+            max_d2 = (far * far).sum(axis=2)
+            
+            # Small slack so floating-point rounding never prunes the true nearest
+            bound = max_d2.min(axis=1, keepdims=True) * (1 + 1e-9) + 1e-12
+            per_cell.extend(self.distinct[np.flatnonzero(row)] for row in (min_d2 <= bound))
+        
+        width = max(len(c) for c in per_cell)
+        table = np.full((len(per_cell), width), -1, dtype=np.int64)
+        for i, candidates in enumerate(per_cell):
+            table[i, :len(candidates)] = candidates
+        return table
+    
+    def nearest_one(self, point: np.ndarray) -> int:
+        """Index of the nearest prototype for a single point (-1 if empty)"""
+        if len(self.labels) == 0:
+            return -1
+        
+        x, y, z = (float(c) for c in point[:3])
+        coords = (x, y, z)
+        cell = 0
+        for axis in range(3):
+            if not self._low[axis] <= coords[axis] <= self._high[axis]:
+                return int(self.nearest(point)[0])  # Outside grid: full scan
+            cell = cell * self.resolution + min(int((coords[axis] - self._low[axis]) * self._inv_cell[axis]),
+                                                self.resolution - 1)
+        
+        # Few candidates per cell: plain float arithmetic beats array overhead
+        best_k, best_d2, runner_up = -1, float('inf'), float('inf')
+        for k, v, a, d in self._cell_points[cell]:
+            d2 = (x - v) ** 2 + (y - a) ** 2 + (z - d) ** 2
+            if d2 < best_d2:
+                best_k, best_d2, runner_up = k, d2, best_d2
+            elif d2 < runner_up:
+                runner_up = d2
+        
+        if runner_up <= best_d2 * (1 + 1e-12) + 1e-15:
+            candidates = self._cell_candidates[cell]
+            return int(candidates[self._scalar_argmin(np.asarray(point[:3], dtype=np.float64), candidates)])
+        return best_k
+    
+    def nearest(self, points: np.ndarray, chunk: int = 8192) -> np.ndarray:
+        """Index of the nearest prototype for each (N, 3) point (-1 if empty)"""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        result = np.full(len(points), -1, dtype=np.int64)
+        if len(self.labels) == 0 or len(points) == 0:
+            return result
+        
+        inside = np.all((points >= self.low) & (points <= self.high), axis=1)
+        
+        # Grid path: gather candidates of each point's cell
+        grid_idx = np.flatnonzero(inside)
+        for start in range(0, len(grid_idx), chunk):
+            idx = grid_idx[start:start + chunk]
+            cell = np.minimum(((points[idx] - self.low) / self.cell_size).astype(np.int64),
+                              self.resolution - 1)
+            flat = (cell[:, 0] * self.resolution + cell[:, 1]) * self.resolution + cell[:, 2]
+            candidates = self.candidates[flat]
+            result[idx] = self._argmin(points[idx], candidates)
+        
+        # Fallback: full scan for points outside the grid box
+        outside_idx = np.flatnonzero(~inside)
+        all_candidates = self.distinct
+        for start in range(0, len(outside_idx), chunk):
+            idx = outside_idx[start:start + chunk]
+            result[idx] = self._argmin(points[idx], np.broadcast_to(all_candidates, (len(idx), len(all_candidates))))
+        
+        return result
+    
+    def _argmin(self, points: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+        diff = points[:, None, :] - self.vectors[candidates]
+        distances = np.sqrt(np.einsum('nkd,nkd->nk', diff, diff))
+        distances[candidates < 0] = np.inf
+        best = distances.argmin(axis=1)
+        rows = np.arange(len(points))
+        
+        # Near-ties (within rounding): re-decide with the exact scalar formula
+        # of the original scan so results are bit-for-bit identical
+        nearest = distances[rows, best]
+        ties = np.flatnonzero(
+            ((distances <= nearest[:, None] * (1 + 1e-12) + 1e-15) & (candidates >= 0)).sum(axis=1) > 1
+        )
+        for i in ties:
+            best[i] = self._scalar_argmin(points[i], candidates[i])
+        
+        return candidates[rows, best]
+    
+    def _scalar_argmin(self, point: np.ndarray, candidates: np.ndarray) -> int:
+        min_distance = float('inf')
+        best = 0
+        for j, k in enumerate(candidates):
+            if k < 0:
+                break
+            distance = float(np.linalg.norm(point - self.vectors[k]))
+            if distance < min_distance:
+                min_distance = distance
+                best = j
+        return best
+    
+    def classify(self, points: np.ndarray) -> List[str]:
+        """Nearest prototype label per point ("neutral" if no prototypes)"""
+        return [self.labels[i] if i >= 0 else "neutral" for i in self.nearest(points)]
+
+
+# Large external lexicon (AURORA_VAD_LEXICON_PATH) extends the vocabulary;
+# emotion prototypes for classification stay the curated EMOTION_LEXICON
+_DEFAULT_COMPILED = CompiledLexicon(EMOTION_LEXICON, INTENSIFIERS, NEGATIONS,
+                                    store=load_lexicon_store(),
+                                    phrases=AFFECT_PHRASES,
+                                    negation_phrases=NEGATION_PHRASES,
+                                    intensifier_phrases=INTENSIFIER_PHRASES,
+                                    post_intensifiers=POST_INTENSIFIERS)
+_DEFAULT_PROTOTYPES = PrototypeIndex(EMOTION_LEXICON)
+
+
 class AffectiveAnalyzer:
     """Analyzes text and calculates affective state in ℝ³"""
     
@@ -113,6 +622,8 @@ class AffectiveAnalyzer:
         self.lexicon = EMOTION_LEXICON
         self.intensifiers = INTENSIFIERS
         self.negations = NEGATIONS
+        self.compiled = _DEFAULT_COMPILED  # Built once at import
+        self.prototypes = _DEFAULT_PROTOTYPES
     
     def analyze_text(self, text: str, language: str = "en") -> AffectiveState:
         """
@@ -120,61 +631,33 @@ class AffectiveAnalyzer:
         
         Algorithm:
         1. Tokenize and normalize text
-        2. Identify emotion words from lexicon
-        3. Apply intensifiers and negations
+        2. Map tokens to integer codes (multi-word phrases collapse to one
+           unit), look up VAD rows of emotion words/phrases
+        3. Apply intensifier and negation rules (CompiledLexicon.score_message)
         4. Aggregate to single VAD vector
         5. Calculate confidence based on signal strength
         """
-        text_lower = text.lower()
-        words = re.findall(r'\b\w+\b', text_lower)
+        words = TOKEN_PATTERN.findall(text.lower())
         
         if not words:
             return AffectiveState(0.0, 0.0, 0.0, 0.0)
         
-        # Find emotion-bearing words
-        vad_vectors = []
-        confidences = []
-        
-        for i, word in enumerate(words):
-            if word in self.lexicon:
-                v, a, d = self.lexicon[word]
-                
-                # Check for intensifier before word
-                intensifier = 1.0
-                if i > 0 and words[i-1] in self.intensifiers:
-                    intensifier = self.intensifiers[words[i-1]]
-                
-                # Check for negation before word
-                negated = False
-                if i > 0 and words[i-1] in self.negations:
-                    negated = True
-                if i > 1 and words[i-2] in self.negations:
-                    negated = True
-                
-                # Apply negation (flip valence)
-                if negated:
-                    v = -v
-                
-                # Apply intensifier
-                v = np.clip(v * intensifier, -1, 1)
-                a = np.clip(a * intensifier, 0, 1)
-                d = np.clip(d * intensifier, 0, 1)
-                
-                vad_vectors.append((v, a, d))
-                confidences.append(0.8)  # Base confidence for lexicon match
+        # VAD rows for emotion-bearing words (negation/intensity applied)
+        vad = self.compiled.score_message(words)
         
         # No emotional content found - return neutral with low confidence
-        if not vad_vectors:
+        if not vad:
             return self._estimate_baseline_state(text, language)
         
-        # Aggregate VAD vectors (weighted average)
-        v_avg = np.mean([v for v, a, d in vad_vectors])
-        a_avg = np.mean([a for v, a, d in vad_vectors])
-        d_avg = np.mean([d for v, a, d in vad_vectors])
+        # Aggregate VAD vectors
+        k = len(vad)
+        v_avg = sum(row[0] for row in vad) / k
+        a_avg = sum(row[1] for row in vad) / k
+        d_avg = sum(row[2] for row in vad) / k
         
         # Confidence based on signal strength and coverage
-        coverage = len(vad_vectors) / len(words)
-        confidence = np.mean(confidences) * min(coverage * 10, 1.0)
+        coverage = len(vad) / len(words)
+        confidence = LEXICON_MATCH_CONFIDENCE * min(coverage * 10, 1.0)
         
         return AffectiveState(
             valence=float(v_avg),
@@ -183,6 +666,73 @@ class AffectiveAnalyzer:
             confidence=float(confidence)
         )
     
+    def analyze_batch(self, texts: List[str],
+                      languages: Optional[Union[str, List[str]]] = None,
+                      use_process_pool: Optional[bool] = None) -> Tuple[np.ndarray, List[str]]:
+        """
+        Analyze many texts at once
+        
+        All messages are tokenized into one flat code stream and scored with
+        a single pass of array operations; per-message means come from
+        np.bincount over the message index. Inputs of BATCH_PROCESS_POOL_THRESHOLD
+        texts or more are split into chunks and scored in a process pool.
+        
+        Returns:
+            (N, 4) float64 array of [valence, arousal, dominance, confidence]
+            and the classified emotion of each row.
+        """
+        n = len(texts)
+        if languages is None or isinstance(languages, str):
+            languages = [languages or "en"] * n
+        elif len(languages) != n:
+            raise ValueError("languages must have the same length as texts")
+        
+        if n == 0:
+            return np.empty((0, 4), dtype=np.float64), []
+        
+        if use_process_pool is None:
+            use_process_pool = n >= BATCH_PROCESS_POOL_THRESHOLD and BATCH_PROCESS_POOL_WORKERS > 1
+        if use_process_pool:
+            return _analyze_batch_parallel(texts, languages)
+        
+        states = self._score_batch(texts, languages)
+        return states, self.classify_emotions(states)
+    
+    def _score_batch(self, texts: List[str], languages: List[str]) -> np.ndarray:
+        """(N, 4) affective states for a list of texts, in-process"""
+        n = len(texts)
+        token_lists = [TOKEN_PATTERN.findall(text.lower()) for text in texts]
+        token_counts = np.fromiter((len(t) for t in token_lists), dtype=np.int64, count=n)
+        
+        # Encode per message (phrases never span messages), then flatten:
+        # unit stream + message index / position within message
+        unit_codes = [self.compiled.encode(tokens) for tokens in token_lists]
+        lengths = np.fromiter((len(c) for c in unit_codes), dtype=np.int64, count=n)
+        codes = np.concatenate(unit_codes) if n else np.empty(0, dtype=np.int64)
+        message_index = np.repeat(np.arange(n), lengths)
+        starts = np.cumsum(lengths) - lengths
+        positions = np.arange(len(codes)) - np.repeat(starts, lengths)
+        
+        matched, vad = self.compiled.score_tokens(codes, positions)
+        owners = message_index[matched]
+        counts = np.bincount(owners, minlength=n)
+        
+        states = np.zeros((n, 4), dtype=np.float64)
+        has_signal = counts > 0
+        for column in range(3):
+            sums = np.bincount(owners, weights=vad[:, column], minlength=n)
+            states[has_signal, column] = sums[has_signal] / counts[has_signal]
+        
+        coverage = counts[has_signal] / token_counts[has_signal]
+        states[has_signal, 3] = LEXICON_MATCH_CONFIDENCE * np.minimum(coverage * 10, 1.0)
+        
+        # Messages with words but no emotion token get the structural baseline
+        for i in np.flatnonzero(~has_signal & (token_counts > 0)):
+            baseline = self._estimate_baseline_state(texts[i], languages[i])
+            states[i] = (baseline.valence, baseline.arousal, baseline.dominance, baseline.confidence)
+        
+        return states
+    
     def _estimate_baseline_state(self, text: str, language: str) -> AffectiveState:
         """Estimate baseline state from structural features"""
         # Punctuation analysis
@@ -205,22 +755,17 @@ class AffectiveAnalyzer:
     def classify_emotion(self, state: AffectiveState) -> str:
         """
         Map VAD coordinates to emotion category
-        Using distance-based classification in ℝ³
+        Using distance-based classification in ℝ³ (nearest lexicon prototype)
         """
-        min_distance = float('inf')
-        closest_emotion = "neutral"
-        
-        state_vector = state.as_vector()
-        
-        for emotion, (v, a, d) in self.lexicon.items():
-            emotion_vector = np.array([v, a, d])
-            distance = float(np.linalg.norm(state_vector - emotion_vector))
-            
-            if distance < min_distance:
-                min_distance = distance
-                closest_emotion = emotion
-        
-        return closest_emotion
+        index = self.prototypes.nearest_one(state.as_vector())
+        return self.prototypes.labels[index] if index >= 0 else "neutral"
+    
+    def classify_emotions(self, states: np.ndarray) -> List[str]:
+        """Vectorized classify_emotion for an (N, 3+) array of VAD rows"""
+        states = np.asarray(states, dtype=np.float64)
+        if len(states) == 0:
+            return []
+        return self.prototypes.classify(states[:, :3])
     
     def calculate_emotional_trajectory(
         self, states: List[AffectiveState]
@@ -228,6 +773,7 @@ class AffectiveAnalyzer:
         """
         Calculate emotional trajectory metrics
         Useful for conversation flow analysis
+        (live conversations use EmotionalTrajectoryTracker, O(1) per message)
         """
         if len(states) < 2:
             return {
@@ -258,6 +804,119 @@ class AffectiveAnalyzer:
             "valence_trend": float(valence_trend),
         }
 
+def _analyze_batch_chunk(args: Tuple[List[str], List[str]]) -> Tuple[np.ndarray, List[str]]:
+    """Process-pool worker: score one chunk in-process"""
+    texts, languages = args
+    return AffectiveAnalyzer().analyze_batch(texts, languages, use_process_pool=False)
+
+
+def _analyze_batch_parallel(texts: List[str], languages: List[str]) -> Tuple[np.ndarray, List[str]]:
+    """Split a large batch into one contiguous chunk per worker"""
+    workers = max(BATCH_PROCESS_POOL_WORKERS, 1)
+    chunk_size = -(-len(texts) // workers)
+    chunks = [
+        (texts[i:i + chunk_size], languages[i:i + chunk_size])
+        for i in range(0, len(texts), chunk_size)
+    ]
+    
+    with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+        results = list(pool.map(_analyze_batch_chunk, chunks))
+    
+    states = np.concatenate([r[0] for r in results])
+    emotions = [emotion for r in results for emotion in r[1]]
+    return states, emotions
+
+
+class EmotionalTrajectoryTracker:
+    """
+    Online trajectory accumulator for one conversation (O(1) per message)
+    
+    Keeps running sums instead of the state history:
+    - total distance travelled in ℝ³ and Welford mean/M2 of step sizes
+    - EMA of valence (recent mood, α = ema_alpha)
+    - Σx, Σy, Σxx, Σxy for the least-squares valence slope
+    
+    to_dict() returns the same metrics as calculate_emotional_trajectory
+    (total_distance, average_velocity, volatility, valence_trend) plus
+    ema_valence and message_count.
+    """
+    
+    def __init__(self, ema_alpha: float = TRAJECTORY_EMA_ALPHA):
+        self.ema_alpha = ema_alpha
+        self.count = 0
+        self.last: Optional[Tuple[float, float, float]] = None
+        self.total_distance = 0.0
+        self.step_mean = 0.0
+        self.step_m2 = 0.0
+        self.ema_valence = 0.0
+        self.sum_x = 0.0
+        self.sum_y = 0.0
+        self.sum_xx = 0.0
+        self.sum_xy = 0.0
+    
+    def update(self, state: AffectiveState) -> "EmotionalTrajectoryTracker":
+        """Fold one message's state into the trajectory"""
+        current = (state.valence, state.arousal, state.dominance)
+        
+        if self.last is not None:
+            step = float(np.sqrt(sum((c - p) ** 2 for c, p in zip(current, self.last))))
+            self.total_distance += step
+            steps = self.count  # steps after this update
+            delta = step - self.step_mean
+            self.step_mean += delta / steps
+            self.step_m2 += delta * (step - self.step_mean)
+            self.ema_valence += self.ema_alpha * (state.valence - self.ema_valence)
+        else:
+            self.ema_valence = state.valence
+        
+        x = float(self.count)
+        self.sum_x += x
+        self.sum_y += state.valence
+        self.sum_xx += x * x
+        self.sum_xy += x * state.valence
+        
+        self.count += 1
+        self.last = current
+        return self
+    
+    @property
+    def valence_trend(self) -> float:
+        """Least-squares slope of valence over message index"""
+        n = self.count
+        denominator = n * self.sum_xx - self.sum_x ** 2
+        if n < 2 or denominator == 0:
+            return 0.0
+        return (n * self.sum_xy - self.sum_x * self.sum_y) / denominator
+    
+    def to_dict(self) -> Dict[str, float]:
+        steps = self.count - 1
+        return {
+            "total_distance": float(self.total_distance),
+            "average_velocity": float(self.step_mean) if steps > 0 else 0.0,
+            "volatility": float(np.sqrt(self.step_m2 / steps)) if steps > 0 else 0.0,
+            "valence_trend": float(self.valence_trend),
+            "ema_valence": float(self.ema_valence),
+            "message_count": self.count,
+        }
+    
+    def state(self) -> Dict[str, Any]:
+        """Accumulators (JSON-serializable) for persistence in working memory"""
+        return {
+            "count": self.count, "last": list(self.last) if self.last else None,
+            "total_distance": self.total_distance, "step_mean": self.step_mean,
+            "step_m2": self.step_m2, "ema_valence": self.ema_valence,
+            "sum_x": self.sum_x, "sum_y": self.sum_y,
+            "sum_xx": self.sum_xx, "sum_xy": self.sum_xy,
+        }
+    
+    @classmethod
+    def from_state(cls, data: Dict[str, Any]) -> "EmotionalTrajectoryTracker":
+        tracker = cls()
+        for key, value in data.items():
+            if hasattr(tracker, key) and key != "ema_alpha":
+                setattr(tracker, key, tuple(value) if key == "last" and value else value)
+        return tracker
+
 # Predefined emotional targets for Aurora's responses
 AURORA_TARGET_STATES = {
     "welcoming": AffectiveState(0.7, 0.5, 0.6, 1.0),  # Warm, moderate energy
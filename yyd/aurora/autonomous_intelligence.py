@@ -24,6 +24,8 @@ from datetime import datetime
 
 from affective_mathematics import AffectiveState, AffectiveAnalyzer
 from embeddings import EmbeddingsService
+from retrieval import RetrievalEngine
+from keyword_matcher import KeywordMatcher, PREFIX, WHOLE
 
 
 @dataclass
@@ -50,6 +52,20 @@ class ResponseCandidate:
     confidence: float
 
 
+# Famílias de tom em ordem de prioridade (saudação > vendas > empatia > urgência).
+# Saudações só como palavra inteira ("oi" não casa com "noite"/"oito").
+RESPONSE_TONE_KEYWORDS = KeywordMatcher(
+    {
+        'greeting': ['olá', 'oi', 'hello', 'bem-vindo'],
+        'sales': ['reservar', 'book', 'agendar'],
+        'empathetic': ['desculpa', 'sorry', 'compreendo'],
+        'urgent': ['urgente', 'urgent', 'agora'],
+    },
+    boundaries={'greeting': WHOLE},
+    default_boundary=PREFIX,
+)
+
+
 class AutonomousIntelligence:
     """
     Sistema de Inteligência Autônoma Aurora
@@ -70,6 +86,8 @@ class AutonomousIntelligence:
     def __init__(self):
         self.analyzer = AffectiveAnalyzer()
         self.embeddings = EmbeddingsService()
+        # Mesmo motor de recuperação do /chat (backend via AURORA_RETRIEVAL_BACKEND)
+        self.retrieval = RetrievalEngine(embedder=self.embeddings.generate_embedding)
         self.database_url = os.getenv("DATABASE_URL", "")
         self._ensure_memory_tables()
         
@@ -264,11 +282,11 @@ class AutonomousIntelligence:
         candidates = []
         
         # Candidato 1: Base de conhecimento (RAG)
-        kb_results = self.embeddings.semantic_search(
+        kb_results = self.retrieval.search(
             query=query,
-            language=language,
+            locale=language,
             limit=3,
-            similarity_threshold=0.7
+            min_similarity=0.7
         )
         
         if kb_results:
@@ -455,19 +473,8 @@ class AutonomousIntelligence:
         return 0.6
     
     def _detect_response_tone(self, message: str) -> str:
-        """Detecta tom da mensagem"""
-        message_lower = message.lower()
-        
-        if any(word in message_lower for word in ['olá', 'oi', 'hello', 'bem-vindo']):
-            return 'greeting'
-        elif any(word in message_lower for word in ['reservar', 'book', 'agendar']):
-            return 'sales'
-        elif any(word in message_lower for word in ['desculpa', 'sorry', 'compreendo']):
-            return 'empathetic'
-        elif any(word in message_lower for word in ['urgente', 'urgent', 'agora']):
-            return 'urgent'
-        else:
-            return 'informative'
+        """Detecta tom da mensagem (uma passagem, prioridade na ordem das famílias)"""
+        return RESPONSE_TONE_KEYWORDS.first_category(message) or 'informative'
     
     def _generate_openai_fallback(
         self,
@@ -0,0 +1,190 @@
+"""
+Aurora Affective Analyzer Benchmark
+===================================
+
+Compares the compiled AffectiveAnalyzer (scalar single-message path,
+vectorized batches) against the original per-word implementation:
+- Per-message latency (µs) and throughput (messages/s)
+- Maximum absolute difference between both results
+- Emotion classification: linear scan vs. precomputed prototype grid
+
+Usage:
+    python benchmark_affective.py [--messages 20000]
+"""
+
+import argparse
+import random
+import re
+import time
+from typing import List
+
+import numpy as np
+
+from affective_mathematics import (
+    AffectiveAnalyzer, AffectiveState, CompiledLexicon, EMOTION_LEXICON, INTENSIFIERS, NEGATIONS
+)
+
+SAMPLE_MESSAGES = [
+    "Hello! I would like to book a tour to Sintra tomorrow",
+    "I am very happy with the tour, thank you so much!",
+    "Not satisfied at all, the guide was late and I am frustrated",
+    "Olá, estou muito feliz com o passeio",
+    "Estou preocupado com o horário, não estou calmo",
+    "Hola, estoy muy contento y emocionado por el tour",
+    "What time does the Cascais tour start?",
+    "I'm extremely disappointed and really angry about the cancellation",
+    "Quanto custa o tour de Sintra para 4 pessoas?",
+    "We are curious and interested in a private tour, quite excited!",
+]
+
+
+class ReferenceAnalyzer:
+    """Original per-word analyze_text implementation (baseline)"""
+
+    def analyze_text(self, text: str, language: str = "en") -> AffectiveState:
+        text_lower = text.lower()
+        words = re.findall(r'\b\w+\b', text_lower)
+
+        if not words:
+            return AffectiveState(0.0, 0.0, 0.0, 0.0)
+
+        vad_vectors = []
+        confidences = []
+
+        for i, word in enumerate(words):
+            if word in EMOTION_LEXICON:
+                v, a, d = EMOTION_LEXICON[word]
+
+                intensifier = 1.0
+                if i > 0 and words[i-1] in INTENSIFIERS:
+                    intensifier = INTENSIFIERS[words[i-1]]
+
+                negated = False
+                if i > 0 and words[i-1] in NEGATIONS:
+                    negated = True
+                if i > 1 and words[i-2] in NEGATIONS:
+                    negated = True
+
+                if negated:
+                    v = -v
+
+                v = np.clip(v * intensifier, -1, 1)
+                a = np.clip(a * intensifier, 0, 1)
+                d = np.clip(d * intensifier, 0, 1)
+
+                vad_vectors.append((v, a, d))
+                confidences.append(0.8)
+
+        if not vad_vectors:
+            return AffectiveAnalyzer()._estimate_baseline_state(text, language)
+
+        v_avg = np.mean([v for v, a, d in vad_vectors])
+        a_avg = np.mean([a for v, a, d in vad_vectors])
+        d_avg = np.mean([d for v, a, d in vad_vectors])
+
+        coverage = len(vad_vectors) / len(words)
+        confidence = np.mean(confidences) * min(coverage * 10, 1.0)
+
+        return AffectiveState(float(v_avg), float(a_avg), float(d_avg), float(confidence))
+
+    def classify_emotion(self, state: AffectiveState) -> str:
+        min_distance = float('inf')
+        closest_emotion = "neutral"
+        state_vector = state.as_vector()
+        for emotion, (v, a, d) in EMOTION_LEXICON.items():
+            distance = float(np.linalg.norm(state_vector - np.array([v, a, d])))
+            if distance < min_distance:
+                min_distance = distance
+                closest_emotion = emotion
+        return closest_emotion
+
+
+def build_corpus(size: int, seed: int = 42) -> List[str]:
+    rng = random.Random(seed)
+    return [rng.choice(SAMPLE_MESSAGES) for _ in range(size)]
+
+
+def run(analyzer, corpus: List[str]) -> float:
+    started = time.perf_counter()
+    for text in corpus:
+        analyzer.analyze_text(text)
+    return time.perf_counter() - started
+
+
+def random_states(size: int, seed: int = 42) -> List[AffectiveState]:
+    rng = np.random.default_rng(seed)
+    points = np.column_stack([
+        rng.uniform(-1, 1, size), rng.uniform(0, 1, size), rng.uniform(0, 1, size)
+    ])
+    # Include grid-aligned points to exercise exact ties
+    points[::4] = np.round(points[::4] * 10) / 10
+    return [AffectiveState(*p, 1.0) for p in points]
+
+
+def run_classify(analyzer, states: List[AffectiveState]) -> float:
+    started = time.perf_counter()
+    for state in states:
+        analyzer.classify_emotion(state)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark AffectiveAnalyzer")
+    parser.add_argument("--messages", type=int, default=20000)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.messages)
+    reference = ReferenceAnalyzer()
+    compiled = AffectiveAnalyzer()
+
+    # Equivalence check (word-level lexicon only: phrases change scores by design)
+    word_level = AffectiveAnalyzer()
+    word_level.compiled = CompiledLexicon(EMOTION_LEXICON, INTENSIFIERS, NEGATIONS)
+    max_diff = 0.0
+    for text in SAMPLE_MESSAGES:
+        a = reference.analyze_text(text)
+        b = word_level.analyze_text(text)
+        diff = np.abs(np.array([a.valence, a.arousal, a.dominance, a.confidence]) -
+                      np.array([b.valence, b.arousal, b.dominance, b.confidence])).max()
+        max_diff = max(max_diff, float(diff))
+
+    # Warm-up
+    run(reference, corpus[:500])
+    run(compiled, corpus[:500])
+
+    print(f"\n{'='*60}")
+    print(f"📊 Affective Analyzer Benchmark ({len(corpus)} messages)")
+    print(f"{'='*60}")
+    timings = {}
+    for name, analyzer in (("reference", reference), ("compiled", compiled)):
+        elapsed = run(analyzer, corpus)
+        timings[name] = elapsed
+        print(f"  {name:<10} {elapsed / len(corpus) * 1e6:8.2f} µs/msg   "
+              f"{len(corpus) / elapsed:10.0f} msg/s")
+    print(f"  speedup    {timings['reference'] / timings['compiled']:.2f}x")
+    print(f"  max |Δ|    {max_diff:.2e}")
+
+    # Emotion classification
+    states = random_states(min(len(corpus), 20000))
+    mismatches = sum(
+        reference.classify_emotion(s) != compiled.classify_emotion(s) for s in states
+    )
+    batch = np.array([s.as_vector() for s in states])
+    mismatches += sum(
+        reference.classify_emotion(s) != e for s, e in zip(states, compiled.classify_emotions(batch))
+    )
+
+    print(f"\n  classify_emotion ({len(states)} states)")
+    ref_elapsed = run_classify(reference, states)
+    grid_elapsed = run_classify(compiled, states)
+    started = time.perf_counter()
+    compiled.classify_emotions(batch)
+    batch_elapsed = time.perf_counter() - started
+    for name, elapsed in (("reference", ref_elapsed), ("grid", grid_elapsed), ("batch", batch_elapsed)):
+        print(f"  {name:<10} {elapsed / len(states) * 1e6:8.2f} µs/state")
+    print(f"  mismatches {mismatches}")
+    print(f"{'='*60}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+Aurora Retrieval Benchmark
+==========================
+
+Compares the legacy retrieval paths with the unified RetrievalEngine:
+- legacy/knowledge   EmbeddingsService.search_by_embedding (aurora_knowledge)
+- legacy/semantic    SemanticMemory.semantic_search (aurora_semantic_memory)
+- engine/<backend>   RetrievalEngine with each registered backend
+Reports per-query latency (ms, p50/p95), average hits, top-1 similarity and
+top-k content overlap with the legacy path that used the same table.
+
+Query embeddings are generated once up front, so only retrieval is timed.
+
+--recall measures EmbeddingsService.search_by_embedding (ivfflat, per-query
+probes / iterative scan) against an exact scan, unfiltered and filtered by
+language and content_type: recall@k and fill rate (hits / k). Queries are
+perturbed stored embeddings, so no OpenAI calls are needed.
+
+--category-recall does the same for SemanticMemory.semantic_search per
+category and locale (hot categories via partial HNSW indexes, others exact),
+reporting fill against min(k, category size) - filtered searches must not
+lose rows to post-filtering.
+
+Usage:
+    python benchmark_retrieval.py [--rounds 20] [--top-k 5]
+    python benchmark_retrieval.py --recall [--queries 50] [--top-k 10]
+    python benchmark_retrieval.py --category-recall [--queries 20] [--top-k 10]
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from retrieval import BACKENDS, RetrievalEngine, get_backend
+from vector_codec import decode_vector
+
+SAMPLE_QUERIES = [
+    ("What tours include Pena Palace?", "en"),
+    ("Can I cancel my booking?", "en"),
+    ("How much is the Sintra tour for 4 people?", "en"),
+    ("Best places to eat in Sintra?", "en"),
+    ("Quais tours incluem o Palácio da Pena?", "pt"),
+    ("Posso cancelar a minha reserva?", "pt"),
+    ("¿Cuánto cuesta el tour de Cascais?", "es"),
+    ("¿Hay recogida en el hotel?", "es"),
+]
+
+
+def embed_queries(queries: List[Tuple[str, str]]) -> List[Optional[List[float]]]:
+    from rag import EmbeddingGenerator
+    return asyncio.run(EmbeddingGenerator.batch_generate([q for q, _ in queries]))
+
+
+def legacy_knowledge(embedding, locale, top_k) -> List[Tuple[str, float]]:
+    from embeddings import embeddings_service
+    rows = embeddings_service.search_by_embedding(embedding, language=locale, limit=top_k,
+                                                  similarity_threshold=0.0)
+    return [(row["content"], row["similarity"]) for row in rows]
+
+
+def legacy_semantic(embedding, locale, top_k) -> List[Tuple[str, float]]:
+    from memory import SemanticMemory
+    from retrieval import CONTENT_FIELDS
+    rows = SemanticMemory.semantic_search(query_embedding=embedding, locale=locale, limit=top_k) or []
+    field = CONTENT_FIELDS.get(locale, "contentEn")
+    return [(row[field], row["similarity"]) for row in rows]
+
+
+def engine_path(engine: RetrievalEngine) -> Callable:
+    def search(embedding, locale, top_k):
+        return [(hit["content"], hit["similarity"])
+                for hit in engine.vector_search(embedding, locale, None, top_k)]
+    return search
+
+
+def run(search: Callable, cases, top_k: int, rounds: int) -> Dict:
+    latencies = []
+    results = []
+    for _ in range(rounds):
+        results = []
+        for embedding, locale in cases:
+            started = time.perf_counter()
+            results.append(search(embedding, locale, top_k))
+            latencies.append((time.perf_counter() - started) * 1000)
+    return {
+        "latencies": np.array(latencies),
+        "results": results,
+    }
+
+
+def overlap(a: List[List[Tuple[str, float]]], b: List[List[Tuple[str, float]]]) -> float:
+    """Mean Jaccard overlap of returned contents per query"""
+    scores = []
+    for x, y in zip(a, b):
+        xs, ys = {c for c, _ in x}, {c for c, _ in y}
+        scores.append(len(xs & ys) / len(xs | ys) if xs | ys else 1.0)
+    return float(np.mean(scores)) if scores else 0.0
+
+
+def sample_knowledge_queries(count: int, seed: int = 42) -> List[Dict]:
+    """Stored embeddings + small gaussian noise, with their row's filters"""
+    from memory import DatabaseConnection
+    rows = DatabaseConnection.execute_query("""
+        SELECT content_type, language, embedding::text as embedding
+        FROM aurora_knowledge
+        WHERE embedding IS NOT NULL
+        ORDER BY md5(id::text)
+        LIMIT %s
+    """, (count,)) or []
+
+    rng = np.random.default_rng(seed)
+    queries = []
+    for row in rows:
+        vector = decode_vector(row["embedding"]).astype(np.float64)
+        vector = vector + rng.normal(0, 0.02, vector.shape)
+        queries.append({
+            "embedding": (vector / np.linalg.norm(vector)).astype(np.float32),
+            "language": row["language"],
+            "content_type": row["content_type"],
+        })
+    return queries
+
+
+def run_recall(args):
+    from embeddings import embeddings_service
+
+    queries = sample_knowledge_queries(args.queries)
+    if not queries:
+        print("❌ No embedded rows in aurora_knowledge - nothing to measure")
+        return
+
+    filters = {
+        "unfiltered": lambda q: {},
+        "language": lambda q: {"language": q["language"]},
+        "content_type": lambda q: {"content_type": q["content_type"]},
+        "type+language": lambda q: {"content_type": q["content_type"], "language": q["language"]},
+    }
+
+    print(f"\n{'='*72}")
+    print(f"📊 Recall Benchmark ({len(queries)} queries, top-{args.top_k}, "
+          f"lists={embeddings_service.ivfflat_lists}, "
+          f"iterative_scan={'on' if embeddings_service.iterative_scan else 'off'})")
+    print(f"{'='*72}")
+    print(f"  {'filter':<16}{'recall':>9}{'fill':>8}{'exact fill':>12}{'ann ms':>9}{'exact ms':>10}")
+
+    for name, make_filter in filters.items():
+        recalls, fills, exact_fills, ann_ms, exact_ms = [], [], [], [], []
+        for query in queries:
+            kwargs = dict(make_filter(query), limit=args.top_k, similarity_threshold=args.threshold)
+
+            started = time.perf_counter()
+            approx = embeddings_service.search_by_embedding(query["embedding"], **kwargs)
+            ann_ms.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            exact = embeddings_service.search_by_embedding(query["embedding"], exact=True, **kwargs)
+            exact_ms.append((time.perf_counter() - started) * 1000)
+
+            truth = {row["id"] for row in exact}
+            found = {row["id"] for row in approx}
+            recalls.append(len(truth & found) / len(truth) if truth else 1.0)
+            fills.append(len(approx) / args.top_k)
+            exact_fills.append(len(exact) / args.top_k)
+
+        print(f"  {name:<16}{np.mean(recalls):9.3f}{np.mean(fills):8.2f}{np.mean(exact_fills):12.2f}"
+              f"{np.median(ann_ms):9.2f}{np.median(exact_ms):10.2f}")
+    print(f"{'='*72}\n")
+
+
+def run_category_recall(args):
+    from memory import DatabaseConnection, SemanticMemory
+
+    print(f"\n{'='*72}")
+    print(f"📊 Category Recall Benchmark (top-{args.top_k}, up to {args.queries} queries per category)")
+    print(f"{'='*72}")
+    print(f"  {'locale/category':<28}{'rows':>6}{'index':>7}{'recall':>8}{'fill':>7}{'ann ms':>9}{'exact ms':>10}")
+
+    rng = np.random.default_rng(42)
+    worst_fill = 1.0
+    for locale, field in SemanticMemory.EMBEDDING_FIELDS.items():
+        indexed = SemanticMemory._indexed_categories(locale)
+        categories = DatabaseConnection.execute_query(f"""
+            SELECT category, COUNT(*) as rows
+            FROM aurora_semantic_memory
+            WHERE active = true AND "{field}" IS NOT NULL
+            GROUP BY category
+            ORDER BY rows DESC
+        """) or []
+        for entry in categories:
+            category, size = entry["category"], entry["rows"]
+            rows = DatabaseConnection.execute_query(f"""
+                SELECT "{field}"::text as embedding
+                FROM aurora_semantic_memory
+                WHERE active = true AND "{field}" IS NOT NULL
+                ORDER BY md5(id)
+                LIMIT %s
+            """, (args.queries,)) or []
+
+            recalls, fills, ann_ms, exact_ms = [], [], [], []
+            for row in rows:
+                vector = decode_vector(row["embedding"]).astype(np.float64)
+                vector = (vector + rng.normal(0, 0.02, vector.shape)).astype(np.float32)
+
+                started = time.perf_counter()
+                approx = SemanticMemory.semantic_search(vector, locale, category, args.top_k) or []
+                ann_ms.append((time.perf_counter() - started) * 1000)
+
+                started = time.perf_counter()
+                exact = SemanticMemory.semantic_search(vector, locale, category, args.top_k, exact=True) or []
+                exact_ms.append((time.perf_counter() - started) * 1000)
+
+                truth = {r["id"] for r in exact}
+                recalls.append(len(truth & {r["id"] for r in approx}) / len(truth) if truth else 1.0)
+                fills.append(len(approx) / min(args.top_k, size))
+
+            if not rows:
+                continue
+            worst_fill = min(worst_fill, min(fills))
+            label = f"{locale}/{category}"[:27]
+            print(f"  {label:<28}{size:6d}{'hnsw' if category in indexed else 'exact':>7}"
+                  f"{np.mean(recalls):8.3f}{np.mean(fills):7.2f}"
+                  f"{np.median(ann_ms):9.2f}{np.median(exact_ms):10.2f}")
+
+    print(f"\n  worst fill: {worst_fill:.2f} {'✅' if worst_fill >= 1.0 else '❌ (post-filter loss)'}")
+    print(f"{'='*72}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark legacy vs unified retrieval")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--recall", action="store_true", help="ANN recall vs exact scan on aurora_knowledge")
+    parser.add_argument("--category-recall", action="store_true",
+                        help="Per-category recall/fill vs exact scan on aurora_semantic_memory")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--threshold", type=float, default=0.0, help="Similarity threshold for --recall")
+    args = parser.parse_args()
+
+    if args.recall:
+        run_recall(args)
+        return
+    if args.category_recall:
+        run_category_recall(args)
+        return
+
+    embeddings = embed_queries(SAMPLE_QUERIES)
+    cases = [(e, locale) for e, (_, locale) in zip(embeddings, SAMPLE_QUERIES) if e]
+    if not cases:
+        print("❌ No query embeddings (OpenAI unavailable) - nothing to benchmark")
+        return
+
+    paths = {
+        "legacy/knowledge": (legacy_knowledge, None),
+        "legacy/semantic": (legacy_semantic, None),
+    }
+    baselines = {"knowledge": "legacy/knowledge", "semantic_memory": "legacy/semantic"}
+    for name in BACKENDS:
+        paths[f"engine/{name}"] = (engine_path(RetrievalEngine(backend=get_backend(name))), baselines[name])
+
+    # Warm-up (connections, caches)
+    for search, _ in paths.values():
+        run(search, cases[:1], args.top_k, 1)
+
+    print(f"\n{'='*72}")
+    print(f"📊 Retrieval Benchmark ({len(cases)} queries × {args.rounds} rounds, top-{args.top_k})")
+    print(f"{'='*72}")
+    print(f"  {'path':<24}{'p50 ms':>9}{'p95 ms':>9}{'hits':>7}{'top-1':>8}{'overlap':>9}")
+
+    reports = {}
+    for name, (search, baseline) in paths.items():
+        report = run(search, cases, args.top_k, args.rounds)
+        reports[name] = report
+        results = report["results"]
+        hits = np.mean([len(r) for r in results])
+        top1 = np.mean([r[0][1] for r in results if r]) if any(results) else 0.0
+        same = overlap(results, reports[baseline]["results"]) if baseline else 1.0
+        print(f"  {name:<24}{np.percentile(report['latencies'], 50):9.2f}"
+              f"{np.percentile(report['latencies'], 95):9.2f}{hits:7.1f}{top1:8.3f}{same:9.2f}")
+    print(f"{'='*72}\n")
+
+
+if __name__ == "__main__":
+    main()
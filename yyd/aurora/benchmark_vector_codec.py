@@ -0,0 +1,83 @@
+"""
+Aurora Vector Codec Benchmark
+=============================
+
+Compares how a query embedding reaches PostgreSQL:
+- legacy   Python list of floats, psycopg2 ARRAY[...] rendering, bound twice
+           per semantic_search (SELECT similarity + ORDER BY)
+- codec    float32 ndarray, compact pgvector literal, bound once
+Reports serialization time per query (µs) and bytes sent per query.
+No database or OpenAI access needed.
+
+Usage:
+    python benchmark_vector_codec.py [--queries 2000] [--dimensions 1536]
+"""
+
+import argparse
+import time
+
+import numpy as np
+from psycopg2.extensions import adapt
+
+from vector_codec import decode_vector, register_vector_codec, to_vector
+
+
+def random_embeddings(count: int, dimensions: int, seed: int = 42):
+    """OpenAI-like unit vectors, as the list of floats the SDK returns"""
+    rng = np.random.default_rng(seed)
+    matrix = rng.normal(0, 1, (count, dimensions)).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    return [row.astype(np.float64).tolist() for row in matrix]
+
+
+def run(encode, embeddings) -> tuple:
+    started = time.perf_counter()
+    total = 0
+    for embedding in embeddings:
+        total += encode(embedding)
+    return time.perf_counter() - started, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding parameter serialization")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    args = parser.parse_args()
+
+    register_vector_codec()
+    embeddings = random_embeddings(args.queries, args.dimensions)
+
+    def legacy(embedding):
+        # `%s::vector` twice in the statement → rendered twice
+        return 2 * len(adapt(embedding).getquoted())
+
+    def codec(embedding):
+        return len(adapt(to_vector(embedding)).getquoted())
+
+    # Exact float32 round trip through the literal
+    sample = to_vector(embeddings[0])
+    literal = adapt(sample).getquoted().decode("ascii")[1:-1]
+    exact = bool(np.array_equal(decode_vector(literal), sample))
+
+    run(legacy, embeddings[:50])
+    run(codec, embeddings[:50])
+
+    print(f"\n{'='*60}")
+    print(f"📊 Vector Codec Benchmark ({args.queries} queries × {args.dimensions}d)")
+    print(f"{'='*60}")
+    results = {}
+    for name, encode in (("legacy", legacy), ("codec", codec)):
+        elapsed, total = run(encode, embeddings)
+        results[name] = (elapsed, total)
+        print(f"  {name:<8} {elapsed / args.queries * 1e6:9.1f} µs/query   "
+              f"{total / args.queries / 1024:7.1f} KiB/query")
+    (legacy_s, legacy_b), (codec_s, codec_b) = results["legacy"], results["codec"]
+    print(f"  speedup  {legacy_s / codec_s:.2f}x")
+    print(f"  saved    {(legacy_b - codec_b) / args.queries / 1024:.1f} KiB/query "
+          f"({(1 - codec_b / legacy_b) * 100:.0f}%)")
+    print(f"  exact float32 round trip: {'✅' if exact else '❌'}")
+    print(f"{'='*60}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Aurora Circuit Breaker
+======================
+
+Shared breaker for OpenAI calls (embeddings + completions):
+- CLOSED: calls flow normally, consecutive failures are counted
+- OPEN: calls are skipped (KB-only / lexical retrieval / templates)
+- HALF_OPEN: after the cool-down a single probe call is let through
+
+Trips after N consecutive failures, or immediately on insufficient_quota
+(with a longer cool-down, since quota rarely comes back in seconds). A
+per-minute 429 opens it only for the server's Retry-After (otherwise it counts
+as an ordinary failure); other 4xx are the request's fault, not the service's,
+and are not counted. State is reported on GET /health.
+"""
+
+import os
+import time
+import threading
+from typing import Any, Dict, Optional
+
+from metrics import metrics
+
+FAILURE_THRESHOLD = int(os.getenv("AURORA_BREAKER_FAILURE_THRESHOLD", "5"))
+RESET_TIMEOUT_SECONDS = float(os.getenv("AURORA_BREAKER_RESET_SECONDS", "30"))
+RATE_LIMIT_RESET_SECONDS = float(os.getenv("AURORA_BREAKER_RATE_LIMIT_RESET_SECONDS", "300"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with half-open probing"""
+
+    def __init__(self, name: str,
+                 failure_threshold: int = FAILURE_THRESHOLD,
+                 reset_timeout: float = RESET_TIMEOUT_SECONDS,
+                 rate_limit_timeout: float = RATE_LIMIT_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.rate_limit_timeout = rate_limit_timeout
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._open_timeout = reset_timeout
+        self._probe_in_flight = False
+        self._probe_started_at = 0.0
+        self._last_error: Optional[str] = None
+        self._trips = 0
+
+    @staticmethod
+    def is_quota_error(error: Exception) -> bool:
+        """Exhausted quota (429 insufficient_quota) trips the breaker immediately"""
+        return getattr(error, "code", None) == "insufficient_quota" or "insufficient_quota" in str(error)
+
+    @staticmethod
+    def is_client_error(error: Exception) -> bool:
+        """4xx other than 429 (bad request, context length, auth): not a service failure"""
+        status = getattr(error, "status_code", None)
+        return isinstance(status, int) and 400 <= status < 500 and status != 429
+
+    @staticmethod
+    def retry_after(error: Exception) -> Optional[float]:
+        """Seconds from a 429's Retry-After(-Ms) header, None if absent"""
+        if getattr(error, "status_code", None) != 429:
+            return None
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        try:
+            if headers.get("retry-after-ms"):
+                return float(headers["retry-after-ms"]) / 1000
+            if headers.get("retry-after"):
+                return float(headers["retry-after"])
+        except (TypeError, ValueError):
+            pass
+        return None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self._open_timeout:
+            return HALF_OPEN
+        return self._state
+
+    def _probe_pending(self) -> bool:
+        # A probe that never reported back (e.g. cancelled) expires after reset_timeout
+        return self._probe_in_flight and time.monotonic() - self._probe_started_at < self.reset_timeout
+
+    def is_open(self) -> bool:
+        """True while calls should be skipped (no probe due yet)"""
+        with self._lock:
+            state = self._current_state()
+            return state == OPEN or (state == HALF_OPEN and self._probe_pending())
+
+    def allow_request(self) -> bool:
+        """Check before calling; in HALF_OPEN only one probe is allowed"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probe_pending():
+                self._state = HALF_OPEN
+                self._probe_in_flight = True
+                self._probe_started_at = time.monotonic()
+                metrics.increment(f"breaker.{self.name}.probes")
+                print(f"🔌 Circuit '{self.name}' half-open - probing")
+                return True
+            metrics.increment(f"breaker.{self.name}.rejected")
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                print(f"✅ Circuit '{self.name}' closed - service recovered")
+            self._state = CLOSED
+            self._consecutive_failures = 0
+            self._probe_in_flight = False
+            metrics.set_gauge(f"breaker.{self.name}.open", 0)
+
+    def record_failure(self, error: Optional[Exception] = None):
+        if error is not None and self.is_client_error(error):
+            # The service answered; only release a half-open probe
+            with self._lock:
+                self._probe_in_flight = False
+            metrics.increment(f"breaker.{self.name}.client_errors")
+            return
+
+        with self._lock:
+            self._consecutive_failures += 1
+            self._last_error = str(error)[:200] if error else None
+            metrics.increment(f"breaker.{self.name}.failures")
+
+            if error is not None and self.is_quota_error(error):
+                self._trip(self.rate_limit_timeout)
+                return
+            retry_after = self.retry_after(error) if error is not None else None
+            if retry_after is not None:
+                self._trip(min(retry_after, self.rate_limit_timeout))
+            elif self._state == HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                self._trip(self.reset_timeout)
+
+    def _trip(self, timeout: float):
+        if self._state != OPEN:
+            self._trips += 1
+            metrics.increment(f"breaker.{self.name}.trips")
+            print(f"🚫 Circuit '{self.name}' OPEN for {timeout:.0f}s "
+                  f"({self._consecutive_failures} failures, last: {self._last_error})")
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._open_timeout = timeout
+        self._probe_in_flight = False
+        metrics.set_gauge(f"breaker.{self.name}.open", 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """State for /health"""
+        with self._lock:
+            state = self._current_state()
+            retry_in = 0.0
+            if self._state == OPEN:
+                retry_in = max(0.0, self._open_timeout - (time.monotonic() - self._opened_at))
+            return {
+                "state": state,
+                "consecutive_failures": self._consecutive_failures,
+                "trips": self._trips,
+                "retry_in_seconds": round(retry_in, 1),
+                "last_error": self._last_error,
+            }
+
+
+# Shared breaker for every OpenAI call in this process
+openai_breaker = CircuitBreaker("openai")
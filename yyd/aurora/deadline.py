@@ -0,0 +1,102 @@
+"""
+Aurora Request Deadlines
+========================
+
+Per-request latency budget propagated through the chat pipeline:
+- Each stage (affect, memory, retrieval, generation...) checks remaining budget
+- Awaited stages are bounded by the remaining time (timeout → default value)
+- Stage durations feed histograms so /metrics shows where the budget went
+
+Degradation ladder used by the decision engine when the budget runs low:
+1. Not enough for an LLM call → answer from knowledge base only
+2. Not enough for persistence → skip memory writes
+3. Almost nothing left → send a template answer
+"""
+
+import os
+import time
+import asyncio
+from contextlib import contextmanager
+from typing import Any, Awaitable, Optional
+
+from metrics import metrics
+
+# Total budget per chat turn (seconds)
+CHAT_BUDGET_SECONDS = float(os.getenv("AURORA_CHAT_BUDGET_SECONDS", "15"))
+
+# Minimum remaining budget required to start each optional stage
+LLM_MIN_BUDGET = float(os.getenv("AURORA_LLM_MIN_BUDGET_SECONDS", "4"))
+PERSISTENCE_MIN_BUDGET = float(os.getenv("AURORA_PERSISTENCE_MIN_BUDGET_SECONDS", "1"))
+TEMPLATE_THRESHOLD = float(os.getenv("AURORA_TEMPLATE_THRESHOLD_SECONDS", "0.5"))
+
+
+class Deadline:
+    """Monotonic deadline for a single request"""
+
+    def __init__(self, budget_seconds: float = CHAT_BUDGET_SECONDS, name: str = "chat"):
+        self.name = name
+        self.budget = budget_seconds
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + budget_seconds
+
+    def remaining(self) -> float:
+        """Seconds left (never negative)"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def has_budget(self, seconds: float) -> bool:
+        """True if at least `seconds` remain"""
+        return self.remaining() >= seconds
+
+    def degrade(self, mode: str):
+        """Record a graceful degradation decision"""
+        metrics.increment(f"deadline.{self.name}.degraded.{mode}")
+        print(f"⏱️ Deadline degrade ({self.name}): {mode} - {self.remaining():.2f}s left")
+
+    @contextmanager
+    def stage(self, stage: str):
+        """Time a synchronous stage"""
+        started = time.monotonic()
+        try:
+            yield self
+        finally:
+            metrics.observe(f"deadline.{self.name}.stage_seconds.{stage}", time.monotonic() - started)
+
+    async def run(self, stage: str, awaitable: Awaitable[Any], default: Any = None,
+                  min_timeout: float = 0.0) -> Any:
+        """
+        Await a stage bounded by the remaining budget
+
+        Returns `default` if the budget is exhausted or the stage times out.
+        `min_timeout` guarantees a floor for stages that must not be skipped.
+        """
+        timeout = max(self.remaining(), min_timeout)
+        started = time.monotonic()
+        try:
+            if timeout <= 0.0:
+                if asyncio.iscoroutine(awaitable):
+                    awaitable.close()
+                metrics.increment(f"deadline.{self.name}.timeouts.{stage}")
+                return default
+            return await asyncio.wait_for(awaitable, timeout=timeout)
+        except asyncio.TimeoutError:
+            metrics.increment(f"deadline.{self.name}.timeouts.{stage}")
+            print(f"⏱️ Stage '{stage}' exceeded deadline ({timeout:.2f}s)")
+            return default
+        finally:
+            metrics.observe(f"deadline.{self.name}.stage_seconds.{stage}", time.monotonic() - started)
+
+    def finish(self):
+        """Record total latency and share of budget consumed"""
+        elapsed = self.elapsed()
+        metrics.observe(f"deadline.{self.name}.total_seconds", elapsed)
+        metrics.observe(
+            f"deadline.{self.name}.budget_used",
+            elapsed / self.budget if self.budget else 0.0,
+            buckets=(0.1, 0.25, 0.5, 0.75, 0.9, 1.0, 1.5, 2.0)
+        )
@@ -4,15 +4,95 @@ Aurora Embedding Health Check & Auto-Recovery System
 
 Automatically detects when OpenAI quota is restored and processes pending embeddings.
 Runs as a background task checking every 30 minutes.
+
+Pending work lives in aurora_pending_embeddings, one row per (locale, id)
+whose embedding is NULL, kept in sync by a trigger on aurora_semantic_memory
+(inserts, embedding updates; deletes cascade). Counting and claiming read
+that small table's primary key instead of scanning the knowledge base.
+
+Embedding itself has one path: the `embedding` job queue (job_queue.py).
+Once quota is back, claimed pending rows are enqueued as embedding jobs
+deduplicated by id, so a row already queued by SemanticMemory.store is not
+embedded twice; storing the embedding removes the pending row (trigger).
 """
 
 import asyncio
 import os
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, List
 from rag import EmbeddingGenerator
 from memory import SemanticMemory, DatabaseConnection
-import psycopg2
+from metrics import metrics
+
+# A claimed row is retried by another cycle if not finished within this time
+PENDING_CLAIM_TIMEOUT = os.getenv("AURORA_PENDING_EMBEDDING_CLAIM_TIMEOUT", "10 minutes")
+
+_pending_tracking_ready = False
+
+
+def ensure_pending_tracking():
+    """
+    Create aurora_pending_embeddings and its sync trigger (idempotent)
+    
+    The table is also declared in schema.prisma (AuroraPendingEmbedding); the
+    trigger and function are not, and Prisma leaves them alone.
+    
+    The one-time backfill is the only IS NULL scan of aurora_semantic_memory;
+    it runs in the same transaction that installs the trigger.
+    """
+    global _pending_tracking_ready
+    if _pending_tracking_ready:
+        return
+    branches = "\n".join(f"""
+            IF NEW."{field}" IS NULL THEN
+                INSERT INTO aurora_pending_embeddings (locale, id) VALUES ('{locale}', NEW.id)
+                ON CONFLICT DO NOTHING;
+            ELSE
+                DELETE FROM aurora_pending_embeddings WHERE locale = '{locale}' AND id = NEW.id;
+            END IF;""" for locale, field in SemanticMemory.EMBEDDING_FIELDS.items())
+    backfill = " UNION ALL ".join(
+        f"""SELECT '{locale}', id FROM aurora_semantic_memory WHERE "{field}" IS NULL"""
+        for locale, field in SemanticMemory.EMBEDDING_FIELDS.items()
+    )
+    columns = ", ".join(f'"{field}"' for field in SemanticMemory.EMBEDDING_FIELDS.values())
+    
+    with DatabaseConnection.connection() as conn:
+        with conn.cursor() as cur:
+            # Serialize concurrent installers (workers booting together)
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext('aurora_pending_embeddings'))")
+            # Keyed on the trigger: `prisma db push` may have created the table
+            cur.execute("""
+                SELECT EXISTS (
+                    SELECT 1 FROM pg_trigger
+                    WHERE tgname = 'aurora_semantic_memory_pending_embeddings'
+                )
+            """)
+            if not cur.fetchone()[0]:
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS aurora_pending_embeddings (
+                        locale TEXT NOT NULL,
+                        id TEXT NOT NULL REFERENCES aurora_semantic_memory (id) ON DELETE CASCADE,
+                        "claimedAt" TIMESTAMP,
+                        "createdAt" TIMESTAMP NOT NULL DEFAULT NOW(),
+                        PRIMARY KEY (locale, id)
+                    )
+                """)
+                cur.execute(f"""
+                    CREATE OR REPLACE FUNCTION aurora_track_pending_embeddings() RETURNS trigger AS $$
+                    BEGIN{branches}
+                        RETURN NULL;
+                    END;
+                    $$ LANGUAGE plpgsql
+                """)
+                cur.execute(f"""
+                    CREATE TRIGGER aurora_semantic_memory_pending_embeddings
+                    AFTER INSERT OR UPDATE OF {columns} ON aurora_semantic_memory
+                    FOR EACH ROW EXECUTE FUNCTION aurora_track_pending_embeddings()
+                """)
+                cur.execute(f"INSERT INTO aurora_pending_embeddings (locale, id) {backfill}")
+                print(f"✅ Pending embedding tracking installed ({cur.rowcount} pending)")
+        conn.commit()
+    _pending_tracking_ready = True
 
 
 class EmbeddingHealthMonitor:
@@ -27,13 +107,18 @@ class EmbeddingHealthMonitor:
         self.pending_count = 0
         
     async def check_quota_health(self) -> bool:
-        """Test if OpenAI API is accessible with a minimal request"""
+        """
+        Test if OpenAI API is accessible with a minimal request
+        
+        Bypasses the shared circuit breaker (this IS the probe); the outcome is
+        recorded on it, so a healthy check closes the circuit for chat requests.
+        """
         try:
             test_embedding = await self.embedding_generator.generate(
-                "Test quota health check"
+                "Test quota health check", respect_breaker=False
             )
             
-            if test_embedding:
+            if test_embedding is not None:
                 print("✅ OpenAI API HEALTHY - Quota available!")
                 self.is_healthy = True
                 self.last_check = datetime.now()
@@ -54,88 +139,110 @@ class EmbeddingHealthMonitor:
                 self.is_healthy = False
                 return False
     
+    def pending_by_locale(self) -> Dict[str, int]:
+        """Pending embeddings per locale (primary key range counts)"""
+        ensure_pending_tracking()
+        counts = {}
+        for locale in SemanticMemory.EMBEDDING_FIELDS:
+            row = DatabaseConnection.execute_query(
+                "SELECT COUNT(*) AS count FROM aurora_pending_embeddings WHERE locale = %s",
+                (locale,), fetch="one"
+            )
+            counts[locale] = row['count'] if row else 0
+            metrics.set_gauge(f"embeddings.pending.{locale}", counts[locale])
+        return counts
+    
     async def get_pending_embeddings_count(self) -> int:
-        """Count knowledge entries without embeddings"""
+        """Count missing (entry, locale) embeddings"""
         try:
-            query = """
-                SELECT COUNT(*) as count 
-                FROM aurora_semantic_memory 
-                WHERE "embeddingEn" IS NULL 
-                   OR "embeddingPt" IS NULL 
-                   OR "embeddingEs" IS NULL
-            """
-            result = DatabaseConnection.execute_query(query, fetch="one")
-            count = result['count'] if result else 0
+            counts = await asyncio.to_thread(self.pending_by_locale)
+            count = sum(counts.values())
             self.pending_count = count
             return count
         except Exception as e:
             print(f"Error counting pending embeddings: {e}")
             return 0
     
+    @staticmethod
+    def claim_pending(locale: str, limit: int) -> List[str]:
+        """
+        Claim up to `limit` pending entries of one locale (SKIP LOCKED)
+        
+        Claims expire after PENDING_CLAIM_TIMEOUT, so entries whose job was
+        lost or dead-lettered are enqueued again by a later cycle.
+        """
+        ensure_pending_tracking()
+        rows = DatabaseConnection.execute_query("""
+            UPDATE aurora_pending_embeddings p
+            SET "claimedAt" = NOW()
+            WHERE (p.locale, p.id) IN (
+                SELECT locale, id FROM aurora_pending_embeddings
+                WHERE locale = %s
+                  AND ("claimedAt" IS NULL OR "claimedAt" < NOW() - %s::interval)
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING p.id
+        """, (locale, PENDING_CLAIM_TIMEOUT, limit)) or []
+        return [row['id'] for row in rows]
+    
+    @staticmethod
+    def release_pending(locale: str, ids: List[str]):
+        if ids:
+            DatabaseConnection.execute_query("""
+                UPDATE aurora_pending_embeddings SET "claimedAt" = NULL
+                WHERE locale = %s AND id = ANY(%s)
+            """, (locale, ids), fetch="none")
+    
+    @staticmethod
+    def discard_pending(locale: str, ids: List[str]):
+        """Drop pending entries that have nothing to embed (empty content)"""
+        if ids:
+            DatabaseConnection.execute_query("""
+                DELETE FROM aurora_pending_embeddings
+                WHERE locale = %s AND id = ANY(%s)
+            """, (locale, ids), fetch="none")
+    
     async def process_pending_embeddings(self, batch_size: int = 5) -> Dict:
-        """Process pending embeddings when quota is restored"""
-        print(f"\n🔄 Processing pending embeddings (batch size: {batch_size})...")
+        """
+        Hand pending embeddings to the job queue when quota is restored
+        
+        Claims up to batch_size entries per locale and enqueues one
+        `embedding` job per row (dedupe_key = id), which does the OpenAI call.
+        Entries that could not be enqueued are released for the next cycle.
+        """
+        from job_queue import job_queue
+        
+        print(f"\n🔄 Queueing pending embeddings (batch size: {batch_size} per locale)...")
+        claimed: Dict[str, List[str]] = {}
+        queued = 0
+        failed = 0
         
         try:
-            # Get entries without embeddings
-            query = """
-                SELECT id, "contentEn", "contentPt", "contentEs"
-                FROM aurora_semantic_memory 
-                WHERE "embeddingEn" IS NULL 
-                   OR "embeddingPt" IS NULL 
-                   OR "embeddingEs" IS NULL
-                LIMIT %s
-            """
-            results = DatabaseConnection.execute_query(query, (batch_size,))
+            for locale in SemanticMemory.EMBEDDING_FIELDS:
+                for memory_id in await asyncio.to_thread(self.claim_pending, locale, batch_size):
+                    claimed.setdefault(memory_id, []).append(locale)
             
-            if not results:
-                print("✅ No pending embeddings to process")
-                return {"processed": 0, "failed": 0}
-            
-            processed = 0
-            failed = 0
-            
-            for row in results:
+            for memory_id, locales in claimed.items():
                 try:
-                    knowledge_id = row['id']
-                    
-                    # Generate embeddings for all languages
-                    embeddings = await self.embedding_generator.batch_generate([
-                        row['contentEn'],
-                        row['contentPt'],
-                        row['contentEs']
-                    ])
-                    
-                    if all(embeddings):
-                        # Update database with embeddings
-                        update_query = """
-                            UPDATE aurora_semantic_memory 
-                            SET "embeddingEn" = %s,
-                                "embeddingPt" = %s,
-                                "embeddingEs" = %s,
-                                "updatedAt" = NOW()
-                            WHERE id = %s
-                        """
-                        DatabaseConnection.execute_query(
-                            update_query,
-                            (embeddings[0], embeddings[1], embeddings[2], knowledge_id),
-                            fetch="none"
-                        )
-                        processed += 1
-                        print(f"  ✅ Processed: {knowledge_id}")
-                    else:
-                        failed += 1
-                        print(f"  ❌ Failed: {knowledge_id}")
-                        
+                    await job_queue.enqueue_async("embedding", {"id": memory_id, "locales": locales},
+                                                  dedupe_key=memory_id)
+                    queued += 1
                 except Exception as e:
                     failed += 1
-                    print(f"  ❌ Error processing {row.get('id', 'unknown')}: {e}")
+                    for locale in locales:
+                        await asyncio.to_thread(self.release_pending, locale, [memory_id])
+                    print(f"  ❌ Could not queue {memory_id}: {e}")
             
-            return {"processed": processed, "failed": failed}
+            if not claimed:
+                print("✅ No pending embeddings to process")
+            metrics.increment("embeddings.backfill_queued", queued)
+            return {"queued": queued, "failed": failed}
             
         except Exception as e:
             print(f"❌ Batch processing error: {e}")
-            return {"processed": 0, "failed": 0, "error": str(e)}
+            return {"queued": queued, "failed": failed, "error": str(e)}
     
     async def run_health_check_cycle(self):
         """Single health check cycle"""
@@ -154,23 +261,23 @@ class EmbeddingHealthMonitor:
         if is_healthy and pending > 0:
             print(f"\n🎉 QUOTA RESTORED! Processing {pending} pending embeddings...")
             result = await self.process_pending_embeddings(batch_size=10)
-            print(f"\n✅ Processed: {result['processed']}, Failed: {result['failed']}")
+            print(f"\n✅ Queued: {result['queued']}, Failed: {result['failed']}")
             
             # Update config to mark embeddings as enabled
-            self._update_config_status(enabled=True)
+            await asyncio.to_thread(self._update_config_status, enabled=True)
             
         elif not is_healthy and pending > 0:
             print(f"\n⏳ Waiting for quota restoration ({pending} pending)")
-            self._update_config_status(enabled=False)
+            await asyncio.to_thread(self._update_config_status, enabled=False)
             
         elif pending == 0:
             print(f"\n✨ All embeddings processed! Knowledge base complete.")
-            self._update_config_status(enabled=True)
+            await asyncio.to_thread(self._update_config_status, enabled=True)
         
         print(f"{'='*60}\n")
     
     def _update_config_status(self, enabled: bool):
-        """Update Aurora config with embedding status"""
+        """Update Aurora config with embedding status (blocking; run in a thread)"""
         try:
             query = """
                 UPDATE aurora_configs 
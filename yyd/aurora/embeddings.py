@@ -10,12 +10,17 @@ Enables:
 """
 
 import os
+import re
+import math
+import argparse
 import numpy as np
 from typing import List, Dict, Any, Optional
 from openai import OpenAI
 import psycopg2
 from psycopg2 import extras
 from psycopg2.extras import execute_values
+from circuit_breaker import openai_breaker
+from vector_codec import register_vector_codec, to_vector
 
 # Initialize OpenAI client
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
@@ -23,18 +28,62 @@ client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 # Database connection
 DATABASE_URL = os.getenv("DATABASE_URL", "")
 
+# float32 embeddings bind as compact pgvector literals
+register_vector_codec()
+
 # Embedding model
 EMBEDDING_MODEL = "text-embedding-3-small"  # 1536 dimensions, cost-effective
 EMBEDDING_DIMENSIONS = 1536
 
+# ivfflat tuning
+VECTOR_INDEX_NAME = "aurora_knowledge_embedding_idx"
+IVFFLAT_PROBES = int(os.getenv("AURORA_IVFFLAT_PROBES", "0"))  # 0 = auto (√lists)
+IVFFLAT_MAX_PROBES = int(os.getenv("AURORA_IVFFLAT_MAX_PROBES", "0"))  # 0 = auto (bounded)
+# Filtered queries without iterative scan: probe this many times more lists
+IVFFLAT_FILTERED_PROBE_FACTOR = 4
+# Rebuild the index when the optimal list count drifts by more than this factor
+IVFFLAT_REBUILD_DRIFT = 2.0
+# Below this many embedded rows an exact scan is fast and lists would be ~1:
+# the index is only built (by tune_vector_index, run by the scheduler) past it
+IVFFLAT_MIN_ROWS = int(os.getenv("AURORA_IVFFLAT_MIN_ROWS", "1000"))
+
+
+def choose_ivfflat_lists(rows: int) -> int:
+    """pgvector guidance: rows / 1000 up to 1M rows, √rows above"""
+    if rows <= 1_000_000:
+        return max(1, rows // 1000)
+    return int(math.sqrt(rows))
+
+
+def choose_ivfflat_probes(lists: int, filtered: bool = False) -> int:
+    """√lists by default; more lists for filtered queries (post-filter loss)"""
+    probes = IVFFLAT_PROBES or max(1, round(math.sqrt(lists)))
+    if filtered:
+        probes *= IVFFLAT_FILTERED_PROBE_FACTOR
+    return max(1, min(lists, probes))
+
+
+def choose_ivfflat_max_probes(lists: int) -> int:
+    """
+    Iterative scan bound: a filter with few matches must not probe every
+    list (an exact scan's cost on each miss) - same budget as the
+    non-iterative filtered probes unless AURORA_IVFFLAT_MAX_PROBES is set
+    """
+    return max(1, min(lists, IVFFLAT_MAX_PROBES or choose_ivfflat_probes(lists, filtered=True)))
+
 class EmbeddingsService:
     """Service for generating and searching vector embeddings"""
     
     def __init__(self):
         self.client = client
         self.model = EMBEDDING_MODEL
+        # Index settings (refreshed by _load_index_settings)
+        self.ivfflat_lists = 100
+        self.vector_index_exists = False
+        self.iterative_scan = False
         self._ensure_pgvector_extension()
         self._ensure_knowledge_table()
+        self._load_index_settings()
     
     def _ensure_pgvector_extension(self):
         """Ensure pgvector extension is enabled in PostgreSQL"""
@@ -69,13 +118,17 @@ class EmbeddingsService:
                 );
             """)
             
-            # Create index for vector similarity search
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS aurora_knowledge_embedding_idx 
-                ON aurora_knowledge 
-                USING ivfflat (embedding vector_cosine_ops)
-                WITH (lists = 100);
-            """)
+            # Create index for vector similarity search (lists sized to the table;
+            # small tables are scanned exactly until tune_vector_index builds it)
+            cursor.execute("SELECT COUNT(*) FROM aurora_knowledge WHERE embedding IS NOT NULL")
+            rows = cursor.fetchone()[0]
+            if rows >= IVFFLAT_MIN_ROWS:
+                cursor.execute(f"""
+                    CREATE INDEX IF NOT EXISTS {VECTOR_INDEX_NAME} 
+                    ON aurora_knowledge 
+                    USING ivfflat (embedding vector_cosine_ops)
+                    WITH (lists = {choose_ivfflat_lists(rows)});
+                """)
             
             # Create index for content type filtering
             cursor.execute("""
@@ -90,7 +143,84 @@ class EmbeddingsService:
         except Exception as e:
             print(f"⚠️  Knowledge table setup: {str(e)}")
     
-    def generate_embedding(self, text: str) -> List[float]:
+    def _load_index_settings(self):
+        """Read current ivfflat lists and whether pgvector supports iterative scans (0.8+)"""
+        try:
+            conn = psycopg2.connect(DATABASE_URL)
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT reloptions FROM pg_class WHERE relname = %s", (VECTOR_INDEX_NAME,))
+            row = cursor.fetchone()
+            self.vector_index_exists = row is not None
+            for option in (row[0] or []) if row else []:
+                if option.startswith("lists="):
+                    self.ivfflat_lists = int(option.split("=", 1)[1])
+            
+            cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+            row = cursor.fetchone()
+            if row:
+                version = tuple(int(part) for part in re.findall(r"\d+", row[0])[:2])
+                self.iterative_scan = version >= (0, 8)
+            
+            cursor.close()
+            conn.close()
+        except Exception as e:
+            print(f"⚠️  Vector index settings: {str(e)}")
+    
+    def tune_vector_index(self, force: bool = False) -> Dict[str, Any]:
+        """
+        Build the ivfflat index once the table is large enough, and rebuild it
+        when its list count no longer fits the table
+        
+        Built concurrently under a temporary name; the old index is renamed
+        aside and the new one renamed into place in one transaction, then the
+        old one is dropped. Leftovers of an interrupted run are dropped first.
+        """
+        self._load_index_settings()
+        conn = psycopg2.connect(DATABASE_URL)
+        conn.autocommit = True  # CREATE/DROP INDEX CONCURRENTLY
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT COUNT(*) FROM aurora_knowledge WHERE embedding IS NOT NULL")
+            rows = cursor.fetchone()[0]
+            target = choose_ivfflat_lists(rows)
+            current = self.ivfflat_lists if self.vector_index_exists else None
+            
+            result = {"rows": rows, "lists": current, "target_lists": target, "rebuilt": False}
+            if rows < IVFFLAT_MIN_ROWS and not (force and current is not None):
+                return result
+            if current is not None and not force:
+                drift = max(target, current) / max(1, min(target, current))
+                if drift <= IVFFLAT_REBUILD_DRIFT:
+                    return result
+            
+            cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {VECTOR_INDEX_NAME}_new")
+            cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {VECTOR_INDEX_NAME}_old")
+            cursor.execute(f"""
+                CREATE INDEX CONCURRENTLY {VECTOR_INDEX_NAME}_new
+                ON aurora_knowledge
+                USING ivfflat (embedding vector_cosine_ops)
+                WITH (lists = {target})
+            """)
+            # Swap atomically: some index always carries the canonical name
+            cursor.execute("BEGIN")
+            if current is not None:
+                cursor.execute(f"ALTER INDEX {VECTOR_INDEX_NAME} RENAME TO {VECTOR_INDEX_NAME}_old")
+            cursor.execute(f"ALTER INDEX {VECTOR_INDEX_NAME}_new RENAME TO {VECTOR_INDEX_NAME}")
+            cursor.execute("COMMIT")
+            if current is not None:
+                cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {VECTOR_INDEX_NAME}_old")
+            
+            self.ivfflat_lists = target
+            self.vector_index_exists = True
+            result.update(lists=target, rebuilt=True)
+            print(f"✅ Built {VECTOR_INDEX_NAME}: lists {current or '-'} → {target} ({rows} rows)")
+            return result
+        finally:
+            cursor.close()
+            conn.close()  # Also rolls back an interrupted swap
+    
+    def generate_embedding(self, text: str) -> Optional[np.ndarray]:
         """
         Generate embedding vector for text using OpenAI
         
@@ -98,17 +228,23 @@ class EmbeddingsService:
             text: Input text to embed
         
         Returns:
-            1536-dimensional embedding vector
+            1536-dimensional float32 vector, or None when OpenAI is
+            unavailable (circuit open or call failed)
         """
+        if not openai_breaker.allow_request():
+            return None
+        
         try:
             response = self.client.embeddings.create(
                 model=self.model,
                 input=text
             )
-            return response.data[0].embedding
+            openai_breaker.record_success()
+            return to_vector(response.data[0].embedding)
         except Exception as e:
+            openai_breaker.record_failure(e)
             print(f"❌ Embedding generation error: {str(e)}")
-            return [0.0] * EMBEDDING_DIMENSIONS  # Fallback zero vector
+            return None
     
     def add_knowledge(
         self,
@@ -118,7 +254,10 @@ class EmbeddingsService:
         metadata: Optional[Dict[str, Any]] = None
     ) -> bool:
         """
-        Add knowledge to vector database
+        Add knowledge through the active retrieval backend (AURORA_RETRIEVAL_BACKEND)
+        
+        With the default semantic_memory backend this is one aurora_semantic_memory
+        row; store translations of one fact together with RetrievalEngine.store.
         
         Args:
             content: Text content to store
@@ -129,8 +268,19 @@ class EmbeddingsService:
         Returns:
             Success boolean
         """
+        from retrieval import RetrievalEngine
+        return RetrievalEngine().store({language: content}, content_type, metadata)
+    
+    def insert_legacy_knowledge(
+        self,
+        content: str,
+        content_type: str,
+        language: str = "en",
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Insert one row into the legacy aurora_knowledge table (knowledge backend)"""
         try:
-            # Generate embedding
+            # Generate embedding (stored as NULL if unavailable, backfilled later)
             embedding = self.generate_embedding(content)
             
             # Store in database
@@ -181,47 +331,162 @@ class EmbeddingsService:
         Returns:
             List of matching knowledge items with similarity scores
         """
+        # Generate query embedding
+        query_embedding = self.generate_embedding(query)
+        if query_embedding is None:
+            # OpenAI unavailable - lexical retrieval instead of a zero-vector scan
+            return self.keyword_search(query, content_type, language, limit, similarity_threshold)
+        
+        return self.search_by_embedding(query_embedding, content_type, language, limit, similarity_threshold)
+    
+    def search_by_embedding(
+        self,
+        query_embedding: np.ndarray,
+        content_type: Optional[str] = None,
+        language: Optional[str] = None,
+        limit: int = 5,
+        similarity_threshold: float = 0.7,
+        exact: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Cosine similarity search with a precomputed query embedding
+        
+        The materialized CTE is only ORDER BY distance LIMIT n, so the index
+        scan can stop after n rows; the similarity threshold is applied
+        outside it (rows come out by distance, so the cut loses nothing).
+        Probes are set per query; filtered queries use pgvector iterative
+        scans (0.8+, bounded by ivfflat.max_probes) or more probes so the
+        index keeps looking until `limit` matching rows are found.
+        exact=True skips the index (ground truth for recall measurements).
+        """
         try:
-            # Generate query embedding
-            query_embedding = self.generate_embedding(query)
-            
-            # Build SQL query with filters
             conn = psycopg2.connect(DATABASE_URL)
             cursor = conn.cursor()
             
             where_clauses = []
-            params = [query_embedding]
+            filter_params: List[Any] = []
             
             if content_type:
                 where_clauses.append("content_type = %s")
-                params.append(content_type)
+                filter_params.append(content_type)
             
             if language:
                 where_clauses.append("language = %s")
-                params.append(language)
+                filter_params.append(language)
             
             where_sql = " AND " + " AND ".join(where_clauses) if where_clauses else ""
+            filtered = bool(where_clauses)
+            
+            # Per-query index settings (transaction-local)
+            if exact:
+                cursor.execute("SELECT set_config('enable_indexscan', 'off', true)")
+            elif filtered and self.iterative_scan:
+                cursor.execute("SELECT set_config('ivfflat.probes', %s, true)",
+                               (str(choose_ivfflat_probes(self.ivfflat_lists)),))
+                cursor.execute("SELECT set_config('ivfflat.iterative_scan', 'relaxed_order', true)")
+                cursor.execute("SELECT set_config('ivfflat.max_probes', %s, true)",
+                               (str(choose_ivfflat_max_probes(self.ivfflat_lists)),))
+            else:
+                cursor.execute("SELECT set_config('ivfflat.probes', %s, true)",
+                               (str(choose_ivfflat_probes(self.ivfflat_lists, filtered)),))
+            
+            # relaxed_order may return slightly out-of-order rows - re-sort the
+            # materialized candidates, then cut at the threshold. The vector is
+            # bound once and referenced through an InitPlan. Parameter order:
+            # [embedding, filters..., limit, max distance]
+            cursor.execute(f"""
+                WITH query AS (SELECT %s::vector AS v),
+                nearest AS MATERIALIZED (
+                    SELECT 
+                        id,
+                        content,
+                        content_type,
+                        language,
+                        metadata,
+                        embedding <=> (SELECT v FROM query) as distance
+                    FROM aurora_knowledge
+                    WHERE embedding IS NOT NULL {where_sql}
+                    ORDER BY distance
+                    LIMIT %s
+                )
+                SELECT id, content, content_type, language, metadata, 1 - distance as similarity
+                FROM nearest
+                WHERE distance <= %s
+                ORDER BY distance
+            """, [to_vector(query_embedding), *filter_params, limit, 1 - similarity_threshold])
+            
+            results = []
+            for row in cursor.fetchall():
+                results.append({
+                    "id": row[0],
+                    "content": row[1],
+                    "content_type": row[2],
+                    "language": row[3],
+                    "metadata": row[4],
+                    "similarity": float(row[5])
+                })
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            
+            return results
+            
+        except Exception as e:
+            print(f"❌ Semantic search error: {str(e)}")
+            return []
+    
+    def keyword_search(
+        self,
+        query: str,
+        content_type: Optional[str] = None,
+        language: Optional[str] = None,
+        limit: int = 5,
+        similarity_threshold: float = 0.7
+    ) -> List[Dict[str, Any]]:
+        """
+        Lexical fallback when embeddings are unavailable
+        
+        Scores by the share of query words (len > 3) found in the content,
+        mapped to [0.6, 0.9] like SemanticMemory.keyword_search.
+        """
+        words = [w for w in re.findall(r'\w+', query.lower()) if len(w) > 3][:8]
+        if not words:
+            return []
+        
+        try:
+            conn = psycopg2.connect(DATABASE_URL)
+            cursor = conn.cursor()
             
-            # Cosine similarity search
-            params.extend([limit])
+            match_sql = " + ".join(["(CASE WHEN LOWER(content) LIKE %s THEN 1 ELSE 0 END)"] * len(words))
+            params: List[Any] = [f"%{w}%" for w in words]
+            
+            where_clauses = []
+            if content_type:
+                where_clauses.append("content_type = %s")
+                params.append(content_type)
+            if language:
+                where_clauses.append("language = %s")
+                params.append(language)
+            where_sql = " AND " + " AND ".join(where_clauses) if where_clauses else ""
+            params.append(limit)
             
             cursor.execute(f"""
-                SELECT 
-                    id,
-                    content,
-                    content_type,
-                    language,
-                    metadata,
-                    1 - (embedding <=> %s::vector) as similarity
-                FROM aurora_knowledge
-                WHERE 1=1 {where_sql}
-                ORDER BY embedding <=> %s::vector
+                SELECT id, content, content_type, language, metadata,
+                       0.6 + 0.3 * matches::float / {len(words)} as similarity
+                FROM (
+                    SELECT *, ({match_sql}) as matches
+                    FROM aurora_knowledge
+                    WHERE 1=1 {where_sql}
+                ) k
+                WHERE matches > 0
+                ORDER BY matches DESC
                 LIMIT %s
-            """, params + [query_embedding])
+            """, params)
             
             results = []
             for row in cursor.fetchall():
-                similarity = row[5]
+                similarity = float(row[5])
                 if similarity >= similarity_threshold:
                     results.append({
                         "id": row[0],
@@ -229,7 +494,7 @@ class EmbeddingsService:
                         "content_type": row[2],
                         "language": row[3],
                         "metadata": row[4],
-                        "similarity": float(similarity)
+                        "similarity": similarity
                     })
             
             cursor.close()
@@ -238,7 +503,7 @@ class EmbeddingsService:
             return results
             
         except Exception as e:
-            print(f"❌ Semantic search error: {str(e)}")
+            print(f"❌ Keyword search error: {str(e)}")
             return []
     
     def get_tour_context(self, query: str, language: str = "en") -> Dict[str, Any]:
@@ -268,7 +533,7 @@ class EmbeddingsService:
         return {"tours": tours}
     
     def clear_knowledge(self, content_type: Optional[str] = None):
-        """Clear knowledge base (use with caution)"""
+        """Clear the legacy aurora_knowledge table (use with caution)"""
         try:
             conn = psycopg2.connect(DATABASE_URL)
             cursor = conn.cursor()
@@ -288,3 +553,12 @@ class EmbeddingsService:
 
 # Global instance
 embeddings_service = EmbeddingsService()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aurora knowledge vector index maintenance")
+    parser.add_argument("command", choices=["tune-index"])
+    parser.add_argument("--force", action="store_true", help="Rebuild even if lists are within drift")
+    args = parser.parse_args()
+    
+    print(f"📊 {embeddings_service.tune_vector_index(force=args.force)}")
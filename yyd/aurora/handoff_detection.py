@@ -3,13 +3,22 @@ Aurora IA - Centralized Human Handoff Detection System
 =====================================================
 
 Implements 3-rule handoff detection across all channels:
-1. Negative emotion (valence < -0.6)
+1. Negative emotion (valence < -0.6), or a sustained negative
+   trajectory (EMA valence < -0.4 and falling over 3+ messages)
 2. Low confidence (< 0.5)
-3. Explicit human request (30+ multilingual keywords)
+3. Explicit human request (30+ multilingual keywords, whole-word and
+   accent-insensitive via a precompiled Aho-Corasick matcher)
 """
 
 from typing import Dict, Any, Optional, Tuple
 
+from keyword_matcher import KeywordMatcher
+
+# Sustained negative mood (from EmotionalTrajectoryTracker.to_dict())
+TRAJECTORY_MIN_MESSAGES = 3
+TRAJECTORY_EMA_VALENCE_THRESHOLD = -0.4
+TRAJECTORY_TREND_THRESHOLD = -0.1
+
 # Comprehensive multilingual human request keywords (30+)
 HUMAN_REQUEST_KEYWORDS = [
     # English (10 variants)
@@ -28,11 +37,25 @@ HUMAN_REQUEST_KEYWORDS = [
     'atención al cliente', 'servicio al cliente', 'asesor', 'representante', 'soporte humano'
 ]
 
+# Prepared once per pooled connection (see memory.PreparedStatements)
+HANDOFF_INSERT_SQL = """
+    INSERT INTO aurora_handoffs
+    (id, "conversationId", "leadId", reason, "emotionalState", confidence, 
+     status, notes, "createdAt", "updatedAt")
+    VALUES ($1, $2, $3, $4, $5, $6, 'pending', $7, NOW(), NOW())
+    RETURNING id
+"""
+
+# Built once: all phrases matched in a single pass, whole words only
+# (so "asesor" no longer fires inside "asesoramiento")
+HUMAN_REQUEST_MATCHER = KeywordMatcher({"explicit_request": HUMAN_REQUEST_KEYWORDS})
+
 
 def detect_handoff(
     user_message: str,
     emotional_state: Dict[str, float],
-    response_confidence: float = 1.0
+    response_confidence: float = 1.0,
+    trajectory: Optional[Dict[str, float]] = None
 ) -> Tuple[bool, Optional[str]]:
     """
     Detect if conversation requires human handoff based on 3 rules
@@ -41,6 +64,7 @@ def detect_handoff(
         user_message: User's message text
         emotional_state: Dict with valence, arousal, dominance
         response_confidence: Confidence score of AI response (0-1)
+        trajectory: Conversation trajectory (ema_valence, valence_trend, ...)
     
     Returns:
         (requires_handoff: bool, reason: str)
@@ -49,13 +73,19 @@ def detect_handoff(
     if emotional_state.get('valence', 0) < -0.6:
         return (True, "negative_emotion")
     
+    # Rule 1b: Mood has been negative and getting worse across the conversation
+    if (trajectory
+            and trajectory.get('message_count', 0) >= TRAJECTORY_MIN_MESSAGES
+            and trajectory.get('ema_valence', 0) < TRAJECTORY_EMA_VALENCE_THRESHOLD
+            and trajectory.get('valence_trend', 0) < TRAJECTORY_TREND_THRESHOLD):
+        return (True, "negative_trajectory")
+    
     # Rule 2: Low confidence in AI response
     if response_confidence < 0.5:
         return (True, "low_confidence")
     
     # Rule 3: Explicit request for human agent (30+ multilingual keywords)
-    message_lower = user_message.lower()
-    if any(keyword in message_lower for keyword in HUMAN_REQUEST_KEYWORDS):
+    if HUMAN_REQUEST_MATCHER.categories(user_message):
         return (True, "explicit_request")
     
     return (False, None)
@@ -76,22 +106,15 @@ async def create_handoff_record(
         handoff_id if successful, None otherwise
     """
     try:
-        from memory import DatabaseConnection
+        from memory import DatabaseConnection, statements
         from psycopg2.extras import Json
         import uuid
         
         handoff_id = str(uuid.uuid4())
         
-        query = """
-            INSERT INTO aurora_handoffs
-            (id, "conversationId", "leadId", reason, "emotionalState", confidence, 
-             status, notes, "createdAt", "updatedAt")
-            VALUES (%s, %s, %s, %s, %s, %s, 'pending', %s, NOW(), NOW())
-            RETURNING id
-        """
-        
-        result = DatabaseConnection.execute_query(
-            query,
+        name = statements.register("handoff_insert", HANDOFF_INSERT_SQL)
+        result = DatabaseConnection.execute_prepared(
+            name,
             (handoff_id, conversation_id, lead_id, reason,
              Json(emotional_state), confidence, notes),
             fetch="one"
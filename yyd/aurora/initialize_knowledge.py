@@ -1,14 +1,20 @@
 """
 Initialize Aurora Knowledge Base with YYD Tour Information
 
-Populates vector database with:
+Populates the active retrieval backend (retrieval.py) with:
 - Tour descriptions (multilingual)
 - FAQs
 - Policies
 - Local recommendations
+
+Translations of the same item (content_type + metadata) are stored as one
+fact, so the default semantic_memory backend gets one row per item.
 """
 
-from embeddings import embeddings_service
+import json
+from typing import Any, Dict, List, Tuple
+
+from retrieval import RetrievalEngine
 
 # Tour Information (from YYD website analysis)
 TOUR_KNOWLEDGE = [
@@ -169,43 +175,46 @@ RECOMMENDATIONS_KNOWLEDGE = [
     },
 ]
 
+def group_translations(items: List[Dict[str, Any]]) -> List[Tuple[str, Dict[str, str], Dict[str, Any]]]:
+    """(content_type, {language: content}, metadata) per item, translations merged"""
+    facts: List[Tuple[str, Dict[str, str], Dict[str, Any]]] = []
+    open_facts: Dict[Tuple[str, str], Tuple[str, Dict[str, str], Dict[str, Any]]] = {}
+    for item in items:
+        metadata = item.get("metadata") or {}
+        key = (item["content_type"], metadata.get("name") or json.dumps(metadata, sort_keys=True))
+        fact = open_facts.get(key)
+        if fact is None or item["language"] in fact[1]:
+            fact = (item["content_type"], {}, metadata)
+            open_facts[key] = fact
+            facts.append(fact)
+        fact[1][item["language"]] = item["content"]
+    return facts
+
+
 def initialize_knowledge_base():
     """Populate Aurora's knowledge base with all content"""
     print("\n🚀 Initializing Aurora Knowledge Base...")
-    
-    # Clear existing knowledge (optional - comment out to preserve)
-    # embeddings_service.clear_knowledge()
+    engine = RetrievalEngine()
+    print(f"   Backend: {engine.backend.name}")
     
     total_items = 0
     
-    # Add tour information
-    print("\n📚 Adding tour information...")
-    for item in TOUR_KNOWLEDGE:
-        if embeddings_service.add_knowledge(**item):
-            total_items += 1
-    
-    # Add FAQs
-    print("\n❓ Adding FAQs...")
-    for item in FAQ_KNOWLEDGE:
-        if embeddings_service.add_knowledge(**item):
-            total_items += 1
-    
-    # Add policies
-    print("\n📋 Adding policies...")
-    for item in POLICY_KNOWLEDGE:
-        if embeddings_service.add_knowledge(**item):
-            total_items += 1
-    
-    # Add recommendations
-    print("\n💡 Adding recommendations...")
-    for item in RECOMMENDATIONS_KNOWLEDGE:
-        if embeddings_service.add_knowledge(**item):
-            total_items += 1
+    for title, items in (
+        ("📚 Adding tour information...", TOUR_KNOWLEDGE),
+        ("❓ Adding FAQs...", FAQ_KNOWLEDGE),
+        ("📋 Adding policies...", POLICY_KNOWLEDGE),
+        ("💡 Adding recommendations...", RECOMMENDATIONS_KNOWLEDGE),
+    ):
+        print(f"\n{title}")
+        for content_type, contents, metadata in group_translations(items):
+            if engine.store(contents, content_type, metadata, source_type="initialize_knowledge"):
+                total_items += 1
+                print(f"✅ Added knowledge: {content_type} ({', '.join(sorted(contents))})")
     
     print(f"\n✅ Knowledge base initialized with {total_items} items!")
     
-    # Test semantic search
-    print("\n🔍 Testing semantic search...")
+    # Test search (keyword results until the embedding jobs have run)
+    print("\n🔍 Testing search...")
     test_queries = [
         ("What tours include Pena Palace?", "en"),
         ("Quais tours incluem o Palácio da Pena?", "pt"),
@@ -214,11 +223,11 @@ def initialize_knowledge_base():
     ]
     
     for query, language in test_queries:
-        results = embeddings_service.semantic_search(query, language=language, limit=2)
+        results = engine.keyword_search(query, locale=language, limit=2)
         print(f"\nQuery: {query}")
         print(f"Found {len(results)} results:")
         for r in results:
-            print(f"  - {r['content_type']}: {r['content'][:100]}... (similarity: {r['similarity']:.2f})")
+            print(f"  - {r['category']}: {r['content'][:100]}... (similarity: {r['similarity']:.2f})")
 
 if __name__ == "__main__":
     initialize_knowledge_base()
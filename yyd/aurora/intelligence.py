@@ -10,9 +10,11 @@ Implements:
 """
 
 import os
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set
 from openai import OpenAI
 from affective_mathematics import AffectiveState, AffectiveAnalyzer
+from circuit_breaker import openai_breaker
+from keyword_matcher import KeywordMatcher, PREFIX, WHOLE
 
 # Initialize OpenAI client
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
@@ -134,6 +136,24 @@ Analizas las emociones de los clientes en tiempo real usando Matemática Afectiv
 Siempre responde naturalmente y de forma conversacional, como una persona real ayudando a un amigo. Nunca menciones ser una IA o asistente virtual. Tu objetivo es crear experiencias mágicas para cada cliente."""
 }
 
+# Keyword families scanned in Aurora's own responses (one pass per response).
+# Action words match as word prefixes ("book" → "booking", "tour" → "tours").
+RESPONSE_KEYWORDS = KeywordMatcher(
+    {
+        "handoff": [
+            "transfer you to", "speak with someone", "human agent",
+            "transferir para", "falar com alguém", "agente humano",
+            "transferir a", "hablar con alguien",
+        ],
+        "booking": ["book", "reserve", "reservar", "agendar"],
+        "tour": ["tour", "passeio", "excursión"],
+        "pricing": ["price", "cost", "preço", "custo", "precio"],
+        "contact": ["contact", "phone", "email", "contato", "contacto"],
+    },
+    boundaries={"handoff": WHOLE},
+    default_boundary=PREFIX,
+)
+
 class AuroraIntelligence:
     """Aurora's GPT-4 powered intelligence with affective context"""
     
@@ -166,6 +186,15 @@ class AuroraIntelligence:
                 "tone": str
             }
         """
+        if not openai_breaker.allow_request():
+            # OpenAI circuit open - template answer without waiting for a failure
+            return {
+                "message": self._get_fallback_message(language),
+                "requires_handoff": True,
+                "suggested_actions": ["contact_support"],
+                "tone": "professional",
+            }
+        
         try:
             # Build system prompt with affective context
             system_prompt = self._build_system_prompt(language, customer_state, context)
@@ -185,15 +214,21 @@ class AuroraIntelligence:
                 frequency_penalty=0.3,  # Reduce repetition
             )
             
+            openai_breaker.record_success()
             assistant_message = response.choices[0].message.content
             
+            # Scan all keyword families in the response once
+            response_categories = RESPONSE_KEYWORDS.categories(assistant_message)
+            
             # Analyze if human handoff needed
             requires_handoff = self._detect_handoff_need(
-                assistant_message, customer_state, messages
+                assistant_message, customer_state, messages, response_categories
             )
             
             # Generate suggested actions
-            suggested_actions = self._generate_actions(assistant_message, context)
+            suggested_actions = self._generate_actions(
+                assistant_message, context, response_categories
+            )
             
             # Determine response tone
             tone = self._select_tone(customer_state) if customer_state else "welcoming"
@@ -206,6 +241,7 @@ class AuroraIntelligence:
             }
             
         except Exception as e:
+            openai_breaker.record_failure(e)
             print(f"❌ Aurora Intelligence error: {str(e)}")
             # Fallback response
             return {
@@ -241,6 +277,16 @@ class AuroraIntelligence:
 
 IMPORTANT: Adjust your response tone to match this emotional state. Be empathetic and appropriate."""
         
+        # Add conversation trajectory (incremental, from working memory)
+        trajectory = (context or {}).get("emotional_trajectory")
+        if trajectory and trajectory.get("message_count", 0) >= 2:
+            affective_context += f"""
+
+**CONVERSATION EMOTIONAL TRAJECTORY ({trajectory['message_count']} messages):**
+- Recent mood (EMA valence): {trajectory.get('ema_valence', 0.0):.2f}
+- Valence trend per message: {trajectory.get('valence_trend', 0.0):+.2f}
+- Volatility: {trajectory.get('volatility', 0.0):.2f}"""
+        
         # Add contextual information
         contextual_info = ""
         if context:
@@ -263,7 +309,8 @@ IMPORTANT: Adjust your response tone to match this emotional state. Be empatheti
         self,
         assistant_message: str,
         customer_state: Optional[AffectiveState],
-        messages: List[Dict[str, str]]
+        messages: List[Dict[str, str]],
+        categories: Optional[Set[str]] = None
     ) -> bool:
         """Detect if conversation should be handed off to human agent"""
         
@@ -275,16 +322,10 @@ IMPORTANT: Adjust your response tone to match this emotional state. Be empatheti
                 return True
         
         # Check for handoff keywords in assistant response
-        handoff_keywords = [
-            "transfer you to", "speak with someone", "human agent",
-            "transferir para", "falar com alguém", "agente humano",
-            "transferir a", "hablar con alguien", "agente humano"
-        ]
-        
-        message_lower = assistant_message.lower()
-        for keyword in handoff_keywords:
-            if keyword in message_lower:
-                return True
+        if categories is None:
+            categories = RESPONSE_KEYWORDS.categories(assistant_message)
+        if "handoff" in categories:
+            return True
         
         # Check conversation length - if stuck after many turns
         if len(messages) > 10:
@@ -293,28 +334,30 @@ IMPORTANT: Adjust your response tone to match this emotional state. Be empatheti
         return False
     
     def _generate_actions(
-        self, assistant_message: str, context: Optional[Dict[str, Any]]
+        self, assistant_message: str, context: Optional[Dict[str, Any]],
+        categories: Optional[Set[str]] = None
     ) -> List[str]:
         """Generate suggested UI actions based on response"""
         actions = []
         
-        message_lower = assistant_message.lower()
+        if categories is None:
+            categories = RESPONSE_KEYWORDS.categories(assistant_message)
         
         # Detect booking intent
-        if any(word in message_lower for word in ["book", "reserve", "reservar", "agendar"]):
+        if "booking" in categories:
             actions.append("view_tours")
             actions.append("start_booking")
         
         # Detect tour inquiry
-        if any(word in message_lower for word in ["tour", "passeio", "excursión"]):
+        if "tour" in categories:
             actions.append("view_tours")
         
         # Detect pricing inquiry
-        if any(word in message_lower for word in ["price", "cost", "preço", "custo", "precio"]):
+        if "pricing" in categories:
             actions.append("view_pricing")
         
         # Detect contact intent
-        if any(word in message_lower for word in ["contact", "phone", "email", "contato", "contacto"]):
+        if "contact" in categories:
             actions.append("contact_us")
         
         # Default action
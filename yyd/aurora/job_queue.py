@@ -0,0 +1,404 @@
+"""
+Aurora Job Queue
+================
+
+Durable background work on Postgres (aurora_jobs), instead of fire-and-forget:
+- Claims with FOR UPDATE SKIP LOCKED: any number of workers/nodes pull from
+  the same queue without blocking each other or double-processing
+- Retries with exponential backoff + jitter (runAt), up to maxAttempts
+- Dead letter: jobs out of attempts stay as status='dead' with their last
+  error, and can be requeued (python job_queue.py requeue <queue>); handlers
+  raise an exception with retryable = False to dead-letter without retrying
+- Jobs abandoned by a crashed worker (running past the visibility timeout)
+  are put back by the job_queue_reap scheduler job; complete/fail only touch
+  a job still held by this worker's claim, so a late finisher can't clobber
+  a job that was reaped and claimed again
+- Worker pool: AURORA_JOB_WORKERS asyncio workers per process, started from
+  the app lifespan; enqueues from the same process wake them immediately
+
+Queues:
+    embedding      {"id", "locales"}           semantic memory embeddings
+    outbound_send  {"channel", "to", "text"}   WhatsApp / Twilio / Facebook replies
+
+Usage:
+    python job_queue.py stats
+    python job_queue.py requeue outbound_send
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from psycopg2.extras import Json
+
+from memory import DatabaseConnection, UnitOfWork
+from metrics import metrics
+
+JOB_WORKERS = int(os.getenv("AURORA_JOB_WORKERS", "4"))
+JOB_MAX_ATTEMPTS = int(os.getenv("AURORA_JOB_MAX_ATTEMPTS", "6"))
+JOB_BACKOFF_BASE_SECONDS = float(os.getenv("AURORA_JOB_BACKOFF_BASE_SECONDS", "5"))
+JOB_BACKOFF_MAX_SECONDS = float(os.getenv("AURORA_JOB_BACKOFF_MAX_SECONDS", "3600"))
+JOB_VISIBILITY_TIMEOUT_SECONDS = int(os.getenv("AURORA_JOB_VISIBILITY_TIMEOUT_SECONDS", "300"))
+JOB_POLL_MAX_SECONDS = float(os.getenv("AURORA_JOB_POLL_MAX_SECONDS", "5"))
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobQueue:
+    """Postgres-backed job queue with per-queue async handlers"""
+
+    CLAIM_SQL = """
+        UPDATE aurora_jobs
+        SET status = 'running',
+            attempts = attempts + 1,
+            "lockedAt" = NOW(),
+            "lockedBy" = %s,
+            "updatedAt" = NOW()
+        WHERE id IN (
+            SELECT id FROM aurora_jobs
+            WHERE queue = ANY(%s) AND status = 'pending' AND "runAt" <= NOW()
+            ORDER BY "runAt"
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, queue, payload, attempts, "maxAttempts"
+    """
+
+    def __init__(self):
+        self.handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[Any]]] = {}
+        self._table_ready = False
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def handler(self, queue: str):
+        """Decorator: register the async handler for a queue"""
+        def register(func):
+            self.handlers[queue] = func
+            return func
+        return register
+
+    # ---------- Storage ----------
+
+    # Partial indexes have no Prisma equivalent, so `prisma db push` drops them;
+    # reap() (leader, every few minutes) puts them back
+    INDEXES_SQL = """
+        CREATE INDEX IF NOT EXISTS aurora_jobs_claim_idx
+            ON aurora_jobs (queue, "runAt") WHERE status = 'pending';
+        CREATE INDEX IF NOT EXISTS aurora_jobs_running_idx
+            ON aurora_jobs ("lockedAt") WHERE status = 'running';
+        CREATE UNIQUE INDEX IF NOT EXISTS aurora_jobs_dedupe_idx
+            ON aurora_jobs (queue, "dedupeKey")
+            WHERE "dedupeKey" IS NOT NULL AND status IN ('pending', 'running');
+    """
+
+    def ensure_table(self):
+        """Create aurora_jobs (also declared as AuroraJob in schema.prisma) and its indexes"""
+        if self._table_ready:
+            return
+        DatabaseConnection.execute_query("""
+            CREATE TABLE IF NOT EXISTS aurora_jobs (
+                id BIGSERIAL PRIMARY KEY,
+                queue TEXT NOT NULL,
+                payload JSONB NOT NULL DEFAULT '{}',
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INT NOT NULL DEFAULT 0,
+                "maxAttempts" INT NOT NULL DEFAULT 6,
+                "dedupeKey" TEXT,
+                "runAt" TIMESTAMP NOT NULL DEFAULT NOW(),
+                "lockedAt" TIMESTAMP,
+                "lockedBy" TEXT,
+                "lastError" TEXT,
+                "createdAt" TIMESTAMP NOT NULL DEFAULT NOW(),
+                "updatedAt" TIMESTAMP NOT NULL DEFAULT NOW()
+            );
+        """ + self.INDEXES_SQL, fetch="none")
+        self._table_ready = True
+
+    ENQUEUE_SQL = """
+        INSERT INTO aurora_jobs (queue, payload, "maxAttempts", "dedupeKey", "runAt")
+        VALUES (%s, %s, %s, %s, COALESCE(%s, NOW()))
+        ON CONFLICT (queue, "dedupeKey")
+            WHERE "dedupeKey" IS NOT NULL AND status IN ('pending', 'running')
+        DO NOTHING
+    """
+
+    def enqueue(self, queue: str, payload: Dict[str, Any], dedupe_key: Optional[str] = None,
+                run_at: Optional[datetime] = None, max_attempts: int = JOB_MAX_ATTEMPTS,
+                uow: Optional[UnitOfWork] = None):
+        """
+        Add a job (no-op if a pending/running job has the same dedupe_key)
+
+        With uow the insert joins that unit of work (same transaction as the
+        write that produced the work).
+        """
+        self.ensure_table()
+        params = (queue, Json(payload), max_attempts, dedupe_key, run_at)
+        if uow is not None:
+            uow.query(self.ENQUEUE_SQL, params)
+            uow.on_commit(self._notify)
+        else:
+            DatabaseConnection.execute_query(self.ENQUEUE_SQL, params, fetch="none")
+            self._notify()
+        metrics.increment(f"jobs.{queue}.enqueued")
+
+    async def enqueue_async(self, queue: str, payload: Dict[str, Any], **kwargs):
+        await asyncio.to_thread(self.enqueue, queue, payload, **kwargs)
+
+    def _notify(self):
+        """Wake this process's idle workers (safe from any thread)"""
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def claim(self, queues: List[str], limit: int = 1) -> List[Dict[str, Any]]:
+        self.ensure_table()
+        rows = DatabaseConnection.execute_query(self.CLAIM_SQL, (WORKER_ID, queues, limit)) or []
+        return [dict(row) for row in rows]
+
+    # A claim is identified by worker + attempt: reap() or another worker's
+    # claim changes one of them, and the stale holder must not touch the row
+    OWNED_SQL = """id = %s AND status = 'running' AND "lockedBy" = %s AND attempts = %s"""
+
+    def complete(self, job: Dict[str, Any]) -> bool:
+        """Delete a finished job; False if the claim was lost meanwhile"""
+        row = DatabaseConnection.execute_query(
+            f"DELETE FROM aurora_jobs WHERE {self.OWNED_SQL} RETURNING id",
+            (job["id"], WORKER_ID, job["attempts"]), fetch="one"
+        )
+        return row is not None
+
+    @staticmethod
+    def backoff_seconds(attempts: int) -> float:
+        delay = min(JOB_BACKOFF_MAX_SECONDS, JOB_BACKOFF_BASE_SECONDS * 2 ** max(0, attempts - 1))
+        return delay * random.uniform(0.8, 1.2)
+
+    def fail(self, job: Dict[str, Any], error: str, retryable: bool = True) -> Optional[str]:
+        """
+        Schedule a retry, or dead-letter the job when out of attempts (or not
+        retryable). Returns the new status, None if the claim was lost meanwhile.
+        """
+        if not retryable or job["attempts"] >= job["maxAttempts"]:
+            status, run_at = "dead", datetime.now()
+        else:
+            status, run_at = "pending", datetime.now() + timedelta(seconds=self.backoff_seconds(job["attempts"]))
+        row = DatabaseConnection.execute_query(f"""
+            UPDATE aurora_jobs
+            SET status = %s, "runAt" = %s, "lastError" = %s,
+                "lockedAt" = NULL, "lockedBy" = NULL, "updatedAt" = NOW()
+            WHERE {self.OWNED_SQL}
+            RETURNING id
+        """, (status, run_at, error[:2000], job["id"], WORKER_ID, job["attempts"]), fetch="one")
+        return status if row is not None else None
+
+    def reap(self, timeout_seconds: int = JOB_VISIBILITY_TIMEOUT_SECONDS) -> int:
+        """Return jobs stuck in 'running' (worker died) to the queue"""
+        self.ensure_table()
+        DatabaseConnection.execute_query(self.INDEXES_SQL, fetch="none")
+        rows = DatabaseConnection.execute_query("""
+            UPDATE aurora_jobs
+            SET status = CASE WHEN attempts >= "maxAttempts" THEN 'dead' ELSE 'pending' END,
+                "lastError" = COALESCE("lastError", 'visibility timeout'),
+                "lockedAt" = NULL, "lockedBy" = NULL, "updatedAt" = NOW()
+            WHERE status = 'running' AND "lockedAt" < NOW() - make_interval(secs => %s)
+            RETURNING id
+        """, (timeout_seconds,)) or []
+        if rows:
+            print(f"♻️ Requeued {len(rows)} abandoned jobs")
+            metrics.increment("jobs.reaped", len(rows))
+        return len(rows)
+
+    def requeue_dead(self, queue: str) -> int:
+        """Give dead-lettered jobs a fresh set of attempts"""
+        self.ensure_table()
+        rows = DatabaseConnection.execute_query("""
+            UPDATE aurora_jobs
+            SET status = 'pending', attempts = 0, "runAt" = NOW(), "updatedAt" = NOW()
+            WHERE queue = %s AND status = 'dead'
+            RETURNING id
+        """, (queue,)) or []
+        self._notify()
+        return len(rows)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        self.ensure_table()
+        rows = DatabaseConnection.execute_query("""
+            SELECT queue, status, COUNT(*) AS jobs
+            FROM aurora_jobs
+            GROUP BY queue, status
+        """) or []
+        result: Dict[str, Dict[str, int]] = {}
+        for row in rows:
+            result.setdefault(row["queue"], {})[row["status"]] = row["jobs"]
+        return result
+
+    # ---------- Processing ----------
+
+    async def process(self, job: Dict[str, Any]):
+        queue = job["queue"]
+        started = time.perf_counter()
+        try:
+            handler = self.handlers.get(queue)
+            if handler is None:
+                raise RuntimeError(f"No handler for queue '{queue}'")
+            await handler(job["payload"] or {})
+        except Exception as e:
+            retryable = getattr(e, "retryable", True)
+            status = await asyncio.to_thread(self.fail, job, f"{type(e).__name__}: {e}", retryable)
+            if status is None:
+                self._lost(job)
+                return
+            metrics.increment(f"jobs.{queue}.{'dead' if status == 'dead' else 'retried'}")
+            print(f"{'💀' if status == 'dead' else '🔁'} Job {job['id']} ({queue}) attempt "
+                  f"{job['attempts']}/{job['maxAttempts']} failed: {e}")
+            return
+        if not await asyncio.to_thread(self.complete, job):
+            self._lost(job)
+            return
+        metrics.increment(f"jobs.{queue}.succeeded")
+        metrics.observe(f"jobs.{queue}.seconds", time.perf_counter() - started)
+
+    @staticmethod
+    def _lost(job: Dict[str, Any]):
+        """The job ran past the visibility timeout and was reaped/claimed again"""
+        print(f"⚠️ Job {job['id']} ({job['queue']}) attempt {job['attempts']} lost its claim; result dropped")
+        metrics.increment(f"jobs.{job['queue']}.lost")
+
+
+class WorkerPool:
+    """N asyncio workers claiming jobs one at a time from the given queues"""
+
+    def __init__(self, queue: JobQueue, workers: int = JOB_WORKERS, queues: Optional[List[str]] = None):
+        self.queue = queue
+        self.workers = workers
+        self.queues = queues
+        self._tasks: List[asyncio.Task] = []
+        self._stopping: Optional[asyncio.Event] = None
+
+    async def start(self):
+        if self.workers <= 0:
+            return
+        self._stopping = asyncio.Event()
+        self.queue._loop = asyncio.get_running_loop()
+        self.queue._wake = asyncio.Event()
+        queues = self.queues or sorted(self.queue.handlers)
+        self._tasks = [asyncio.create_task(self._work(queues), name=f"job-worker-{i}")
+                       for i in range(self.workers)]
+        print(f"🧵 Job workers started: {self.workers} × {', '.join(queues)}")
+
+    async def stop(self, timeout: float = 10.0):
+        """Stop claiming; in-flight jobs get `timeout` seconds (then the reaper requeues them)"""
+        if not self._tasks:
+            return
+        self._stopping.set()
+        self.queue._wake.set()
+        done, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        self._tasks = []
+        self.queue._loop = None
+        print("🧵 Job workers stopped")
+
+    async def _idle(self, seconds: float):
+        wake = self.queue._wake
+        try:
+            await asyncio.wait_for(wake.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+        wake.clear()
+
+    async def _work(self, queues: List[str]):
+        poll = 0.2
+        while not self._stopping.is_set():
+            try:
+                jobs = await asyncio.to_thread(self.queue.claim, queues, 1)
+            except Exception as e:
+                print(f"⚠️ Job claim failed: {e}")
+                jobs = []
+                poll = JOB_POLL_MAX_SECONDS
+            if not jobs:
+                # Back off while idle; enqueues in this process wake us early
+                await self._idle(poll * random.uniform(0.8, 1.2))
+                poll = min(JOB_POLL_MAX_SECONDS, poll * 2)
+                continue
+            poll = 0.2
+            for job in jobs:
+                await self.queue.process(job)
+
+
+job_queue = JobQueue()
+worker_pool = WorkerPool(job_queue)
+
+
+# ---------- Handlers ----------
+
+@job_queue.handler("embedding")
+async def embed_semantic_memory(payload: Dict[str, Any]):
+    """Generate the missing locale embeddings of one semantic memory row"""
+    from memory import CONTENT_FIELDS, SemanticMemory
+    from rag import EmbeddingGenerator
+
+    memory_id = payload["id"]
+    row = await asyncio.to_thread(DatabaseConnection.execute_query, f"""
+        SELECT {', '.join(f'"{f}"' for f in CONTENT_FIELDS.values())},
+               {', '.join(f'"{f}" IS NULL AS "missing_{l}"' for l, f in SemanticMemory.EMBEDDING_FIELDS.items())}
+        FROM aurora_semantic_memory WHERE id = %s
+    """, (memory_id,), "one")
+    if row is None:
+        return  # Deleted meanwhile
+    locales = [l for l in payload.get("locales") or list(CONTENT_FIELDS) if row.get(f"missing_{l}")]
+    empty = [l for l in locales if not (row[CONTENT_FIELDS[l]] or "").strip()]
+    if empty:
+        # Nothing to embed: drop their pending entries instead of calling OpenAI
+        from embedding_health_check import EmbeddingHealthMonitor
+        for locale in empty:
+            await asyncio.to_thread(EmbeddingHealthMonitor.discard_pending, locale, [memory_id])
+        metrics.increment("embeddings.pending_discarded", len(empty))
+        locales = [l for l in locales if l not in empty]
+    if not locales:
+        return
+
+    vectors = await EmbeddingGenerator.batch_generate([row[CONTENT_FIELDS[l]] for l in locales])
+    embeddings = {l: v for l, v in zip(locales, vectors) if v is not None}
+    if embeddings:
+        await asyncio.to_thread(SemanticMemory.update_embeddings, memory_id, embeddings)
+    if len(embeddings) < len(locales):
+        missing = sorted(set(locales) - set(embeddings))
+        raise RuntimeError(f"Embedding unavailable for {', '.join(missing)} (quota or circuit open)")
+
+
+@job_queue.handler("outbound_send")
+async def deliver_message(payload: Dict[str, Any]):
+    import webhooks
+
+    sender = webhooks.SENDERS.get(payload["channel"])
+    if sender is None:
+        raise ValueError(f"Unknown channel '{payload['channel']}'")
+    await sender(payload["to"], payload["text"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aurora job queue")
+    parser.add_argument("command", choices=["stats", "requeue", "reap"])
+    parser.add_argument("queue", nargs="?", help="Queue for requeue")
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        stats = job_queue.stats()
+        if not stats:
+            print("📊 No jobs")
+        for queue, counts in sorted(stats.items()):
+            print(f"📊 {queue}: " + ", ".join(f"{status}={n}" for status, n in sorted(counts.items())))
+    elif args.command == "requeue":
+        if not args.queue:
+            parser.error("requeue needs a queue")
+        print(f"🔄 Requeued {job_queue.requeue_dead(args.queue)} dead jobs on {args.queue}")
+    else:
+        print(f"♻️ Requeued {job_queue.reap()} abandoned jobs")
+
+
+if __name__ == "__main__":
+    main()
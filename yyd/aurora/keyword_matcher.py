@@ -0,0 +1,156 @@
+"""
+Aurora Keyword Matcher
+======================
+
+Precompiled Aho-Corasick automaton for multilingual keyword families:
+- All families (handoff, tone, actions...) matched in one pass over the text
+- Optional accent folding ("alguém" == "alguem") and case folding
+- Per-family word-boundary mode:
+    whole  - keyword must be a whole word/phrase ("asesor" ≠ "asesoramiento")
+    prefix - keyword must start a word ("book" matches "booking")
+    none   - plain substring (legacy behaviour)
+
+Usage:
+    matcher = KeywordMatcher({"handoff": [...], "pricing": [...]})
+    matcher.categories(text)              # {"pricing"}
+    matcher.first_category(text, order)   # highest-priority family found
+"""
+
+import unicodedata
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+WHOLE = "whole"
+PREFIX = "prefix"
+NONE = "none"
+
+
+# Latin-1 Supplement + Latin Extended-A folded once with NFKD, applied with str.translate
+_ACCENT_TABLE = {
+    code: "".join(c for c in unicodedata.normalize("NFKD", chr(code)) if not unicodedata.combining(c))
+    for code in range(0xC0, 0x250)
+}
+
+
+def fold_text(text: str, fold_accents: bool = True) -> str:
+    """Lowercase and (optionally) strip diacritics"""
+    text = text.lower()
+    if not fold_accents or text.isascii():
+        return text
+    text = text.translate(_ACCENT_TABLE)
+    if text.isascii():
+        return text
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def _is_word_char(c: str) -> bool:
+    return c.isalnum() or c == "_"
+
+
+class _Alphabet(dict):
+    """str.translate table: pattern chars → 1..n, anything else → 0 (cached)"""
+
+    def __missing__(self, key: int) -> str:
+        self[key] = "\x00"
+        return "\x00"
+
+
+class KeywordMatcher:
+    """Multi-pattern matcher built once, reused on every message"""
+
+    def __init__(self, families: Dict[str, Iterable[str]],
+                 boundaries: Optional[Dict[str, str]] = None,
+                 default_boundary: str = WHOLE,
+                 fold_accents: bool = True):
+        self.fold_accents = fold_accents
+        self.families = list(families)
+        boundaries = boundaries or {}
+
+        # Trie: goto[state] = {char: next_state}
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[Tuple[str, str, int, str]]] = [[]]
+
+        for category, keywords in families.items():
+            mode = boundaries.get(category, default_boundary)
+            for keyword in keywords:
+                pattern = fold_text(keyword, fold_accents)
+                if not pattern:
+                    continue
+                state = 0
+                for char in pattern:
+                    nxt = goto[state].get(char)
+                    if nxt is None:
+                        nxt = len(goto)
+                        goto[state][char] = nxt
+                        goto.append({})
+                        outputs.append([])
+                    state = nxt
+                outputs[state].append((category, keyword, len(pattern), mode))
+
+        # Compact alphabet so transitions are list lookups on small ints
+        chars = sorted({c for state in goto for c in state})
+        if len(chars) > 254:
+            raise ValueError("Keyword alphabet too large for KeywordMatcher")
+        code = {c: i + 1 for i, c in enumerate(chars)}
+        self._alphabet = _Alphabet({ord(c): chr(i) for c, i in code.items()})
+        width = len(chars) + 1
+
+        # Failure links (BFS), folded into a full transition table so the
+        # scan is a single list lookup per character
+        fail = [0] * len(goto)
+        rows: List[List[int]] = [[0] * width for _ in goto]
+        for c, nxt in goto[0].items():
+            rows[0][code[c]] = nxt
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            row = list(rows[fail[state]])
+            for c, nxt in goto[state].items():
+                row[code[c]] = nxt
+            rows[state] = row
+            outputs[state] = outputs[state] + outputs[fail[state]]
+            for c, nxt in goto[state].items():
+                fail[nxt] = rows[fail[state]][code[c]]
+                queue.append(nxt)
+
+        self._rows = rows
+        self._outputs = outputs
+        self.state_count = len(goto)
+
+    def find(self, text: str) -> List[Tuple[str, str]]:
+        """(category, keyword) for every match, in text order"""
+        folded = fold_text(text, self.fold_accents)
+        codes = folded.translate(self._alphabet).encode("latin-1")
+        rows = self._rows
+        outputs = self._outputs
+        size = len(folded)
+        found: List[Tuple[str, str]] = []
+
+        state = 0
+        for end, c in enumerate(codes):
+            state = rows[state][c]
+            if not outputs[state]:
+                continue
+            for category, keyword, length, mode in outputs[state]:
+                if mode != NONE:
+                    start = end - length + 1
+                    if start > 0 and _is_word_char(folded[start - 1]):
+                        continue
+                    if (mode == WHOLE and end + 1 < size
+                            and _is_word_char(folded[end + 1])):
+                        continue
+                found.append((category, keyword))
+        return found
+
+    def categories(self, text: str) -> Set[str]:
+        """Families with at least one match"""
+        return {category for category, _ in self.find(text)}
+
+    def first_category(self, text: str, priority: Optional[List[str]] = None) -> Optional[str]:
+        """Highest-priority family found (priority defaults to declaration order)"""
+        matched = self.categories(text)
+        for category in priority or self.families:
+            if category in matched:
+                return category
+        return None
@@ -0,0 +1,180 @@
+"""
+Aurora VAD Lexicon Store
+========================
+
+Large multilingual (en/pt/es) VAD lexicon in a compact binary file:
+- Sorted fixed-width UTF-8 string table + float16 (n, 3) VAD array
+- Memory-mapped read-only, so every uvicorn worker shares the same pages
+- Token lookup with np.searchsorted (no per-process dict of 50k entries)
+
+File layout (little-endian):
+    magic  b"AVAD" | version u16 | width u16 | count u32 | reserved u32
+    strings  count × S{width}   (sorted, null-padded)
+    vad      count × 3 × f16    (valence -1..1, arousal 0..1, dominance 0..1)
+
+Build from TSV files (word, valence, arousal, dominance - e.g. NRC VAD):
+    python lexicon_store.py build nrc_en.tsv nrc_pt.tsv nrc_es.tsv -o vad.lex
+    python lexicon_store.py info vad.lex
+
+Enable with AURORA_VAD_LEXICON_PATH=/path/to/vad.lex
+"""
+
+import argparse
+import os
+import re
+import struct
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+LEXICON_PATH = os.getenv("AURORA_VAD_LEXICON_PATH")
+
+MAGIC = b"AVAD"
+VERSION = 1
+HEADER = struct.Struct("<4sHHII")
+
+_WORD = re.compile(r"^\w+$")
+
+
+class VADLexiconStore:
+    """Read-only memory-mapped VAD lexicon"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._map = np.memmap(path, dtype=np.uint8, mode="r")
+
+        magic, version, width, count, _ = HEADER.unpack_from(self._map[:HEADER.size].tobytes())
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a VAD lexicon file (v{VERSION}): {path}")
+
+        self.width = width
+        self.count = count
+        # Zero-copy views into the shared mapping
+        self.strings = np.ndarray((count,), dtype=f"S{width}", buffer=self._map, offset=HEADER.size)
+        self.vad = np.ndarray((count, 3), dtype="<f2", buffer=self._map,
+                              offset=HEADER.size + count * width)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def lookup(self, tokens: List[str]) -> np.ndarray:
+        """Row index per token (-1 if absent)"""
+        if not tokens or self.count == 0:
+            return np.full(len(tokens), -1, dtype=np.int64)
+
+        encoded = [t.encode("utf-8") for t in tokens]
+        fits = np.fromiter((len(e) <= self.width for e in encoded), dtype=bool, count=len(encoded))
+        # Over-long tokens would be truncated by the S{width} cast - never match them
+        keys = np.array([e if ok else b"" for e, ok in zip(encoded, fits)], dtype=self.strings.dtype)
+
+        positions = np.minimum(np.searchsorted(self.strings, keys), self.count - 1)
+        found = fits & (self.strings[positions] == keys)
+        return np.where(found, positions, -1).astype(np.int64)
+
+    def get(self, token: str) -> Optional[Tuple[float, float, float]]:
+        index = int(self.lookup([token])[0])
+        if index < 0:
+            return None
+        v, a, d = self.vad[index].astype(np.float64)
+        return float(v), float(a), float(d)
+
+
+def load_lexicon_store(path: Optional[str] = LEXICON_PATH) -> Optional[VADLexiconStore]:
+    """Open the configured lexicon file; None if unset or unreadable"""
+    if not path:
+        return None
+    try:
+        started = time.perf_counter()
+        store = VADLexiconStore(path)
+        print(f"✅ VAD lexicon loaded: {len(store)} entries in "
+              f"{(time.perf_counter() - started) * 1000:.1f}ms ({path})")
+        return store
+    except Exception as e:
+        print(f"⚠️ VAD lexicon not loaded ({path}): {e}")
+        return None
+
+
+# ---------- Build ----------
+
+def read_tsv(path: str, unit_valence: bool = True) -> Dict[str, Tuple[float, float, float]]:
+    """
+    Read word<TAB>valence<TAB>arousal<TAB>dominance rows
+
+    With unit_valence (NRC style, 0..1) valence is mapped to -1..1.
+    Multi-word entries and header lines are skipped.
+    """
+    entries: Dict[str, Tuple[float, float, float]] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) < 4:
+                continue
+            word = parts[0].strip().lower()
+            try:
+                v, a, d = (float(x) for x in parts[1:4])
+            except ValueError:
+                continue  # header
+            if not _WORD.match(word):
+                continue
+            if unit_valence:
+                v = v * 2.0 - 1.0
+            entries.setdefault(word, (
+                float(np.clip(v, -1.0, 1.0)),
+                float(np.clip(a, 0.0, 1.0)),
+                float(np.clip(d, 0.0, 1.0)),
+            ))
+    return entries
+
+
+def build_lexicon(entries: Dict[str, Tuple[float, float, float]], output: str) -> int:
+    """Write entries to the binary format; returns entry count"""
+    encoded = {w.encode("utf-8"): vad for w, vad in entries.items()}
+    keys = sorted(encoded)
+    width = max((len(k) for k in keys), default=1)
+
+    strings = np.array(keys, dtype=f"S{width}")
+    vad = np.array([encoded[k] for k in keys], dtype="<f2").reshape(-1, 3)
+
+    with open(output, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, width, len(keys), 0))
+        f.write(strings.tobytes())
+        f.write(vad.tobytes())
+    return len(keys)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build / inspect Aurora VAD lexicon files")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Build binary lexicon from TSV files")
+    build.add_argument("inputs", nargs="+", help="TSV files; earlier files win on duplicates")
+    build.add_argument("-o", "--output", required=True)
+    build.add_argument("--signed-valence", action="store_true",
+                       help="Input valence already in -1..1 (default: 0..1, NRC style)")
+
+    info = sub.add_parser("info", help="Show lexicon stats and load time")
+    info.add_argument("path")
+    info.add_argument("words", nargs="*", help="Optional words to look up")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        entries: Dict[str, Tuple[float, float, float]] = {}
+        for path in args.inputs:
+            for word, vad in read_tsv(path, unit_valence=not args.signed_valence).items():
+                entries.setdefault(word, vad)
+        count = build_lexicon(entries, args.output)
+        size = os.path.getsize(args.output)
+        print(f"✅ Wrote {count} entries to {args.output} ({size / 1024:.0f} KiB)")
+    else:
+        started = time.perf_counter()
+        store = VADLexiconStore(args.path)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"📊 {args.path}: {len(store)} entries, width {store.width}, opened in {elapsed:.2f}ms")
+        for word in args.words:
+            print(f"  {word}: {store.get(word.lower())}")
+
+
+if __name__ == "__main__":
+    main()
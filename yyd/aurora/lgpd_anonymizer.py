@@ -0,0 +1,246 @@
+"""
+Aurora LGPD Anonymizer
+======================
+
+Incremental anonymization of episodic memory older than 18 months:
+- High-water mark ("createdAt", id) kept in aurora_maintenance_state, so each
+  run continues where the last one stopped instead of rescanning the table
+- Keyset-paginated batches (AURORA_ANONYMIZE_BATCH_SIZE rows), each one short
+  transaction that also advances the watermark
+- Throttled: AURORA_ANONYMIZE_PAUSE_SECONDS between batches, statement_timeout
+  per batch, optional time budget per run
+- Progress via metrics (lgpd.anonymized, lgpd.batches, lgpd.lag_days) and
+  printed reports
+
+The "createdAt" range predicate also prunes partitions (partitioning.py), so
+batches walk the table one partition at a time.
+
+Usage:
+    python lgpd_anonymizer.py [--batch-size 500] [--pause 0.2] [--max-seconds 60]
+    python lgpd_anonymizer.py --status
+    python lgpd_anonymizer.py --reset
+"""
+
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from psycopg2.extras import Json, RealDictCursor
+
+from memory import ANONYMIZE_BATCH_SIZE, DatabaseConnection
+from metrics import metrics
+
+ANONYMIZE_PAUSE_SECONDS = float(os.getenv("AURORA_ANONYMIZE_PAUSE_SECONDS", "0.2"))
+ANONYMIZE_STATEMENT_TIMEOUT = os.getenv("AURORA_ANONYMIZE_STATEMENT_TIMEOUT", "30s")
+RETENTION = timedelta(days=18 * 30)
+
+JOB = "em_anonymize"
+START = (datetime(1970, 1, 1), "")
+
+_state_table_ready = False
+
+
+def ensure_state_table():
+    """aurora_maintenance_state: one row per incremental maintenance job (mirrors the Prisma model)"""
+    global _state_table_ready
+    if _state_table_ready:
+        return
+    DatabaseConnection.execute_query("""
+        CREATE TABLE IF NOT EXISTS aurora_maintenance_state (
+            job TEXT PRIMARY KEY,
+            watermark JSONB NOT NULL DEFAULT '{}',
+            processed BIGINT NOT NULL DEFAULT 0,
+            "updatedAt" TIMESTAMP NOT NULL DEFAULT NOW()
+        )
+    """, fetch="none")
+    _state_table_ready = True
+
+
+def _parse_watermark(watermark: Optional[Dict[str, Any]]) -> Tuple[datetime, str]:
+    if not watermark or not watermark.get("createdAt"):
+        return START
+    return datetime.fromisoformat(watermark["createdAt"]), watermark.get("id") or ""
+
+
+class EpisodicAnonymizer:
+    """Batched, resumable LGPD anonymization of aurora_episodic_memory"""
+
+    BATCH_SQL = """
+        WITH batch AS (
+            SELECT id, "createdAt"
+            FROM aurora_episodic_memory
+            WHERE "createdAt" >= %(after_ts)s
+              AND ("createdAt", id) > (%(after_ts)s, %(after_id)s)
+              AND "createdAt" < %(cutoff)s
+            ORDER BY "createdAt", id
+            LIMIT %(limit)s
+        ),
+        updated AS (
+            UPDATE aurora_episodic_memory em
+            SET "customerId" = NULL,
+                content = '[ANONYMIZED]',
+                "anonymizedAt" = NOW()
+            FROM batch
+            WHERE em.id = batch.id
+              AND em."createdAt" = batch."createdAt"
+              AND em."anonymizedAt" IS NULL
+            RETURNING em.id
+        ),
+        last AS (
+            SELECT "createdAt", id FROM batch
+            ORDER BY "createdAt" DESC, id DESC
+            LIMIT 1
+        ),
+        saved AS (
+            UPDATE aurora_maintenance_state
+            SET watermark = jsonb_build_object(
+                    'createdAt', to_char(last."createdAt", 'YYYY-MM-DD"T"HH24:MI:SS.US'),
+                    'id', last.id
+                ),
+                processed = processed + (SELECT COUNT(*) FROM updated),
+                "updatedAt" = NOW()
+            FROM last
+            WHERE job = %(job)s
+            RETURNING watermark
+        )
+        SELECT (SELECT COUNT(*) FROM batch) AS scanned,
+               (SELECT COUNT(*) FROM updated) AS anonymized,
+               (SELECT watermark FROM saved) AS watermark
+    """
+
+    def __init__(self, batch_size: int = ANONYMIZE_BATCH_SIZE,
+                 pause_seconds: float = ANONYMIZE_PAUSE_SECONDS):
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+
+    def state(self) -> Dict[str, Any]:
+        ensure_state_table()
+        DatabaseConnection.execute_query("""
+            INSERT INTO aurora_maintenance_state (job, watermark) VALUES (%s, %s)
+            ON CONFLICT (job) DO NOTHING
+        """, (JOB, Json({})), fetch="none")
+        row = DatabaseConnection.execute_query(
+            "SELECT * FROM aurora_maintenance_state WHERE job = %s", (JOB,), fetch="one"
+        )
+        return dict(row)
+
+    def reset(self):
+        """Start over from the oldest row (e.g. after changing the retention)"""
+        self.state()
+        DatabaseConnection.execute_query("""
+            UPDATE aurora_maintenance_state
+            SET watermark = '{}', processed = 0, "updatedAt" = NOW()
+            WHERE job = %s
+        """, (JOB,), fetch="none")
+
+    def remaining(self, cutoff: Optional[datetime] = None) -> int:
+        """Rows between the watermark and the cutoff (index range count)"""
+        cutoff = cutoff or datetime.now() - RETENTION
+        after_ts, after_id = _parse_watermark(self.state()["watermark"])
+        row = DatabaseConnection.execute_query("""
+            SELECT COUNT(*) AS remaining
+            FROM aurora_episodic_memory
+            WHERE "createdAt" >= %s AND ("createdAt", id) > (%s, %s) AND "createdAt" < %s
+        """, (after_ts, after_ts, after_id, cutoff), fetch="one")
+        return row["remaining"]
+
+    def run_batch(self, cutoff: datetime) -> Dict[str, Any]:
+        """One short transaction: lock the job row, anonymize a batch, advance the watermark"""
+        with DatabaseConnection.connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute("SELECT set_config('statement_timeout', %s, true)",
+                            (ANONYMIZE_STATEMENT_TIMEOUT,))
+                # Serializes concurrent runs (another worker waits, then continues after us)
+                cur.execute("SELECT watermark FROM aurora_maintenance_state WHERE job = %s FOR UPDATE",
+                            (JOB,))
+                after_ts, after_id = _parse_watermark(cur.fetchone()["watermark"])
+                cur.execute(self.BATCH_SQL, {
+                    "after_ts": after_ts, "after_id": after_id, "cutoff": cutoff,
+                    "limit": self.batch_size, "job": JOB,
+                })
+                result = dict(cur.fetchone())
+            conn.commit()
+        result["watermark"] = _parse_watermark(result["watermark"]) if result["watermark"] else (after_ts, after_id)
+        return result
+
+    def run(self, max_batches: Optional[int] = None, max_seconds: Optional[float] = None,
+            report_every: int = 0) -> Dict[str, Any]:
+        """
+        Anonymize until caught up (or a batch/time budget runs out)
+
+        report_every: print progress every N batches (0 = only the summary)
+        """
+        self.state()
+        cutoff = datetime.now() - RETENTION
+        started = time.monotonic()
+        stats = {"batches": 0, "scanned": 0, "anonymized": 0, "caught_up": False}
+        watermark = START
+
+        while True:
+            batch = self.run_batch(cutoff)
+            stats["batches"] += 1
+            stats["scanned"] += batch["scanned"]
+            stats["anonymized"] += batch["anonymized"]
+            watermark = batch["watermark"]
+            metrics.increment("lgpd.batches")
+            metrics.increment("lgpd.anonymized", batch["anonymized"])
+            if watermark != START:
+                metrics.set_gauge("lgpd.lag_days", max(0.0, (cutoff - watermark[0]).total_seconds() / 86400))
+
+            if report_every and stats["batches"] % report_every == 0:
+                elapsed = time.monotonic() - started
+                print(f"🔒 LGPD: {stats['anonymized']} anonymized / {stats['scanned']} scanned "
+                      f"in {stats['batches']} batches ({stats['scanned'] / max(elapsed, 1e-9):.0f} rows/s), "
+                      f"at {watermark[0]:%Y-%m-%d %H:%M}")
+
+            if batch["scanned"] < self.batch_size:
+                stats["caught_up"] = True
+                metrics.set_gauge("lgpd.lag_days", 0)
+                break
+            if max_batches is not None and stats["batches"] >= max_batches:
+                break
+            if max_seconds is not None and time.monotonic() - started >= max_seconds:
+                break
+            time.sleep(self.pause_seconds)
+
+        stats["seconds"] = round(time.monotonic() - started, 3)
+        stats["watermark"] = watermark[0].isoformat() if watermark != START else None
+        if stats["anonymized"] or report_every:
+            print(f"🔒 LGPD: anonymized {stats['anonymized']} episodic memories "
+                  f"({'caught up' if stats['caught_up'] else 'more pending'})")
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental LGPD anonymization of episodic memory")
+    parser.add_argument("--batch-size", type=int, default=ANONYMIZE_BATCH_SIZE)
+    parser.add_argument("--pause", type=float, default=ANONYMIZE_PAUSE_SECONDS,
+                        help="Seconds to sleep between batches")
+    parser.add_argument("--max-batches", type=int)
+    parser.add_argument("--max-seconds", type=float)
+    parser.add_argument("--status", action="store_true", help="Show watermark and remaining rows")
+    parser.add_argument("--reset", action="store_true", help="Restart from the oldest row")
+    args = parser.parse_args()
+
+    anonymizer = EpisodicAnonymizer(batch_size=args.batch_size, pause_seconds=args.pause)
+    if args.reset:
+        anonymizer.reset()
+        print("🔄 Watermark reset")
+    if args.status:
+        state = anonymizer.state()
+        print(f"📊 watermark={state['watermark'] or '-'} processed={state['processed']} "
+              f"updated={state['updatedAt']} remaining={anonymizer.remaining()}")
+        return
+    if args.reset:
+        return
+
+    remaining = anonymizer.remaining()
+    print(f"\n🔒 Anonymizing episodic memory older than {RETENTION.days} days ({remaining} rows to scan)...")
+    stats = anonymizer.run(max_batches=args.max_batches, max_seconds=args.max_seconds, report_every=10)
+    print(f"✅ {stats}")
+
+
+if __name__ == "__main__":
+    main()
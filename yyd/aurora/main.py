@@ -11,12 +11,33 @@ import os
 from datetime import datetime
 import json
 import asyncio
+from contextlib import asynccontextmanager
 from webhooks import router as webhooks_router
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background maintenance (scheduler.py) and job workers (job_queue.py); flush counters on shutdown"""
+    from job_queue import worker_pool
+    from scheduler import SCHEDULER_ENABLED, scheduler
+    
+    if SCHEDULER_ENABLED:
+        await scheduler.start()
+    await worker_pool.start()
+    yield
+    await worker_pool.stop()
+    if SCHEDULER_ENABLED:
+        await scheduler.stop()
+    try:
+        from memory import SemanticMemory
+        await asyncio.to_thread(SemanticMemory.flush_usage)
+    except Exception as e:
+        print(f"⚠️ Usage counter flush on shutdown failed: {e}")
+
 app = FastAPI(
     title="Aurora IA",
     description="Multilingual AI Concierge with Affective Mathematics",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware for communication with Next.js apps
@@ -54,22 +75,44 @@ class HealthResponse(BaseModel):
     version: str
     timestamp: str
     services: Dict[str, bool]
+    circuit_breakers: Dict[str, Dict[str, Any]] = {}
 
 # Health check endpoint
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint for monitoring"""
+    from circuit_breaker import openai_breaker
+    
+    openai_circuit_open = openai_breaker.is_open()
     return HealthResponse(
-        status="healthy",
+        status="degraded" if openai_circuit_open else "healthy",
         version="1.0.0",
         timestamp=datetime.utcnow().isoformat(),
         services={
-            "openai": bool(os.getenv("OPENAI_API_KEY")),
+            "openai": bool(os.getenv("OPENAI_API_KEY")) and not openai_circuit_open,
             "database": True,  # TODO: Check actual DB connection
             "embeddings": False,  # TODO: Implement pgvector check
+        },
+        circuit_breakers={
+            "openai": openai_breaker.to_dict()
         }
     )
 
+# Metrics endpoint
+@app.get("/metrics")
+async def get_metrics():
+    """In-process pipeline metrics (per worker)"""
+    from metrics import metrics
+    from response_cache import response_cache
+    from scheduler import scheduler
+    
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "response_cache": response_cache.stats(),
+        "scheduler": scheduler.status(),
+        **metrics.snapshot()
+    }
+
 # Main chat endpoint
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
@@ -83,13 +126,17 @@ async def chat(request: ChatRequest):
     - Progressive autonomy (ChatGPT used LESS as KB grows)
     - Affective state analysis (ℝ³ mathematics)
     - Human handoff detection
+    - Per-request deadline (graceful degradation when the budget runs low)
     """
     try:
         from affective_mathematics import AffectiveAnalyzer
         from rag import decision_engine
-        from memory import MemoryManager
+        from memory import MemoryManager, WorkingMemory
+        from deadline import Deadline, PERSISTENCE_MIN_BUDGET
         import uuid
         
+        deadline = Deadline(name="chat")
+        
         # Generate session ID if not provided
         session_id = request.context.get('session_id', str(uuid.uuid4())) if request.context else str(uuid.uuid4())
         conversation_id = request.context.get('conversation_id', str(uuid.uuid4())) if request.context else str(uuid.uuid4())
@@ -98,26 +145,39 @@ async def chat(request: ChatRequest):
         user_message = request.messages[-1].content if request.messages else ""
         
         # Analyze affective state using ℝ³ mathematics
-        analyzer = AffectiveAnalyzer()
-        customer_state = analyzer.analyze_text(user_message, request.language)
-        emotional_dict = customer_state.to_dict()
+        with deadline.stage("affect"):
+            analyzer = AffectiveAnalyzer()
+            customer_state = analyzer.analyze_text(user_message, request.language)
+            emotional_dict = customer_state.to_dict()
         
-        # Store in memory layers
-        memory_manager = MemoryManager()
-        memory_manager.store_conversation_snapshot(
-            session_id=session_id,
-            conversation_id=conversation_id,
-            customer_id=request.customer_id or "anonymous",
-            messages=[{"role": msg.role, "content": msg.content} for msg in request.messages],
-            emotional_state=emotional_dict
-        )
+        # Incremental emotional trajectory for this conversation (WM)
+        trajectory = await deadline.run("trajectory", asyncio.to_thread(
+            WorkingMemory.track_emotion, session_id, customer_state
+        ))
+        
+        # Store in memory layers (skipped when the budget is nearly spent)
+        if deadline.has_budget(PERSISTENCE_MIN_BUDGET):
+            memory_manager = MemoryManager()
+            await deadline.run("memory", asyncio.to_thread(
+                memory_manager.store_conversation_snapshot,
+                session_id=session_id,
+                conversation_id=conversation_id,
+                customer_id=request.customer_id or "anonymous",
+                new_messages=[{"role": msg.role, "content": msg.content} for msg in request.messages[-1:]],
+                emotional_state=emotional_dict,
+                trajectory=trajectory
+            ))
+        else:
+            memory_manager = None
+            deadline.degrade("skip_persistence")
         
         # Build conversation context from working memory
         conversation_context = {
             "session_id": session_id,
             "conversation_id": conversation_id,
             "intent": request.context.get('intent') if request.context else None,
-            "message_count": len(request.messages)
+            "message_count": len(request.messages),
+            "emotional_trajectory": trajectory
         }
         
         # Generate response using RAG + autonomous decision engine
@@ -126,7 +186,8 @@ async def chat(request: ChatRequest):
             emotional_state=emotional_dict,
             conversation_context=conversation_context,
             locale=request.language,
-            messages=[{"role": msg.role, "content": msg.content} for msg in request.messages]
+            messages=[{"role": msg.role, "content": msg.content} for msg in request.messages],
+            deadline=deadline
         )
         
         # Detect handoff conditions using centralized system
@@ -135,19 +196,28 @@ async def chat(request: ChatRequest):
         requires_handoff, handoff_reason = detect_handoff(
             user_message=user_message,
             emotional_state=emotional_dict,
-            response_confidence=response_data.get('confidence', 1.0)
+            response_confidence=response_data.get('confidence', 1.0),
+            trajectory=trajectory
         )
         
-        # Create handoff record if needed
+        # Create handoff record if needed (never skipped, minimum 1s)
         if requires_handoff:
-            await create_handoff_record(
+            await deadline.run("handoff", create_handoff_record(
                 conversation_id=conversation_id,
                 lead_id=None,  # TODO: Link to lead if exists
                 reason=handoff_reason,
                 emotional_state=emotional_dict,
                 confidence=response_data.get('confidence', 1.0),
                 notes=f"Auto-detected during chat: {user_message[:100]}"
-            )
+            ), min_timeout=1.0)
+        
+        # WM: the reply completes the turn (if the user's turn was stored)
+        if memory_manager is not None:
+            await deadline.run("memory_reply", asyncio.to_thread(
+                memory_manager.store_reply, session_id, conversation_id, response_data['message']
+            ), min_timeout=PERSISTENCE_MIN_BUDGET)
+        
+        deadline.finish()
         
         # Suggested actions based on source
         suggested_actions = []
@@ -192,6 +262,37 @@ async def calculate_affective_state(text: str, language: str = "en"):
         "magnitude": state.magnitude(),
     }
 
+class AffectiveBatchRequest(BaseModel):
+    texts: List[str]
+    languages: Optional[List[str]] = None  # Per-text language (defaults to `language`)
+    language: str = "en"
+
+@app.post("/affective-state/batch")
+async def calculate_affective_state_batch(request: AffectiveBatchRequest):
+    """
+    Batch VAD scoring for analytics / backfills
+    
+    Returns one [valence, arousal, dominance, confidence] row per text plus
+    the classified emotion. Large batches fan out to a process pool.
+    """
+    from affective_mathematics import AffectiveAnalyzer
+    
+    if request.languages is not None and len(request.languages) != len(request.texts):
+        raise HTTPException(status_code=422, detail="languages must match texts length")
+    
+    analyzer = AffectiveAnalyzer()
+    # CPU-bound: keep the event loop free
+    states, emotions = await asyncio.to_thread(
+        analyzer.analyze_batch, request.texts, request.languages or request.language
+    )
+    
+    return {
+        "count": len(emotions),
+        "columns": ["valence", "arousal", "dominance", "confidence"],
+        "states": states.tolist(),
+        "emotions": emotions,
+    }
+
 # Embeddings endpoint
 @app.post("/embeddings")
 async def generate_embeddings(texts: List[str]):
@@ -203,7 +304,7 @@ async def generate_embeddings(texts: List[str]):
         embeddings = await generator.batch_generate(texts)
         
         return {
-            "embeddings": embeddings,
+            "embeddings": [e.tolist() if e is not None else None for e in embeddings],
             "model": "text-embedding-3-small",
             "count": len(embeddings)
         }
@@ -352,7 +453,8 @@ async def cleanup_memory():
         from memory import MemoryManager
         
         manager = MemoryManager()
-        manager.cleanup_expired()
+        # Partition maintenance and the anonymizer batch block; keep them off the loop
+        await asyncio.to_thread(manager.cleanup_expired)
         
         return {
             "success": True,
@@ -387,7 +489,8 @@ async def websocket_chat(websocket: WebSocket):
     try:
         from affective_mathematics import AffectiveAnalyzer
         from rag import decision_engine
-        from memory import MemoryManager
+        from memory import MemoryManager, WorkingMemory
+        from deadline import Deadline, PERSISTENCE_MIN_BUDGET
         import uuid
         
         print(f"✅ WebSocket connection established: {websocket.client}")
@@ -410,10 +513,13 @@ async def websocket_chat(websocket: WebSocket):
                 continue
             
             try:
+                deadline = Deadline(name="ws_chat")
+                
                 # 1. Analyze affective state
-                analyzer = AffectiveAnalyzer()
-                customer_state = analyzer.analyze_text(user_message, language)
-                emotional_dict = customer_state.to_dict()
+                with deadline.stage("affect"):
+                    analyzer = AffectiveAnalyzer()
+                    customer_state = analyzer.analyze_text(user_message, language)
+                    emotional_dict = customer_state.to_dict()
                 
                 # Send affective state to client
                 await websocket.send_json({
@@ -424,23 +530,33 @@ async def websocket_chat(websocket: WebSocket):
                     }
                 })
                 
-                # 2. Store in memory
-                memory_manager = MemoryManager()
+                # 2. Update trajectory + store in memory (skipped when the budget is nearly spent)
                 messages_context = [{"role": "user", "content": user_message}]
+                trajectory = await deadline.run("trajectory", asyncio.to_thread(
+                    WorkingMemory.track_emotion, session_id, customer_state
+                ))
                 
-                memory_manager.store_conversation_snapshot(
-                    session_id=session_id,
-                    conversation_id=conversation_id,
-                    customer_id=customer_id,
-                    messages=messages_context,
-                    emotional_state=emotional_dict
-                )
+                if deadline.has_budget(PERSISTENCE_MIN_BUDGET):
+                    memory_manager = MemoryManager()
+                    await deadline.run("memory", asyncio.to_thread(
+                        memory_manager.store_conversation_snapshot,
+                        session_id=session_id,
+                        conversation_id=conversation_id,
+                        customer_id=customer_id,
+                        new_messages=messages_context,
+                        emotional_state=emotional_dict,
+                        trajectory=trajectory
+                    ))
+                else:
+                    memory_manager = None
+                    deadline.degrade("skip_persistence")
                 
                 # 3. Build context
                 conversation_context = {
                     "session_id": session_id,
                     "conversation_id": conversation_id,
-                    "message_count": 1
+                    "message_count": 1,
+                    "emotional_trajectory": trajectory
                 }
                 
                 # 4. Get response using RAG decision engine
@@ -449,8 +565,17 @@ async def websocket_chat(websocket: WebSocket):
                     emotional_state=emotional_dict,
                     conversation_context=conversation_context,
                     locale=language,
-                    messages=messages_context
+                    messages=messages_context,
+                    deadline=deadline
                 )
+                # WM: the reply completes the turn (if the user's turn was stored)
+                if memory_manager is not None:
+                    await deadline.run("memory_reply", asyncio.to_thread(
+                        memory_manager.store_reply, session_id, conversation_id, response_data['message']
+                    ), min_timeout=PERSISTENCE_MIN_BUDGET)
+                
+                # Streaming below is paced for UX - not part of the budget
+                deadline.finish()
                 
                 # Simulate streaming for smooth UX (split response into tokens)
                 full_response = response_data['message']
@@ -475,19 +600,20 @@ async def websocket_chat(websocket: WebSocket):
                 requires_handoff, handoff_reason = detect_handoff(
                     user_message=user_message,
                     emotional_state=emotional_dict,
-                    response_confidence=response_data.get('confidence', 1.0)
+                    response_confidence=response_data.get('confidence', 1.0),
+                    trajectory=trajectory
                 )
                 
                 # Create handoff record if needed
                 if requires_handoff:
-                    await create_handoff_record(
+                    await deadline.run("handoff", create_handoff_record(
                         conversation_id=conversation_id,
                         lead_id=None,
                         reason=handoff_reason,
                         emotional_state=emotional_dict,
                         confidence=response_data.get('confidence', 1.0),
                         notes=f"WebSocket auto-detected: {user_message[:100]}"
-                    )
+                    ), min_timeout=1.0)
                 
                 # 6. Send completion message
                 await websocket.send_json({
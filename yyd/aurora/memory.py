@@ -3,7 +3,7 @@ Aurora Memory System - 7 Layers
 ================================
 
 Implements the complete memory hierarchy as per whitepaper:
-- SC (Sensory Context): 30s cache, raw input
+- SC (Sensory Context): 30s cache, raw input (in-process by default)
 - WM (Working Memory): 6h TTL, conversation context
 - EM (Episodic Memory): 18 months, LGPD anonymization
 - SM (Semantic Memory): pgvector 1536D, knowledge base
@@ -13,20 +13,87 @@ Implements the complete memory hierarchy as per whitepaper:
 """
 
 import os
+import re
 import json
+import argparse
+import time
+import threading
+import uuid
+import zlib
+from collections import deque
+from contextlib import contextmanager
 import psycopg2
+from psycopg2 import errors, extensions, pool, sql
 from psycopg2.extras import RealDictCursor, Json
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple
 from dataclasses import dataclass
 import openai
+from metrics import metrics
+from vector_codec import register_vector_codec, to_vector
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# Working memory TTL (also applies to in-process emotional trajectories)
+WORKING_MEMORY_TTL_SECONDS = 6 * 3600
+WORKING_MEMORY_WINDOW = 10
+# In-process WM row cache (write-through; the DB row stays the source of truth)
+WORKING_MEMORY_CACHE_SECONDS = int(os.getenv("AURORA_WM_CACHE_SECONDS", "300"))
+WORKING_MEMORY_CACHE_SIZE = int(os.getenv("AURORA_WM_CACHE_SIZE", "50000"))
+MAX_TRACKED_TRAJECTORIES = int(os.getenv("AURORA_MAX_TRACKED_TRAJECTORIES", "50000"))
+
+# Sensory context backend: memory (per-process, default) | unlogged | table
+SENSORY_CONTEXT_BACKEND = os.getenv("AURORA_SC_BACKEND", "memory").lower()
+SENSORY_CONTEXT_TTL_SECONDS = 30
+SENSORY_CONTEXT_MAX_ITEMS = int(os.getenv("AURORA_SC_MAX_ITEMS", "20"))
+MAX_SENSORY_SESSIONS = int(os.getenv("AURORA_SC_MAX_SESSIONS", "50000"))
+
+if SENSORY_CONTEXT_BACKEND not in ("memory", "unlogged", "table"):
+    print(f"⚠️ Unknown sensory context backend '{SENSORY_CONTEXT_BACKEND}' - using memory")
+    SENSORY_CONTEXT_BACKEND = "memory"
+
+# LGPD anonymization batch size (rows per short transaction)
+ANONYMIZE_BATCH_SIZE = int(os.getenv("AURORA_ANONYMIZE_BATCH_SIZE", "500"))
+# Time budget per cleanup run; the watermark makes the next run continue
+ANONYMIZE_MAX_SECONDS = float(os.getenv("AURORA_ANONYMIZE_MAX_SECONDS", "20"))
+
+# Semantic memory usage counters: buffered, flushed by the scheduler (or inline when overdue)
+USAGE_FLUSH_MAX_SECONDS = int(os.getenv("AURORA_USAGE_FLUSH_MAX_SECONDS", "120"))
+
+# Partitioned memory tables (partitioning.py) live in their own schema, which
+# Prisma's `db push` does not manage; it comes first on every connection's
+# search_path, so unqualified names resolve to them once migrated
+PARTITION_SCHEMA = os.getenv("AURORA_PARTITION_SCHEMA", "aurora_partitioned")
+
+# Connection pool per worker process (hot statements are prepared per connection)
+DB_POOL_MIN = int(os.getenv("AURORA_DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("AURORA_DB_POOL_MAX", "10"))
+
+CONTENT_FIELDS = {
+    "en": "contentEn",
+    "pt": "contentPt",
+    "es": "contentEs"
+}
+
+# Semantic memory ANN search: one HNSW index per locale plus partial indexes
+# for hot categories; other categories are scanned exactly (small by definition)
+EMBEDDING_DIMENSIONS = 1536
+SEMANTIC_HOT_CATEGORIES = [
+    c.strip() for c in os.getenv(
+        "AURORA_SEMANTIC_HOT_CATEGORIES", "tours,booking,practical,policies,monuments"
+    ).split(",") if c.strip()
+]
+SEMANTIC_EF_SEARCH = int(os.getenv("AURORA_SEMANTIC_EF_SEARCH", "40"))
+# Searches re-read which indexes exist (built off the request path) this often
+SEMANTIC_INDEX_REFRESH_SECONDS = int(os.getenv("AURORA_SEMANTIC_INDEX_REFRESH_SECONDS", "300"))
+
 if OPENAI_API_KEY:
     openai.api_key = OPENAI_API_KEY
 
+# float32 embeddings bind as compact pgvector literals
+register_vector_codec()
+
 
 @dataclass
 class MemoryItem:
@@ -37,47 +104,372 @@ class MemoryItem:
     created_at: datetime
     
 
+def _set_search_path(conn):
+    """PARTITION_SCHEMA first, then public (session setting, committed)"""
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL("SET search_path TO {}, public").format(sql.Identifier(PARTITION_SCHEMA)))
+    conn.commit()
+
+
+class PooledConnection(extensions.connection):
+    """psycopg2 connection that remembers its server-side prepared statements"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+        _set_search_path(self)
+
+
+class PreparedStatements:
+    """
+    Registry of hot SQL statements, executed as named server-side statements
+    
+    Statements use $1..$n placeholders. Each pooled connection PREPAREs a
+    statement the first time it runs it (parse + plan once), then EXECUTEs
+    it by name. Timings land in metrics:
+        db.prepare_seconds.<name>    one-off PREPARE cost per connection
+        db.statement_seconds.<name>  EXECUTE round trip (incl. fetch)
+    """
+    
+    def __init__(self):
+        self._sql: Dict[str, str] = {}
+        self._lock = threading.Lock()
+    
+    def register(self, name: str, sql: str) -> str:
+        """Add (or confirm) a statement; returns its name"""
+        with self._lock:
+            current = self._sql.get(name)
+            if current is not None and current != sql:
+                raise ValueError(f"Prepared statement '{name}' registered with different SQL")
+            self._sql[name] = sql
+        return name
+    
+    def __contains__(self, name: str) -> bool:
+        return name in self._sql
+    
+    def execute(self, cur, name: str, params: tuple = ()):
+        """PREPARE on first use per connection, then EXECUTE name(params)"""
+        conn = cur.connection
+        if name not in conn.prepared:
+            started = time.perf_counter()
+            cur.execute(f"PREPARE {name} AS {self._sql[name]}")
+            conn.prepared.add(name)
+            metrics.increment("db.prepared")
+            metrics.observe(f"db.prepare_seconds.{name}", time.perf_counter() - started)
+        
+        if params:
+            cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+        else:
+            cur.execute(f"EXECUTE {name}")
+
+
+statements = PreparedStatements()
+
+
 class DatabaseConnection:
-    """Thread-safe database connection manager"""
+    """Thread-safe database connection manager (pooled per process)"""
+    
+    _pool: Optional[pool.ThreadedConnectionPool] = None
+    _pool_lock = threading.Lock()
+    # ThreadedConnectionPool raises when exhausted - callers wait here instead
+    _pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
     
     @staticmethod
     def get_connection():
-        return psycopg2.connect(DATABASE_URL)
+        """Dedicated (unpooled) connection - for DDL, autocommit or long jobs"""
+        conn = psycopg2.connect(DATABASE_URL)
+        _set_search_path(conn)
+        return conn
     
     @staticmethod
-    def execute_query(query: str, params: tuple = None, fetch: str = "all"):
-        """Execute query with automatic connection management"""
-        conn = DatabaseConnection.get_connection()
-        try:
+    def _get_pool() -> pool.ThreadedConnectionPool:
+        if DatabaseConnection._pool is None:
+            with DatabaseConnection._pool_lock:
+                if DatabaseConnection._pool is None:
+                    DatabaseConnection._pool = pool.ThreadedConnectionPool(
+                        DB_POOL_MIN, DB_POOL_MAX, DATABASE_URL,
+                        connection_factory=PooledConnection
+                    )
+        return DatabaseConnection._pool
+    
+    @staticmethod
+    @contextmanager
+    def connection():
+        """Borrow a pooled connection; rolled back (or discarded if broken) on error"""
+        with DatabaseConnection._pool_slots:
+            connection_pool = DatabaseConnection._get_pool()
+            conn = connection_pool.getconn()
+            try:
+                yield conn
+            except Exception:
+                if not conn.closed:
+                    try:
+                        conn.rollback()
+                    except psycopg2.Error:
+                        pass
+                raise
+            finally:
+                connection_pool.putconn(conn, close=bool(conn.closed))
+    
+    @staticmethod
+    def _fetch(conn, cur, fetch: str):
+        if fetch == "all":
+            result = cur.fetchall()
+        elif fetch == "one":
+            result = cur.fetchone()
+        else:
+            result = None
+        # Always commit: INSERT ... RETURNING is fetched with fetch="one"
+        conn.commit()
+        return result
+    
+    @staticmethod
+    def execute_query(query: str, params: tuple = None, fetch: str = "all",
+                      settings: Optional[Dict[str, Any]] = None):
+        """
+        Execute query with automatic connection management
+        
+        settings: transaction-local GUCs applied first (e.g. hnsw.ef_search)
+        """
+        with DatabaseConnection.connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                for name, value in (settings or {}).items():
+                    cur.execute("SELECT set_config(%s, %s, true)", (name, str(value)))
                 cur.execute(query, params)
-                if fetch == "all":
-                    return cur.fetchall()
-                elif fetch == "one":
-                    return cur.fetchone()
-                else:
-                    conn.commit()
-                    return None
-        finally:
-            conn.close()
+                return DatabaseConnection._fetch(conn, cur, fetch)
+    
+    @staticmethod
+    def execute_prepared(name: str, params: tuple = (), fetch: str = "all",
+                         settings: Optional[Dict[str, Any]] = None):
+        """Execute a registered statement by name (see PreparedStatements)"""
+        with DatabaseConnection.connection() as conn:
+            started = time.perf_counter()
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                for setting, value in (settings or {}).items():
+                    cur.execute("SELECT set_config(%s, %s, true)", (setting, str(value)))
+                try:
+                    statements.execute(cur, name, params)
+                except errors.InvalidSqlStatementName:
+                    # Server-side state lost (e.g. DISCARD ALL via a proxy) - prepare again
+                    conn.rollback()
+                    conn.prepared.clear()
+                    for setting, value in (settings or {}).items():
+                        cur.execute("SELECT set_config(%s, %s, true)", (setting, str(value)))
+                    statements.execute(cur, name, params)
+                result = DatabaseConnection._fetch(conn, cur, fetch)
+            metrics.observe(f"db.statement_seconds.{name}", time.perf_counter() - started)
+        return result
+    
+    @staticmethod
+    @contextmanager
+    def unit_of_work():
+        """
+        Group writes into one transaction sent in a single round trip
+            
+            with DatabaseConnection.unit_of_work() as uow:
+                WorkingMemory.store(..., uow=uow)
+                EpisodicMemory.store(..., uow=uow)
+        
+        Nothing is sent if the block raises.
+        """
+        uow = UnitOfWork()
+        yield uow
+        uow.flush()
+
+
+class UnitOfWork:
+    """
+    Writes queued across memory layers, flushed as one multi-statement batch
+    
+    The batch is a single simple-query message, which PostgreSQL runs as one
+    implicit transaction (all or nothing). Registered statements are EXECUTEd
+    by name; their PREPARE rides in the same batch the first time a pooled
+    connection sees them.
+    
+    The batch only reports the last statement's result, so one statement
+    per unit of work may ask for its RETURNING row (it is sent last).
+    """
+    
+    def __init__(self):
+        self._writes: List[tuple] = []
+        self._on_commit: List[Any] = []
+        self._returning: Optional[tuple] = None  # (write index, callback)
+    
+    def __len__(self) -> int:
+        return len(self._writes)
+    
+    def execute(self, name: str, params: tuple = (), on_result=None):
+        """
+        Queue a registered (prepared) statement
+        
+        on_result(row) receives its first result row (tuple, None if no
+        rows) once the batch is committed.
+        """
+        if name not in statements:
+            raise KeyError(f"Unknown prepared statement '{name}'")
+        if on_result is not None:
+            if self._returning is not None:
+                raise ValueError("Only one statement per unit of work can return a result")
+            self._returning = (len(self._writes), on_result)
+        self._writes.append((name, None, params))
+    
+    def query(self, sql: str, params: tuple = None):
+        """Queue an ad hoc statement (%s placeholders)"""
+        self._writes.append((None, sql, params))
+    
+    def on_commit(self, callback):
+        """Run callback once the batch is committed (e.g. cache write-through)"""
+        self._on_commit.append(callback)
+    
+    def _committed(self):
+        callbacks, self._on_commit = self._on_commit, []
+        for callback in callbacks:
+            callback()
+    
+    def _batch(self, cur) -> tuple:
+        conn = cur.connection
+        parts, prepared = [], []
+        writes = self._writes
+        if self._returning is not None:
+            index = self._returning[0]
+            writes = writes[:index] + writes[index + 1:] + [writes[index]]
+        for name, sql, params in writes:
+            if sql is not None:
+                parts.append(cur.mogrify(sql, params).decode())
+                continue
+            if name not in conn.prepared and name not in prepared:
+                parts.append(f"PREPARE {name} AS {statements._sql[name]}")
+                prepared.append(name)
+            if params:
+                execute = f"EXECUTE {name} ({', '.join(['%s'] * len(params))})"
+                parts.append(cur.mogrify(execute, params).decode())
+            else:
+                parts.append(f"EXECUTE {name}")
+        return ";\n".join(parts), prepared
+    
+    def flush(self):
+        """Send every queued write in one round trip, then clear the queue"""
+        if not self._writes:
+            self._committed()
+            return
+        
+        with DatabaseConnection.connection() as conn:
+            started = time.perf_counter()
+            # Autocommit so psycopg2 does not send its own BEGIN/COMMIT round
+            # trips - the multi-statement message is already atomic
+            conn.autocommit = True
+            try:
+                with conn.cursor() as cur:
+                    for attempt in (1, 2):
+                        batch, prepared = self._batch(cur)
+                        try:
+                            cur.execute(batch)
+                            result = cur.fetchone() if cur.description else None
+                            break
+                        except psycopg2.Error as e:
+                            if conn.closed:
+                                raise
+                            # Whether a PREPARE survived the failed batch is unknown
+                            cur.execute("DEALLOCATE ALL")
+                            conn.prepared.clear()
+                            # Server-side state lost (e.g. DISCARD ALL via a proxy) - retry once
+                            if not isinstance(e, errors.InvalidSqlStatementName) or attempt == 2:
+                                raise
+                    conn.prepared.update(prepared)
+            finally:
+                if not conn.closed:
+                    conn.autocommit = False
+            
+            metrics.increment("db.unit_of_work")
+            metrics.observe("db.unit_of_work_statements", len(self._writes))
+            metrics.observe("db.unit_of_work_seconds", time.perf_counter() - started)
+        returning, self._returning = self._returning, None
+        self._writes = []
+        if returning is not None:
+            returning[1](result)
+        self._committed()
 
 
 class SensoryContextMemory:
-    """SC - Sensory Context: 30s cache for raw input"""
+    """
+    SC - Sensory Context: 30s cache for raw input
+    
+    Backends (AURORA_SC_BACKEND):
+        memory    per-process ring buffer per session with TTL (default, no DB writes)
+        unlogged  aurora_sensory_context switched to UNLOGGED (shared across workers)
+        table     aurora_sensory_context as a regular WAL-logged table
+    """
+    
+    BACKEND = SENSORY_CONTEXT_BACKEND
+    
+    # session_id → deque of rows (newest last), same shape as table rows
+    _buffers: Dict[str, deque] = {}
+    _buffers_lock = threading.Lock()
+    _unlogged_checked = False
+    
+    INSERT = statements.register("sc_insert", """
+        INSERT INTO aurora_sensory_context (id, "sessionId", content, metadata, "createdAt", "expiresAt")
+        VALUES (gen_random_uuid()::text, $1, $2, $3, NOW(), $4)
+    """)
     
     @staticmethod
-    def store(session_id: str, content: str, metadata: Dict = None):
-        """Store raw sensory input"""
-        expires_at = datetime.now() + timedelta(seconds=30)
-        query = """
-            INSERT INTO aurora_sensory_context (id, "sessionId", content, metadata, "createdAt", "expiresAt")
-            VALUES (gen_random_uuid()::text, %s, %s, %s, NOW(), %s)
-        """
-        DatabaseConnection.execute_query(query, (session_id, content, Json(metadata or {}), expires_at), fetch="none")
+    def store(session_id: str, content: str, metadata: Dict = None,
+              uow: Optional[UnitOfWork] = None):
+        """Store raw sensory input (queued on uow when given and table-backed)"""
+        now = datetime.now()
+        expires_at = now + timedelta(seconds=SENSORY_CONTEXT_TTL_SECONDS)
+        if SensoryContextMemory.BACKEND == "memory":
+            SensoryContextMemory._remember(session_id, {
+                "id": uuid.uuid4().hex,
+                "sessionId": session_id,
+                "content": content,
+                "metadata": metadata or {},
+                "createdAt": now,
+                "expiresAt": expires_at,
+            })
+            return
+        
+        if SensoryContextMemory.BACKEND == "unlogged":
+            SensoryContextMemory.check_unlogged()
+        params = (session_id, content, Json(metadata or {}), expires_at)
+        if uow is not None:
+            uow.execute(SensoryContextMemory.INSERT, params)
+            return
+        DatabaseConnection.execute_prepared(SensoryContextMemory.INSERT, params, fetch="none")
+    
+    @staticmethod
+    def _remember(session_id: str, row: Dict):
+        with SensoryContextMemory._buffers_lock:
+            buffers = SensoryContextMemory._buffers
+            buffer = buffers.pop(session_id, None)
+            if buffer is None:
+                buffer = deque(maxlen=SENSORY_CONTEXT_MAX_ITEMS)
+            buffer.append(row)
+            # Re-insert so dict order tracks the most recently written session
+            buffers[session_id] = buffer
+            if len(buffers) > MAX_SENSORY_SESSIONS:
+                SensoryContextMemory._evict(row["createdAt"])
+        metrics.increment("memory.sc.stored")
+    
+    @staticmethod
+    def _evict(now: datetime):
+        """Drop expired sessions, then the least recently written (caller holds the lock)"""
+        buffers = SensoryContextMemory._buffers
+        for key in [k for k, b in buffers.items() if not b or b[-1]["expiresAt"] <= now]:
+            del buffers[key]
+        while len(buffers) > MAX_SENSORY_SESSIONS:
+            buffers.pop(next(iter(buffers)))
     
     @staticmethod
     def get_recent(session_id: str, limit: int = 10):
-        """Retrieve recent sensory context"""
+        """Retrieve recent sensory context (newest first)"""
+        if SensoryContextMemory.BACKEND == "memory":
+            now = datetime.now()
+            with SensoryContextMemory._buffers_lock:
+                buffer = SensoryContextMemory._buffers.get(session_id) or ()
+                rows = [row for row in reversed(buffer) if row["expiresAt"] > now]
+            return rows[:limit]
+        
         query = """
             SELECT * FROM aurora_sensory_context
             WHERE "sessionId" = %s AND "expiresAt" > NOW()
@@ -86,9 +478,71 @@ class SensoryContextMemory:
         """
         return DatabaseConnection.execute_query(query, (session_id, limit))
     
+    UNLOGGED_SQL = """
+        SELECT relkind = 'p' OR relpersistence = 'u' AS unlogged FROM pg_class
+        WHERE oid = 'aurora_sensory_context'::regclass
+    """
+    
+    @staticmethod
+    def check_unlogged():
+        """
+        Request path: warn once per process if the table is still logged
+        
+        Read-only - the rewrite is ensure_unlogged's job (memory_cleanup
+        scheduler job, `python memory.py ensure-unlogged`). The check is
+        not retried whatever its outcome.
+        """
+        if SensoryContextMemory._unlogged_checked:
+            return
+        SensoryContextMemory._unlogged_checked = True
+        try:
+            row = DatabaseConnection.execute_query(SensoryContextMemory.UNLOGGED_SQL, fetch="one")
+            if row and not row["unlogged"]:
+                print("⚠️ aurora_sensory_context is not UNLOGGED yet "
+                      "(memory_cleanup job or python memory.py ensure-unlogged)")
+        except Exception as e:
+            print(f"⚠️ Could not check aurora_sensory_context persistence: {e}")
+    
+    @staticmethod
+    def ensure_unlogged() -> bool:
+        """
+        Maintenance: switch aurora_sensory_context to UNLOGGED (no WAL for 30s data)
+        
+        SET UNLOGGED rewrites the table under an ACCESS EXCLUSIVE lock, so it
+        runs from maintenance only, with a short lock_timeout (retried next run).
+        Partitioned: partitions are created UNLOGGED (partitioning.py).
+        """
+        conn = DatabaseConnection.get_connection()
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(SensoryContextMemory.UNLOGGED_SQL)
+                if cur.fetchone()[0]:
+                    return True
+                cur.execute("SELECT set_config('lock_timeout', '2s', false)")
+                cur.execute("ALTER TABLE aurora_sensory_context SET UNLOGGED")
+                print("✅ aurora_sensory_context is now UNLOGGED")
+                return True
+        except Exception as e:
+            print(f"⚠️ Could not make aurora_sensory_context UNLOGGED (retried next run): {e}")
+            return False
+        finally:
+            conn.close()
+    
     @staticmethod
     def cleanup_expired():
         """Remove expired sensory context"""
+        if SensoryContextMemory.BACKEND == "memory":
+            with SensoryContextMemory._buffers_lock:
+                SensoryContextMemory._evict(datetime.now())
+                metrics.set_gauge("memory.sc.sessions", len(SensoryContextMemory._buffers))
+            return
+        
+        import partitioning
+        if partitioning.is_partitioned("aurora_sensory_context"):
+            # Expired hours are dropped as whole partitions
+            partitioning.maintain("aurora_sensory_context")
+            return
         query = 'DELETE FROM aurora_sensory_context WHERE "expiresAt" < NOW()'
         DatabaseConnection.execute_query(query, fetch="none")
 
@@ -96,35 +550,255 @@ class SensoryContextMemory:
 class WorkingMemory:
     """WM - Working Memory: 6h TTL for conversation context"""
     
+    # session_id → (expires_at monotonic, EmotionalTrajectoryTracker)
+    _trajectories: Dict[str, Any] = {}
+    _trajectories_lock = threading.Lock()
+    
     @staticmethod
-    def store(session_id: str, conversation_id: str, context_window: Dict, 
-              active_entities: Dict = None, current_intent: str = None, 
-              emotional_state: Dict = None):
-        """Store or update working memory"""
-        expires_at = datetime.now() + timedelta(hours=6)
-        query = """
-            INSERT INTO aurora_working_memory 
-            (id, "sessionId", "conversationId", "contextWindow", "activeEntities", 
-             "currentIntent", "emotionalState", "createdAt", "expiresAt")
-            VALUES (gen_random_uuid()::text, %s, %s, %s, %s, %s, %s, NOW(), %s)
+    def track_emotion(session_id: str, state) -> Dict[str, float]:
         """
-        DatabaseConnection.execute_query(
-            query, 
-            (session_id, conversation_id, Json(context_window), Json(active_entities or {}),
-             current_intent, Json(emotional_state or {}), expires_at),
-            fetch="none"
-        )
+        Fold the latest affective state into the session trajectory (O(1))
+        
+        The WM row is authoritative: its trajectoryState carries the turn
+        count, and it is read on every turn (primary key, bypassing the row
+        cache). When another worker has folded turns since, the row is ahead
+        of the in-process tracker and replaces it; the in-process tracker
+        only wins when it is ahead (our own write not yet visible) or the
+        read fails. Never re-reads the message history.
+        """
+        from affective_mathematics import EmotionalTrajectoryTracker
+        
+        now = time.monotonic()
+        with WorkingMemory._trajectories_lock:
+            entry = WorkingMemory._trajectories.get(session_id)
+            tracker = entry[1] if entry and entry[0] > now else None
+        
+        try:
+            row = DatabaseConnection.execute_prepared(WorkingMemory.TRAJECTORY_GET, (session_id,), fetch="one")
+            saved = row["state"] if row else None
+            if saved and (tracker is None or saved.get("count", 0) > tracker.count):
+                if tracker is not None:
+                    metrics.increment("memory.wm.trajectory_reloads")
+                tracker = EmotionalTrajectoryTracker.from_state(saved)
+        except Exception as e:
+            print(f"⚠️ Trajectory resume failed for {session_id}: {e}")
+        if tracker is None:
+            tracker = EmotionalTrajectoryTracker()
+        
+        with WorkingMemory._trajectories_lock:
+            tracker.update(state)
+            WorkingMemory._trajectories[session_id] = (now + WORKING_MEMORY_TTL_SECONDS, tracker)
+            if len(WorkingMemory._trajectories) > MAX_TRACKED_TRAJECTORIES:
+                WorkingMemory._evict_trajectories(now)
+            return tracker.to_dict()
     
     @staticmethod
-    def get(session_id: str) -> Optional[Dict]:
-        """Retrieve working memory for session"""
-        query = """
-            SELECT * FROM aurora_working_memory
-            WHERE "sessionId" = %s AND "expiresAt" > NOW()
-            ORDER BY "createdAt" DESC
-            LIMIT 1
+    def trajectory_state(session_id: str) -> Optional[Dict]:
+        """Tracker accumulators for persistence (None if not tracked)"""
+        with WorkingMemory._trajectories_lock:
+            entry = WorkingMemory._trajectories.get(session_id)
+            return entry[1].state() if entry else None
+    
+    @staticmethod
+    def _evict_trajectories(now: float):
+        """Drop expired trackers, then the oldest ones (caller holds the lock)"""
+        trajectories = WorkingMemory._trajectories
+        for key in [k for k, (expires_at, _) in trajectories.items() if expires_at <= now]:
+            del trajectories[key]
+        # Dicts keep insertion order and entries are re-inserted on update
+        while len(trajectories) > MAX_TRACKED_TRAJECTORIES:
+            trajectories.pop(next(iter(trajectories)))
+    
+    # session_id → (expires_at monotonic, row or None); write-through cache of the WM row
+    _rows: Dict[str, tuple] = {}
+    _rows_lock = threading.Lock()
+    
+    # One row per session: new messages are appended to contextWindow.messages
+    # and the window is trimmed in SQL; an expired row restarts from the delta.
+    # A trajectory with a lower turn count than the stored one (a worker that
+    # folded fewer turns) never overwrites it; a NULL emotional state (e.g. an
+    # assistant reply) keeps the stored one.
+    UPSERT = statements.register("wm_upsert", f"""
+        INSERT INTO aurora_working_memory AS wm
+        (id, "sessionId", "conversationId", "contextWindow", "activeEntities",
+         "currentIntent", "emotionalState", "createdAt", "expiresAt")
+        VALUES ('wm_' || $1::text, $1, $2,
+                jsonb_build_object('messages', $3::jsonb, 'message_count', jsonb_array_length($3::jsonb)),
+                $4, $5, $6, NOW(), $7)
+        ON CONFLICT (id) DO UPDATE SET
+            "conversationId" = COALESCE(EXCLUDED."conversationId", wm."conversationId"),
+            "contextWindow" = CASE WHEN wm."expiresAt" <= NOW() THEN EXCLUDED."contextWindow"
+                ELSE jsonb_build_object(
+                    'messages', (
+                        SELECT COALESCE(jsonb_agg(m.value ORDER BY m.ord), '[]'::jsonb)
+                        FROM (
+                            SELECT value, ord, COUNT(*) OVER () AS total
+                            FROM jsonb_array_elements(
+                                COALESCE(wm."contextWindow"->'messages', '[]'::jsonb)
+                                || (EXCLUDED."contextWindow"->'messages')
+                            ) WITH ORDINALITY AS e(value, ord)
+                        ) m
+                        WHERE m.ord > m.total - {WORKING_MEMORY_WINDOW}
+                    ),
+                    'message_count', COALESCE((wm."contextWindow"->>'message_count')::int, 0)
+                                     + (EXCLUDED."contextWindow"->>'message_count')::int
+                ) END,
+            "activeEntities" = CASE WHEN wm."expiresAt" <= NOW() THEN EXCLUDED."activeEntities"
+                ELSE COALESCE(wm."activeEntities", '{{}}'::jsonb) || EXCLUDED."activeEntities" END,
+            "currentIntent" = COALESCE(EXCLUDED."currentIntent", wm."currentIntent"),
+            "emotionalState" = CASE
+                WHEN wm."expiresAt" <= NOW() THEN EXCLUDED."emotionalState"
+                WHEN EXCLUDED."emotionalState" IS NULL THEN wm."emotionalState"
+                WHEN COALESCE((wm."emotionalState"->'trajectoryState'->>'count')::int, 0)
+                     > COALESCE((EXCLUDED."emotionalState"->'trajectoryState'->>'count')::int, 0)
+                THEN EXCLUDED."emotionalState" || jsonb_build_object(
+                    'trajectory', wm."emotionalState"->'trajectory',
+                    'trajectoryState', wm."emotionalState"->'trajectoryState')
+                ELSE EXCLUDED."emotionalState" END,
+            "createdAt" = CASE WHEN wm."expiresAt" <= NOW() THEN NOW() ELSE wm."createdAt" END,
+            "expiresAt" = EXCLUDED."expiresAt"
+        RETURNING ("contextWindow"->>'message_count')::int AS message_count
+    """)
+    
+    GET = statements.register("wm_get", """
+        SELECT * FROM aurora_working_memory
+        WHERE id = 'wm_' || $1::text AND "expiresAt" > NOW()
+    """)
+    
+    TRAJECTORY_GET = statements.register("wm_trajectory_get", """
+        SELECT "emotionalState"->'trajectoryState' AS state FROM aurora_working_memory
+        WHERE id = 'wm_' || $1::text AND "expiresAt" > NOW()
+    """)
+    
+    @staticmethod
+    def append(session_id: str, conversation_id: str, messages: List[Dict],
+               active_entities: Dict = None, current_intent: str = None,
+               emotional_state: Dict = None, uow: Optional[UnitOfWork] = None):
+        """
+        Append new messages to the session's working memory (upsert)
+        
+        Only the delta is sent; the window is trimmed to the last
+        WORKING_MEMORY_WINDOW messages in SQL. emotional_state=None keeps
+        the stored emotional state. The cached row is updated
+        once the write is committed (after the uow flush when given), if
+        the upsert's message_count confirms it.
+        """
+        expires_at = datetime.now() + timedelta(seconds=WORKING_MEMORY_TTL_SECONDS)
+        params = (session_id, conversation_id, Json(messages), Json(active_entities or {}),
+                  current_intent, Json(emotional_state) if emotional_state is not None else None,
+                  expires_at)
+        
+        def write_through(row):
+            WorkingMemory._write_through(session_id, conversation_id, messages, active_entities,
+                                         current_intent, emotional_state, expires_at,
+                                         row[0] if row else None)
+        
+        if uow is not None:
+            uow.execute(WorkingMemory.UPSERT, params, on_result=write_through)
+            return
+        try:
+            row = DatabaseConnection.execute_prepared(WorkingMemory.UPSERT, params, fetch="one")
+        except Exception:
+            WorkingMemory.invalidate(session_id)
+            raise
+        write_through((row["message_count"],) if row else None)
+    
+    @staticmethod
+    def _write_through(session_id: str, conversation_id: str, messages: List[Dict],
+                       active_entities: Optional[Dict], current_intent: Optional[str],
+                       emotional_state: Optional[Dict], expires_at: datetime,
+                       message_count: Optional[int]):
+        """
+        Apply the upsert to the cached row (mirrors UPSERT; dropped if not cached)
+        
+        message_count is the count the upsert returned: if the cached row plus
+        this delta does not add up to it, another worker wrote in between and
+        the cached row is dropped instead of patched.
         """
-        return DatabaseConnection.execute_query(query, (session_id,), fetch="one")
+        now = time.monotonic()
+        with WorkingMemory._rows_lock:
+            entry = WorkingMemory._rows.get(session_id)
+            if entry is None or entry[0] <= now:
+                # Previous window unknown here - the next get() reads the row
+                WorkingMemory._rows.pop(session_id, None)
+                return
+            
+            previous = entry[1]
+            if previous is None or previous["expiresAt"] <= datetime.now():
+                window, count, entities = [], 0, {}
+                created_at, intent, previous_conversation = datetime.now(), None, None
+            else:
+                stored = previous.get("emotionalState") or {}
+                stored_turns = (stored.get("trajectoryState") or {}).get("count", 0)
+                if emotional_state is None:
+                    emotional_state = previous.get("emotionalState")
+                elif stored_turns > (emotional_state.get("trajectoryState") or {}).get("count", 0):
+                    emotional_state = {**emotional_state, "trajectory": stored.get("trajectory"),
+                                       "trajectoryState": stored.get("trajectoryState")}
+                context_window = previous.get("contextWindow") or {}
+                window = list(context_window.get("messages") or [])
+                count = context_window.get("message_count", 0)
+                entities = dict(previous.get("activeEntities") or {})
+                created_at, intent = previous["createdAt"], previous.get("currentIntent")
+                previous_conversation = previous.get("conversationId")
+            
+            if message_count != count + len(messages):
+                WorkingMemory._rows.pop(session_id, None)
+                metrics.increment("memory.wm.cache_conflicts")
+                return
+            
+            entities.update(active_entities or {})
+            WorkingMemory._cache(session_id, {
+                "id": f"wm_{session_id}",
+                "sessionId": session_id,
+                "conversationId": conversation_id or previous_conversation,
+                "contextWindow": {
+                    "messages": (window + list(messages))[-WORKING_MEMORY_WINDOW:],
+                    "message_count": count + len(messages),
+                },
+                "activeEntities": entities,
+                "currentIntent": current_intent or intent,
+                "emotionalState": emotional_state,
+                "createdAt": created_at,
+                "expiresAt": expires_at,
+            }, now)
+    
+    @staticmethod
+    def _cache(session_id: str, row: Optional[Dict], now: float):
+        """Cache a row, evicting expired then oldest entries (caller holds the lock)"""
+        rows = WorkingMemory._rows
+        rows.pop(session_id, None)
+        rows[session_id] = (now + WORKING_MEMORY_CACHE_SECONDS, row)
+        if len(rows) > WORKING_MEMORY_CACHE_SIZE:
+            for key in [k for k, (expires_at, _) in rows.items() if expires_at <= now]:
+                del rows[key]
+            while len(rows) > WORKING_MEMORY_CACHE_SIZE:
+                rows.pop(next(iter(rows)))
+    
+    @staticmethod
+    def invalidate(session_id: str):
+        """Forget the cached row (the next get() reads it from the database)"""
+        with WorkingMemory._rows_lock:
+            WorkingMemory._rows.pop(session_id, None)
+    
+    @staticmethod
+    def get(session_id: str) -> Optional[Dict]:
+        """Retrieve working memory for session (served from cache; one query on a miss)"""
+        now = time.monotonic()
+        with WorkingMemory._rows_lock:
+            entry = WorkingMemory._rows.get(session_id)
+        if entry is not None and entry[0] > now:
+            row = entry[1]
+            if row is None or row["expiresAt"] > datetime.now():
+                metrics.increment("memory.wm.cache_hits")
+                return row
+        
+        metrics.increment("memory.wm.cache_misses")
+        row = DatabaseConnection.execute_prepared(WorkingMemory.GET, (session_id,), fetch="one")
+        row = dict(row) if row else None
+        with WorkingMemory._rows_lock:
+            WorkingMemory._cache(session_id, row, now)
+        return row
     
     @staticmethod
     def cleanup_expired():
@@ -136,23 +810,25 @@ class WorkingMemory:
 class EpisodicMemory:
     """EM - Episodic Memory: 18 months with LGPD anonymization"""
     
+    INSERT = statements.register("em_insert", """
+        INSERT INTO aurora_episodic_memory
+        (id, "customerId", "sessionId", "conversationId", "eventType", content,
+         "emotionalVector", outcome, importance, metadata, "createdAt", "updatedAt")
+        VALUES (gen_random_uuid()::text, $1, $2, $3, $4, $5, $6, $7, $8, $9, NOW(), NOW())
+    """)
+    
     @staticmethod
     def store(session_id: str, event_type: str, content: str, emotional_vector: Dict,
               customer_id: str = None, conversation_id: str = None, 
-              outcome: str = None, importance: float = 0.5, metadata: Dict = None):
-        """Store episodic event"""
-        query = """
-            INSERT INTO aurora_episodic_memory
-            (id, "customerId", "sessionId", "conversationId", "eventType", content,
-             "emotionalVector", outcome, importance, metadata, "createdAt", "updatedAt")
-            VALUES (gen_random_uuid()::text, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
-        """
-        DatabaseConnection.execute_query(
-            query,
-            (customer_id, session_id, conversation_id, event_type, content,
-             Json(emotional_vector), outcome, importance, Json(metadata or {})),
-            fetch="none"
-        )
+              outcome: str = None, importance: float = 0.5, metadata: Dict = None,
+              uow: Optional[UnitOfWork] = None):
+        """Store episodic event (queued on uow when given)"""
+        params = (customer_id, session_id, conversation_id, event_type, content,
+                  Json(emotional_vector), outcome, importance, Json(metadata or {}))
+        if uow is not None:
+            uow.execute(EpisodicMemory.INSERT, params)
+            return
+        DatabaseConnection.execute_prepared(EpisodicMemory.INSERT, params, fetch="none")
     
     @staticmethod
     def get_by_customer(customer_id: str, limit: int = 50):
@@ -166,22 +842,33 @@ class EpisodicMemory:
         return DatabaseConnection.execute_query(query, (customer_id, limit))
     
     @staticmethod
-    def anonymize_old_memories():
-        """LGPD compliance: Anonymize memories > 18 months"""
-        eighteen_months_ago = datetime.now() - timedelta(days=18*30)
-        query = """
-            UPDATE aurora_episodic_memory
-            SET "customerId" = NULL, 
-                content = '[ANONYMIZED]',
-                "anonymizedAt" = NOW()
-            WHERE "createdAt" < %s AND "anonymizedAt" IS NULL
+    def anonymize_old_memories(batch_size: int = ANONYMIZE_BATCH_SIZE,
+                               max_seconds: Optional[float] = None) -> int:
         """
-        DatabaseConnection.execute_query(query, (eighteen_months_ago,), fetch="none")
+        LGPD compliance: Anonymize memories > 18 months
+        
+        Incremental (lgpd_anonymizer.py): resumes from the stored watermark
+        and works in short keyset batches. Returns rows anonymized.
+        """
+        from lgpd_anonymizer import EpisodicAnonymizer
+        
+        stats = EpisodicAnonymizer(batch_size=batch_size).run(max_seconds=max_seconds)
+        return stats["anonymized"]
 
 
 class SemanticMemory:
     """SM - Semantic Memory: pgvector 1536D knowledge base"""
     
+    EMBEDDING_FIELDS = {
+        "en": "embeddingEn",
+        "pt": "embeddingPt",
+        "es": "embeddingEs"
+    }
+    
+    # Search results never need the (3 × ~20 KB) embedding columns
+    RESULT_COLUMNS = """id, "contentEn", "contentPt", "contentEs", category, subcategory, tags,
+                   "sourceType", "sourceId", confidence, "usageCount", metadata"""
+    
     @staticmethod
     async def generate_embedding(text: str) -> List[float]:
         """Generate OpenAI embedding (1536D)"""
@@ -218,8 +905,21 @@ class SemanticMemory:
              source_type, source_id, confidence, Json(metadata or {})),
             fetch="one"
         )
+        SemanticMemory._invalidate_response_cache("semantic_store")
+        if result:
+            SemanticMemory.enqueue_embeddings(result['id'])
         return result['id'] if result else None
     
+    @staticmethod
+    def enqueue_embeddings(memory_id: str, locales: Optional[List[str]] = None):
+        """Queue embedding generation (job_queue.py); the health check backfills if this fails"""
+        from job_queue import job_queue
+        try:
+            job_queue.enqueue("embedding", {"id": memory_id, "locales": locales or list(CONTENT_FIELDS)},
+                              dedupe_key=memory_id)
+        except Exception as e:
+            print(f"⚠️ Could not queue embeddings for {memory_id}: {e}")
+    
     @staticmethod
     def update_embedding(memory_id: str, embedding: List[float], locale: str):
         """Update embedding for specific locale"""
@@ -236,87 +936,321 @@ class SemanticMemory:
             SET "{embedding_field}" = %s::vector
             WHERE id = %s
         """
-        DatabaseConnection.execute_query(query, (embedding, memory_id), fetch="none")
+        # No response cache invalidation: embeddings do not change any answer text
+        DatabaseConnection.execute_query(query, (to_vector(embedding), memory_id), fetch="none")
     
     @staticmethod
-    def semantic_search(query_embedding: List[float], locale: str = "en", 
-                       category: str = None, limit: int = 5):
-        """Perform pgvector similarity search"""
-        # Map locale to camelCase field name
-        embedding_fields = {
-            "en": "embeddingEn",
-            "pt": "embeddingPt",
-            "es": "embeddingEs"
-        }
-        embedding_field = embedding_fields.get(locale.lower(), "embeddingEn")
+    def update_embeddings(memory_id: str, embeddings: Dict[str, List[float]]):
+        """
+        Update several locale embeddings in one statement
         
-        category_filter = ""
-        # Correct parameter order: [embedding, category?, embedding, limit]
-        params = [query_embedding]
-        if category:
-            category_filter = "AND category = %s"
-            params.append(category)
-        params.extend([query_embedding, limit])
+        Leaves "updatedAt" (the response cache KB stamp) alone, like
+        update_embedding: backfills must not flush cached answers.
+        """
+        fields = {SemanticMemory.EMBEDDING_FIELDS[locale]: vector for locale, vector in embeddings.items()}
+        if not fields:
+            return
+        assignments = ", ".join(f'"{field}" = %s::vector' for field in fields)
+        DatabaseConnection.execute_query(
+            f'UPDATE aurora_semantic_memory SET {assignments} WHERE id = %s',
+            (*[to_vector(vector) for vector in fields.values()], memory_id),
+            fetch="none"
+        )
+    
+    @staticmethod
+    def _invalidate_response_cache(reason: str):
+        """Cached ChatGPT answers depend on KB content - drop them when text changes"""
+        from response_cache import response_cache
+        response_cache.invalidate(reason)
+    
+    # Per-process: locale -> categories with a valid HNSW index (None = all rows)
+    _vector_indexes: Optional[Dict[str, set]] = None
+    _vector_indexes_loaded_at = float("-inf")
+    _vector_indexes_lock = threading.Lock()
+    
+    @staticmethod
+    def _category_slug(category: str) -> str:
+        """
+        Identifier-safe category for index/statement names
         
-        query = f"""
-            SELECT *, 
-                   1 - ("{embedding_field}" <=> %s::vector) as similarity
-            FROM aurora_semantic_memory
-            WHERE active = true AND "{embedding_field}" IS NOT NULL {category_filter}
-            ORDER BY "{embedding_field}" <=> %s::vector
-            LIMIT %s
+        Categories that are not already safe get a checksum suffix, so two
+        categories never share a slug ("Day Trips" vs "day-trips").
         """
-        return DatabaseConnection.execute_query(query, tuple(params))
+        slug = re.sub(r"[^a-z0-9]+", "_", category.lower()).strip("_")[:30]
+        if slug != category:
+            slug = f"{slug}_{zlib.crc32(category.encode()):08x}"
+        return slug
     
     @staticmethod
-    def keyword_search(query: str, locale: str = "en", category: str = None, limit: int = 5):
-        """Fallback keyword/tag search when embeddings unavailable"""
-        # Map locale to content field
-        content_fields = {
-            "en": "contentEn",
-            "pt": "contentPt",
-            "es": "contentEs"
+    def _vector_index_name(locale: str, category: Optional[str] = None) -> str:
+        if category is None:
+            return f"aurora_sm_{locale}_hnsw"
+        return f"aurora_sm_{locale}_{SemanticMemory._category_slug(category)}_hnsw"
+    
+    @staticmethod
+    def _existing_vector_indexes() -> Dict[str, bool]:
+        """aurora_sm_*_hnsw index name -> valid (False = failed concurrent build)"""
+        rows = DatabaseConnection.execute_query("""
+            SELECT c.relname AS name, i.indisvalid AS valid
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE i.indrelid = to_regclass('aurora_semantic_memory')
+              AND c.relname ~ '^aurora_sm_.*_hnsw$'
+        """) or []
+        return {row["name"]: row["valid"] for row in rows}
+    
+    @staticmethod
+    def _map_vector_indexes(existing: Dict[str, bool], hot_categories: List[str]) -> Dict[str, set]:
+        return {
+            locale: {
+                category for category in [None] + list(hot_categories)
+                if existing.get(SemanticMemory._vector_index_name(locale, category))
+            }
+            for locale in SemanticMemory.EMBEDDING_FIELDS
         }
-        content_field = content_fields.get(locale.lower(), "contentEn")
+    
+    @staticmethod
+    def ensure_vector_indexes(hot_categories: Optional[List[str]] = None) -> Dict[str, set]:
+        """
+        Create missing HNSW indexes and return what is indexed (idempotent)
+        
+        Maintenance only (python memory.py ensure-indexes, scheduler job
+        vector_index_tune): builds run CONCURRENTLY, so writes to
+        aurora_semantic_memory continue; invalid leftovers of an interrupted
+        build are dropped and rebuilt. Searches only read the catalog.
+        
+        Prisma declares the columns as untyped `vector`, so the indexes are
+        built on a vector(1536) cast; searches must use the same expression.
+        Partial indexes per hot category avoid post-filter loss: the ANN
+        walk only ever sees rows of that category.
+        """
+        from psycopg2 import sql
+        
+        hot_categories = SEMANTIC_HOT_CATEGORIES if hot_categories is None else hot_categories
+        existing = SemanticMemory._existing_vector_indexes()
+        conn = DatabaseConnection.get_connection()
+        conn.autocommit = True  # CREATE/DROP INDEX CONCURRENTLY
+        try:
+            with conn.cursor() as cur:
+                for locale, field in SemanticMemory.EMBEDDING_FIELDS.items():
+                    expression = sql.SQL("({}::vector({}))").format(
+                        sql.Identifier(field), sql.Literal(EMBEDDING_DIMENSIONS)
+                    )
+                    for category in [None] + list(hot_categories):
+                        name = SemanticMemory._vector_index_name(locale, category)
+                        if existing.get(name):
+                            continue
+                        predicate = sql.SQL("active")
+                        if category is not None:
+                            predicate = sql.SQL("active AND category = {}").format(sql.Literal(category))
+                        try:
+                            if name in existing:
+                                cur.execute(sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(
+                                    sql.Identifier(name)
+                                ))
+                            cur.execute(sql.SQL(
+                                "CREATE INDEX CONCURRENTLY IF NOT EXISTS {} ON aurora_semantic_memory "
+                                "USING hnsw ({} vector_cosine_ops) WHERE {}"
+                            ).format(sql.Identifier(name), expression, predicate))
+                            existing[name] = True
+                            print(f"✅ Built semantic vector index {name}")
+                        except Exception as e:
+                            print(f"⚠️ Semantic vector index ({locale}, {category or 'all'}): {str(e)}")
+        finally:
+            conn.close()
         
-        # Build query with ILIKE for fuzzy matching
-        category_filter = "AND category = %s" if category else ""
-        like_param = f"%{query}%"
+        indexed = SemanticMemory._map_vector_indexes(existing, hot_categories)
+        with SemanticMemory._vector_indexes_lock:
+            SemanticMemory._vector_indexes = indexed
+            SemanticMemory._vector_indexes_loaded_at = time.monotonic()
+        return indexed
+    
+    @staticmethod
+    def _indexed_categories(locale: str) -> set:
+        """
+        Indexed categories for a locale, read from the catalog (never builds)
+        
+        Re-read every SEMANTIC_INDEX_REFRESH_SECONDS, so indexes built later
+        by maintenance are picked up; exact scans until then.
+        """
+        now = time.monotonic()
+        if now - SemanticMemory._vector_indexes_loaded_at >= SEMANTIC_INDEX_REFRESH_SECONDS:
+            with SemanticMemory._vector_indexes_lock:
+                if now - SemanticMemory._vector_indexes_loaded_at >= SEMANTIC_INDEX_REFRESH_SECONDS:
+                    SemanticMemory._vector_indexes_loaded_at = now
+                    try:
+                        SemanticMemory._vector_indexes = SemanticMemory._map_vector_indexes(
+                            SemanticMemory._existing_vector_indexes(), SEMANTIC_HOT_CATEGORIES
+                        )
+                    except Exception as e:
+                        print(f"⚠️ Semantic vector indexes unavailable: {str(e)}")
+        return (SemanticMemory._vector_indexes or {}).get(locale, set())
+    
+    @staticmethod
+    def _search_statement(locale: str, category: Optional[str], exact: bool) -> Tuple[str, bool]:
+        """
+        Prepared statement for one search shape (registered on first use)
+        and whether it binds the category as $2:
+            sm_search_<locale>[_exact]     - unfiltered, global index / exact scan
+            sm_search_<locale>_hot_<slug>  - hot category, literal filter
+            sm_search_<locale>_exact_cat   - other categories, exact scan
+        Hot categories are inlined so even a generic plan can prove the
+        partial index predicate; other categories bind $2.
+        """
+        embedding_field = SemanticMemory.EMBEDDING_FIELDS[locale]
+        indexed = not exact and category in SemanticMemory._indexed_categories(locale)
+        
+        binds_category = False
+        if indexed and category is not None:
+            name = f"sm_search_{locale}_hot_{SemanticMemory._category_slug(category)}"
+            category_filter = "AND category = '" + category.replace("'", "''") + "'"
+            limit_param = "$2"
+        elif category is not None:
+            name = f"sm_search_{locale}_exact_cat"
+            category_filter = "AND category = $2"
+            limit_param = "$3"
+            binds_category = True
+        else:
+            name = f"sm_search_{locale}" if indexed else f"sm_search_{locale}_exact"
+            category_filter = ""
+            limit_param = "$2"
+        
+        if name in statements:
+            return name, binds_category
+        
+        distance_expr = f'"{embedding_field}"'
+        if indexed:
+            distance_expr = f'("{embedding_field}"::vector({EMBEDDING_DIMENSIONS}))'
+        
+        # The vector is bound once ($1) and referenced through an InitPlan,
+        # which the index can use
+        statements.register(name, f"""
+            WITH query AS (SELECT $1::vector AS v)
+            SELECT {SemanticMemory.RESULT_COLUMNS}, 1 - distance as similarity
+            FROM (
+                SELECT {SemanticMemory.RESULT_COLUMNS},
+                       {distance_expr} <=> (SELECT v FROM query) as distance
+                FROM aurora_semantic_memory
+                WHERE active = true AND "{embedding_field}" IS NOT NULL {category_filter}
+                ORDER BY distance
+                LIMIT {limit_param}
+            ) nearest
+            ORDER BY distance
+        """)
+        return name, binds_category
+    
+    @staticmethod
+    def semantic_search(query_embedding: List[float], locale: str = "en", 
+                       category: str = None, limit: int = 5, exact: bool = False):
+        """
+        Perform pgvector similarity search
+        
+        Unfiltered and hot-category searches use the matching (partial) HNSW
+        index, so a category filter never drops rows after the ANN walk.
+        Other categories - and exact=True - order by the raw column, which
+        no ANN index covers: an exact scan over that category's rows.
+        """
+        locale = locale.lower() if locale.lower() in SemanticMemory.EMBEDDING_FIELDS else "en"
+        category = category or None
+        name, binds_category = SemanticMemory._search_statement(locale, category, exact)
+        
+        settings = None
+        if not exact and category in SemanticMemory._indexed_categories(locale):
+            # HNSW returns at most ef_search candidates
+            settings = {"hnsw.ef_search": max(SEMANTIC_EF_SEARCH, limit)}
+        
+        params = [to_vector(query_embedding)]
+        if binds_category:
+            params.append(category)
+        params.append(limit)
+        
+        return DatabaseConnection.execute_prepared(name, tuple(params), settings=settings)
+    
+    @staticmethod
+    def _keyword_statement(locale: str, with_category: bool) -> str:
+        """sm_keyword_<locale>[_cat] - one LIKE pattern ($1) used four times"""
+        name = f"sm_keyword_{locale}" + ("_cat" if with_category else "")
+        if name in statements:
+            return name
+        
+        content_field = CONTENT_FIELDS[locale]
+        category_filter = "AND category = $2" if with_category else ""
+        limit_param = "$3" if with_category else "$2"
         
         # Adjust similarity scores for keyword fallback (higher to avoid ChatGPT threshold)
-        sql_query = f"""
-            SELECT *,
+        return statements.register(name, f"""
+            SELECT {SemanticMemory.RESULT_COLUMNS},
                    (CASE 
-                       WHEN LOWER("{content_field}") LIKE LOWER(%s) THEN 0.9
-                       WHEN EXISTS (SELECT 1 FROM unnest(tags) tag WHERE LOWER(tag) LIKE LOWER(%s)) THEN 0.75
+                       WHEN LOWER("{content_field}") LIKE LOWER($1) THEN 0.9
+                       WHEN EXISTS (SELECT 1 FROM unnest(tags) tag WHERE LOWER(tag) LIKE LOWER($1)) THEN 0.75
                        ELSE 0.6
                    END) as similarity
             FROM aurora_semantic_memory
             WHERE active = true 
-              AND (LOWER("{content_field}") LIKE LOWER(%s) 
-                   OR EXISTS (SELECT 1 FROM unnest(tags) tag WHERE LOWER(tag) LIKE LOWER(%s)))
+              AND (LOWER("{content_field}") LIKE LOWER($1) 
+                   OR EXISTS (SELECT 1 FROM unnest(tags) tag WHERE LOWER(tag) LIKE LOWER($1)))
               {category_filter}
             ORDER BY similarity DESC, confidence DESC
-            LIMIT %s
-        """
-        # Correct parameter order: [like, like, like, like, category?, limit]
-        search_params = [like_param, like_param, like_param, like_param]
+            LIMIT {limit_param}
+        """)
+    
+    @staticmethod
+    def keyword_search(query: str, locale: str = "en", category: str = None, limit: int = 5):
+        """Fallback keyword/tag search when embeddings unavailable"""
+        locale = locale.lower() if locale.lower() in CONTENT_FIELDS else "en"
+        name = SemanticMemory._keyword_statement(locale, bool(category))
+        
+        # Parameter order: [like, category?, limit]
+        search_params = [f"%{query}%"]
         if category:
             search_params.append(category)
         search_params.append(limit)
         
-        return DatabaseConnection.execute_query(sql_query, tuple(search_params))
+        return DatabaseConnection.execute_prepared(name, tuple(search_params))
+    
+    # Usage counters are buffered per process and flushed in one statement
+    FLUSH_USAGE = statements.register("sm_flush_usage", """
+        UPDATE aurora_semantic_memory sm
+        SET "usageCount" = sm."usageCount" + u.uses,
+            "lastUsedAt" = NOW()
+        FROM unnest($1::text[], $2::int[]) AS u(id, uses)
+        WHERE sm.id = u.id
+    """)
+    
+    _usage: Dict[str, int] = {}
+    _usage_lock = threading.Lock()
+    _usage_flushed_at = time.monotonic()
     
     @staticmethod
     def increment_usage(memory_id: str):
-        """Track knowledge usage"""
-        query = """
-            UPDATE aurora_semantic_memory
-            SET "usageCount" = "usageCount" + 1,
-                "lastUsedAt" = NOW()
-            WHERE id = %s
-        """
-        DatabaseConnection.execute_query(query, (memory_id,), fetch="none")
+        """Track knowledge usage (buffered; see flush_usage)"""
+        with SemanticMemory._usage_lock:
+            SemanticMemory._usage[memory_id] = SemanticMemory._usage.get(memory_id, 0) + 1
+            overdue = time.monotonic() - SemanticMemory._usage_flushed_at >= USAGE_FLUSH_MAX_SECONDS
+        if overdue:
+            # Normally the scheduler flushes first; this covers it being disabled
+            SemanticMemory.flush_usage()
+    
+    @staticmethod
+    def flush_usage() -> int:
+        """Write buffered usage counters (one UPDATE); returns rows touched"""
+        with SemanticMemory._usage_lock:
+            usage, SemanticMemory._usage = SemanticMemory._usage, {}
+            SemanticMemory._usage_flushed_at = time.monotonic()
+        if not usage:
+            return 0
+        try:
+            DatabaseConnection.execute_prepared(
+                SemanticMemory.FLUSH_USAGE, (list(usage), list(usage.values())), fetch="none"
+            )
+        except Exception:
+            # Keep the counts for the next flush
+            with SemanticMemory._usage_lock:
+                for memory_id, uses in usage.items():
+                    SemanticMemory._usage[memory_id] = SemanticMemory._usage.get(memory_id, 0) + uses
+            raise
+        metrics.increment("memory.sm.usage_flushed", sum(usage.values()))
+        return len(usage)
 
 
 class ProceduralMemory:
@@ -454,33 +1388,80 @@ class MemoryManager:
     
     def cleanup_expired(self):
         """Run maintenance on all memory layers"""
+        import partitioning
+        
         self.sc.cleanup_expired()
         self.wm.cleanup_expired()
-        self.em.anonymize_old_memories()
+        if partitioning.is_partitioned("aurora_episodic_memory"):
+            partitioning.maintain("aurora_episodic_memory")
+        self.em.anonymize_old_memories(max_seconds=ANONYMIZE_MAX_SECONDS)
     
     def store_conversation_snapshot(self, session_id: str, conversation_id: str,
-                                   customer_id: str, messages: List[Dict],
-                                   emotional_state: Dict):
-        """Store complete conversation snapshot across layers"""
-        # SC: Raw input
-        latest_message = messages[-1] if messages else {}
-        self.sc.store(session_id, latest_message.get('content', ''))
-        
-        # WM: Conversation context
-        context_window = {
-            'messages': messages[-10:],  # Last 10 messages
-            'message_count': len(messages)
-        }
-        self.wm.store(session_id, conversation_id, context_window,
-                     current_intent=latest_message.get('intent'),
-                     emotional_state=emotional_state)
-        
-        # EM: Episodic event
-        self.em.store(
-            session_id=session_id,
-            conversation_id=conversation_id,
-            customer_id=customer_id,
-            event_type='conversation_turn',
-            content=json.dumps(latest_message),
-            emotional_vector=emotional_state
-        )
+                                   customer_id: str, new_messages: List[Dict],
+                                   emotional_state: Dict,
+                                   trajectory: Optional[Dict] = None):
+        """
+        Store complete conversation snapshot across layers
+        
+        new_messages is the turn being recorded (not the full history): WM
+        appends it as-is, so callers must not resend messages already stored.
+        WM and EM (and table-backed SC) writes share one transaction and
+        one round trip; the default SC backend stays in process.
+        """
+        latest_message = new_messages[-1] if new_messages else {}
+        
+        wm_emotional_state = emotional_state
+        if trajectory is not None:
+            wm_emotional_state = {
+                **emotional_state,
+                'trajectory': trajectory,
+                'trajectoryState': self.wm.trajectory_state(session_id),
+            }
+
+        with DatabaseConnection.unit_of_work() as uow:
+            # SC: Raw input
+            self.sc.store(session_id, latest_message.get('content', ''), uow=uow)
+            
+            # WM: Conversation context
+            self.wm.append(session_id, conversation_id, new_messages[-WORKING_MEMORY_WINDOW:],
+                          current_intent=latest_message.get('intent'),
+                          emotional_state=wm_emotional_state, uow=uow)
+            
+            # EM: Episodic event
+            self.em.store(
+                session_id=session_id,
+                conversation_id=conversation_id,
+                customer_id=customer_id,
+                event_type='conversation_turn',
+                content=json.dumps(latest_message),
+                emotional_vector=emotional_state,
+                uow=uow
+            )
+    
+    def store_reply(self, session_id: str, conversation_id: str, reply: str):
+        """
+        Append the assistant's reply to the session window
+        
+        Called once the reply is generated, after store_conversation_snapshot
+        recorded the user's turn; the emotional state is left as stored.
+        Best effort: the reply has already been produced.
+        """
+        try:
+            self.wm.append(session_id, conversation_id, [{"role": "assistant", "content": reply}])
+        except Exception as e:
+            print(f"⚠️ Could not store reply for {session_id}: {e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aurora memory maintenance")
+    parser.add_argument("command", choices=["ensure-indexes", "ensure-unlogged"])
+    parser.add_argument("--hot-categories", help="Comma-separated (default AURORA_SEMANTIC_HOT_CATEGORIES)")
+    args = parser.parse_args()
+    
+    if args.command == "ensure-unlogged":
+        raise SystemExit(0 if SensoryContextMemory.ensure_unlogged() else 1)
+    
+    hot = [c.strip() for c in args.hot_categories.split(",") if c.strip()] if args.hot_categories else None
+    for locale, categories in SemanticMemory.ensure_vector_indexes(hot).items():
+        names = sorted("all" if c is None else c for c in categories)
+        print(f"📊 {locale}: {', '.join(names) or 'no indexes'}")
@@ -0,0 +1,100 @@
+"""
+Aurora Metrics Registry
+=======================
+
+Lightweight in-process metrics shared by the chat pipeline:
+- Counters (cache hits, coalesced calls, fallbacks...)
+- Gauges (current state values)
+- Histograms with fixed buckets (latencies in seconds)
+
+Exposed as JSON through GET /metrics. Values are per worker process.
+"""
+
+import threading
+from bisect import bisect_left
+from typing import Dict, Any, Optional, Tuple
+
+# Latency buckets in seconds (upper bounds)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram with running sum and count"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = self.count
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "avg": round(self.total / self.count, 6) if self.count else 0.0,
+            "buckets": buckets,
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe registry of counters, gauges and histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._histograms: Dict[str, Histogram] = {}
+
+    def increment(self, name: str, value: float = 1.0):
+        """Increment a counter"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0.0) + value
+
+    def set_gauge(self, name: str, value: float):
+        """Set a gauge to an absolute value"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float, buckets: Optional[Tuple[float, ...]] = None):
+        """Record a histogram observation"""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = Histogram(buckets or DEFAULT_BUCKETS)
+                self._histograms[name] = histogram
+            histogram.observe(value)
+
+    def counter(self, name: str) -> float:
+        """Read current counter value"""
+        with self._lock:
+            return self._counters.get(name, 0.0)
+
+    def ratio(self, numerator: str, denominator: str) -> float:
+        """Ratio between two counters (0.0 when denominator is empty)"""
+        with self._lock:
+            den = self._counters.get(denominator, 0.0)
+            return self._counters.get(numerator, 0.0) / den if den else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Serializable view of all metrics"""
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "histograms": {name: h.to_dict() for name, h in self._histograms.items()},
+            }
+
+
+# Global instance
+metrics = MetricsRegistry()
@@ -0,0 +1,133 @@
+"""
+Aurora Knowledge Migration
+==========================
+
+Consolidates the legacy aurora_knowledge table (one row per language,
+used by EmbeddingsService) into aurora_semantic_memory (one row per fact
+with contentEn/Pt/Es + per-locale embeddings), so a single index serves
+the retrieval engine:
+- Rows with the same content_type + metadata.name become one fact
+- Existing embeddings are copied (no OpenAI calls)
+- Locales missing from a group reuse the English (or first available)
+  translation and embedding
+- Idempotent: migrated groups are tagged sourceType='aurora_knowledge'
+  and skipped on re-runs
+
+Usage:
+    python migrate_knowledge.py [--dry-run]
+"""
+
+import argparse
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+from psycopg2.extras import Json
+
+from memory import DatabaseConnection
+
+SOURCE_TYPE = "aurora_knowledge"
+LOCALES = ("en", "pt", "es")
+
+
+def load_legacy_rows() -> List[Dict[str, Any]]:
+    return DatabaseConnection.execute_query("""
+        SELECT id, content, content_type, language, metadata,
+               embedding::text as embedding
+        FROM aurora_knowledge
+        ORDER BY id
+    """) or []
+
+
+def group_rows(rows: List[Dict[str, Any]]) -> "OrderedDict[Tuple[str, str], List[Dict[str, Any]]]":
+    """Group translations of the same fact (content_type + metadata.name)"""
+    groups: "OrderedDict[Tuple[str, str], List[Dict[str, Any]]]" = OrderedDict()
+    for row in rows:
+        name = (row.get("metadata") or {}).get("name")
+        key = (row["content_type"], name or f"id:{row['id']}")
+        groups.setdefault(key, []).append(row)
+    return groups
+
+
+def build_fact(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """One aurora_semantic_memory row from a group of per-language rows"""
+    by_locale: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        by_locale.setdefault((row["language"] or "en").lower()[:2], row)
+
+    fallback = by_locale.get("en") or rows[0]
+    metadata = dict(fallback.get("metadata") or {})
+    metadata["migratedFrom"] = [row["id"] for row in rows]
+    metadata["languages"] = sorted(by_locale)
+
+    fact = {
+        "category": fallback["content_type"],
+        "subcategory": metadata.get("category"),
+        "sourceId": str(min(row["id"] for row in rows)),
+        "metadata": metadata,
+    }
+    for locale in LOCALES:
+        row = by_locale.get(locale, fallback)
+        fact[f"content_{locale}"] = row["content"]
+        fact[f"embedding_{locale}"] = row["embedding"]
+    return fact
+
+
+def migrated_source_ids() -> set:
+    rows = DatabaseConnection.execute_query(
+        'SELECT "sourceId" FROM aurora_semantic_memory WHERE "sourceType" = %s',
+        (SOURCE_TYPE,)
+    ) or []
+    return {row["sourceId"] for row in rows}
+
+
+def insert_fact(fact: Dict[str, Any]):
+    DatabaseConnection.execute_query("""
+        INSERT INTO aurora_semantic_memory
+        (id, "contentEn", "contentPt", "contentEs",
+         "embeddingEn", "embeddingPt", "embeddingEs",
+         category, subcategory, tags, "sourceType", "sourceId",
+         confidence, metadata, "createdAt", "updatedAt")
+        VALUES (gen_random_uuid()::text, %s, %s, %s,
+                %s::vector, %s::vector, %s::vector,
+                %s, %s, %s, %s, %s, 1.0, %s, NOW(), NOW())
+    """, (
+        fact["content_en"], fact["content_pt"], fact["content_es"],
+        fact["embedding_en"], fact["embedding_pt"], fact["embedding_es"],
+        fact["category"], fact["subcategory"], [], SOURCE_TYPE, fact["sourceId"],
+        Json(fact["metadata"])
+    ), fetch="none")
+
+
+def migrate(dry_run: bool = False) -> Dict[str, int]:
+    rows = load_legacy_rows()
+    groups = group_rows(rows)
+    done = migrated_source_ids()
+
+    stats = {"legacy_rows": len(rows), "facts": len(groups), "migrated": 0, "skipped": 0}
+    for key, group in groups.items():
+        fact = build_fact(group)
+        if fact["sourceId"] in done:
+            stats["skipped"] += 1
+            continue
+        if dry_run:
+            print(f"  • {key[0]} / {key[1]} ({', '.join(fact['metadata']['languages'])})")
+        else:
+            insert_fact(fact)
+        stats["migrated"] += 1
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consolidate aurora_knowledge into aurora_semantic_memory")
+    parser.add_argument("--dry-run", action="store_true", help="Only list what would be migrated")
+    args = parser.parse_args()
+
+    print("\n🔄 Migrating aurora_knowledge → aurora_semantic_memory...")
+    stats = migrate(dry_run=args.dry_run)
+    action = "Would migrate" if args.dry_run else "Migrated"
+    print(f"\n✅ {action} {stats['migrated']} facts from {stats['legacy_rows']} legacy rows "
+          f"({stats['skipped']} already migrated)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,412 @@
+"""
+Aurora Memory Partitioning
+==========================
+
+Time range partitions for the append-heavy memory layers, so expiry is a
+partition drop instead of a DELETE and maintenance touches one slice at a time:
+- aurora_sensory_context   hourly on "expiresAt" (table/unlogged SC backends);
+                           expired partitions are detached and dropped
+- aurora_episodic_memory   monthly on "createdAt"; kept, and anonymized after
+                           18 months by lgpd_anonymizer.py (its "createdAt"
+                           keyset batches prune to one partition at a time)
+
+Partitions are created ahead of time (plus a DEFAULT partition, so inserts
+never fail if maintenance falls behind). Expired DEFAULT rows are deleted, and
+rows already in DEFAULT for a new partition's range are moved into it when it
+is created. Detach/drop runs with a short
+lock_timeout and is simply retried on the next run when chat traffic holds
+the parent lock.
+
+aurora_working_memory is not partitioned: it holds one upserted row per
+session (ON CONFLICT (id)), and a unique key on a partitioned table must
+include the partition column. Its volume is bounded by active sessions.
+
+The partitioned tables live in PARTITION_SCHEMA (AURORA_PARTITION_SCHEMA,
+default aurora_partitioned), not in public: Prisma (`npm run db:push`) only
+manages public, where the models still declare `id` as the primary key, so a
+push can neither drop the partitions nor fight over the (id, partition column)
+key. Every Aurora connection puts PARTITION_SCHEMA ahead of public on its
+search_path, so unqualified queries use the partitioned copy once it exists
+and the Prisma-owned public table is left behind as the (shadowed) legacy copy.
+
+Convert an existing table once (copies rows into the schema; --drop-legacy
+empties the public table instead of dropping it, so Prisma's view stays in
+sync), restart the workers (their prepared statements are bound to the public
+table), then run maintenance periodically (MemoryManager.cleanup_expired does
+it too):
+    python partitioning.py migrate aurora_episodic_memory
+    python partitioning.py maintain
+    python partitioning.py status
+"""
+
+import argparse
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from memory import PARTITION_SCHEMA, DatabaseConnection
+from metrics import metrics
+
+# Never wait behind chat traffic for the parent's lock (retried next run)
+MAINTENANCE_LOCK_TIMEOUT = "2s"
+
+
+@dataclass
+class PartitionSpec:
+    """How one memory table is range-partitioned"""
+    table: str
+    column: str                        # quoted partition key column
+    interval: str                      # "hour" | "month"
+    premake: int                       # partitions created ahead of now
+    drop_after: Optional[timedelta]    # drop once the upper bound is this old (None = keep)
+    unlogged: Callable[[], bool] = lambda: False
+
+
+def _sensory_unlogged() -> bool:
+    from memory import SENSORY_CONTEXT_BACKEND
+    return SENSORY_CONTEXT_BACKEND == "unlogged"
+
+
+SPECS: Dict[str, PartitionSpec] = {
+    "aurora_sensory_context": PartitionSpec(
+        table="aurora_sensory_context", column='"expiresAt"', interval="hour",
+        premake=3, drop_after=timedelta(minutes=5), unlogged=_sensory_unlogged
+    ),
+    "aurora_episodic_memory": PartitionSpec(
+        table="aurora_episodic_memory", column='"createdAt"', interval="month",
+        premake=2, drop_after=None
+    ),
+}
+
+_NAME_FORMATS = {"hour": "%Y%m%d%H", "month": "%Y%m"}
+_partitioned: Dict[str, bool] = {}
+
+
+def qualified(name: str) -> str:
+    return f"{PARTITION_SCHEMA}.{name}"
+
+
+def floor_bound(moment: datetime, interval: str) -> datetime:
+    if interval == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_bound(start: datetime, interval: str) -> datetime:
+    if interval == "hour":
+        return start + timedelta(hours=1)
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def partition_name(spec: PartitionSpec, start: datetime) -> str:
+    return f"{spec.table}_p{start.strftime(_NAME_FORMATS[spec.interval])}"
+
+
+def parse_partition(spec: PartitionSpec, name: str) -> Optional[Tuple[datetime, datetime]]:
+    """(lower, upper) bounds encoded in a partition name, None for DEFAULT/others"""
+    match = re.fullmatch(re.escape(spec.table) + r"_p(\d+)", name)
+    if not match:
+        return None
+    try:
+        start = datetime.strptime(match.group(1), _NAME_FORMATS[spec.interval])
+    except ValueError:
+        return None
+    return start, next_bound(start, spec.interval)
+
+
+def is_partitioned(table: str) -> bool:
+    """True once the table has been converted (only True is cached, so a later migrate is seen)"""
+    if table not in _partitioned:
+        row = DatabaseConnection.execute_query(
+            "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (qualified(table),), fetch="one"
+        )
+        if row is None or row["relkind"] != "p":
+            return False
+        _partitioned[table] = True
+    return True
+
+
+def list_partitions(table: str) -> List[str]:
+    rows = DatabaseConnection.execute_query("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+        ORDER BY c.relname
+    """, (qualified(table),)) or []
+    return [row["relname"] for row in rows]
+
+
+def _create_partition(cur, spec: PartitionSpec, start: datetime):
+    end = next_bound(start, spec.interval)
+    unlogged = "UNLOGGED " if spec.unlogged() else ""
+    cur.execute(f"""
+        CREATE {unlogged}TABLE IF NOT EXISTS {qualified(partition_name(spec, start))}
+        PARTITION OF {qualified(spec.table)}
+        FOR VALUES FROM (%s) TO (%s)
+    """, (start, end))
+
+
+def _attach_from_default(cur, spec: PartitionSpec, start: datetime):
+    """
+    Create a partition whose range already has rows in DEFAULT
+
+    CREATE ... PARTITION OF would fail on those rows forever, so the
+    partition is built standalone, the rows are moved out of DEFAULT, and it
+    is attached, all in one transaction.
+    """
+    end = next_bound(start, spec.interval)
+    name = qualified(partition_name(spec, start))
+    unlogged = "UNLOGGED " if spec.unlogged() else ""
+    cur.execute("BEGIN")
+    try:
+        cur.execute(f"""
+            CREATE {unlogged}TABLE {name}
+            (LIKE {qualified(spec.table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+        """)
+        cur.execute(f"""
+            WITH moved AS (
+                DELETE FROM {qualified(spec.table)}_default
+                WHERE {spec.column} >= %s AND {spec.column} < %s
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """, (start, end))
+        moved = cur.rowcount
+        cur.execute(f"""
+            ALTER TABLE {qualified(spec.table)} ATTACH PARTITION {name}
+            FOR VALUES FROM (%s) TO (%s)
+        """, (start, end))
+        cur.execute("COMMIT")
+    except Exception:
+        cur.execute("ROLLBACK")
+        raise
+    print(f"📦 Moved {moved} rows from {spec.table}_default into {name}")
+    metrics.increment("partitioning.default_moved", moved)
+
+
+def _default_has_rows(cur, spec: PartitionSpec, start: datetime) -> bool:
+    cur.execute(f"""
+        SELECT EXISTS (
+            SELECT 1 FROM {qualified(spec.table)}_default
+            WHERE {spec.column} >= %s AND {spec.column} < %s
+        )
+    """, (start, next_bound(start, spec.interval)))
+    return cur.fetchone()[0]
+
+
+def ensure_partitions(spec: PartitionSpec, now: Optional[datetime] = None) -> List[str]:
+    """Create the current and next `premake` partitions (idempotent)"""
+    now = now or datetime.now()
+    start = floor_bound(now, spec.interval)
+    existing = set(list_partitions(spec.table))
+    has_default = f"{spec.table}_default" in existing
+    created = []
+
+    conn = DatabaseConnection.get_connection()
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("SELECT set_config('lock_timeout', %s, false)", (MAINTENANCE_LOCK_TIMEOUT,))
+            for _ in range(spec.premake + 1):
+                name = partition_name(spec, start)
+                if name not in existing:
+                    try:
+                        if has_default and _default_has_rows(cur, spec, start):
+                            _attach_from_default(cur, spec, start)
+                        else:
+                            _create_partition(cur, spec, start)
+                        created.append(name)
+                    except Exception as e:
+                        # e.g. lock timeout
+                        print(f"⚠️ Could not create partition {name}: {e}")
+                        metrics.increment("partitioning.create_errors")
+                start = next_bound(start, spec.interval)
+    finally:
+        conn.close()
+
+    for name in created:
+        print(f"✅ Created partition {name}")
+    metrics.increment("partitioning.created", len(created))
+    return created
+
+
+def expire_partitions(spec: PartitionSpec, now: Optional[datetime] = None) -> List[str]:
+    """Detach and drop partitions whose whole range has expired"""
+    if spec.drop_after is None:
+        return []
+    cutoff = (now or datetime.now()) - spec.drop_after
+    dropped = []
+
+    conn = DatabaseConnection.get_connection()
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("SELECT set_config('lock_timeout', %s, false)", (MAINTENANCE_LOCK_TIMEOUT,))
+            for name in list_partitions(spec.table):
+                bounds = parse_partition(spec, name)
+                if bounds is None or bounds[1] > cutoff:
+                    continue
+                try:
+                    cur.execute(f"ALTER TABLE {qualified(spec.table)} DETACH PARTITION {qualified(name)}")
+                    cur.execute(f"DROP TABLE {qualified(name)}")
+                    dropped.append(name)
+                except Exception as e:
+                    print(f"⚠️ Could not drop partition {name} (retried next run): {e}")
+                    metrics.increment("partitioning.drop_errors")
+    finally:
+        conn.close()
+
+    for name in dropped:
+        print(f"🗑️ Dropped expired partition {name}")
+    metrics.increment("partitioning.dropped", len(dropped))
+    return dropped
+
+
+def purge_default(spec: PartitionSpec, now: Optional[datetime] = None) -> int:
+    """
+    Delete expired rows from the DEFAULT partition
+
+    Rows land there when maintenance falls behind; no partition drop ever
+    covers them, so they are expired by DELETE with the same cutoff.
+    """
+    if spec.drop_after is None:
+        return 0
+    if f"{spec.table}_default" not in list_partitions(spec.table):
+        return 0
+    cutoff = (now or datetime.now()) - spec.drop_after
+    conn = DatabaseConnection.get_connection()
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("SELECT set_config('lock_timeout', %s, false)", (MAINTENANCE_LOCK_TIMEOUT,))
+            cur.execute(f"DELETE FROM {qualified(spec.table)}_default WHERE {spec.column} < %s", (cutoff,))
+            purged = cur.rowcount
+    except Exception as e:
+        print(f"⚠️ Could not purge {spec.table}_default (retried next run): {e}")
+        metrics.increment("partitioning.purge_errors")
+        return 0
+    finally:
+        conn.close()
+
+    if purged:
+        print(f"🗑️ Purged {purged} expired rows from {spec.table}_default")
+    metrics.increment("partitioning.default_purged", purged)
+    return purged
+
+
+def maintain(table: str) -> Dict[str, List[str]]:
+    """Create upcoming partitions and drop/purge expired rows for one table"""
+    spec = SPECS[table]
+    if not is_partitioned(table):
+        return {"created": [], "dropped": []}
+    purge_default(spec)
+    return {"created": ensure_partitions(spec), "dropped": expire_partitions(spec)}
+
+
+def maintain_all() -> Dict[str, Dict[str, List[str]]]:
+    return {table: maintain(table) for table in SPECS}
+
+
+def _copy_indexes(cur, spec: PartitionSpec, source: str):
+    """Recreate the public table's non-unique indexes on the partitioned parent"""
+    cur.execute("""
+        SELECT pg_get_indexdef(i.oid) AS definition
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        WHERE x.indrelid = to_regclass(%s) AND NOT x.indisunique
+    """, (source,))
+    for (definition,) in cur.fetchall():
+        # Same index names are fine: indexes live in their table's schema
+        cur.execute(re.sub(rf"\bON (\w+\.)?{re.escape(spec.table)}\b", f"ON {qualified(spec.table)}", definition))
+
+
+def migrate(table: str, drop_legacy: bool = False) -> Dict[str, int]:
+    """
+    Copy a public memory table into a range-partitioned one in PARTITION_SCHEMA
+
+    Runs in one transaction: a partitioned table with the same
+    columns/defaults is created in the schema (primary key (id, partition
+    column)), partitions are created for every existing range, and the rows
+    are copied over. The public table is never renamed or dropped, since
+    Prisma owns it; drop_legacy only empties it.
+    """
+    spec = SPECS[table]
+    source = f"public.{table}"
+    target = qualified(table)
+    conn = DatabaseConnection.get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (target,))
+            if cur.fetchone() is not None:
+                print(f"ℹ️ {target} already exists")
+                return {"rows": 0, "partitions": 0}
+            cur.execute("SELECT to_regclass(%s)", (source,))
+            if cur.fetchone()[0] is None:
+                raise ValueError(f"Table {source} does not exist")
+
+            cur.execute(f"CREATE SCHEMA IF NOT EXISTS {PARTITION_SCHEMA}")
+            cur.execute(f"LOCK TABLE {source} IN ACCESS EXCLUSIVE MODE")
+            cur.execute(f"""
+                CREATE TABLE {target} (LIKE {source} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+                PARTITION BY RANGE ({spec.column})
+            """)
+            cur.execute(f"ALTER TABLE {target} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, {spec.column})")
+            _copy_indexes(cur, spec, source)
+
+            cur.execute(f"SELECT MIN({spec.column}), MAX({spec.column}) FROM {source}")
+            oldest, newest = cur.fetchone()
+            now = datetime.now()
+            start = floor_bound(min(oldest or now, now), spec.interval)
+            last = floor_bound(max(newest or now, now), spec.interval)
+            for _ in range(spec.premake):
+                last = next_bound(last, spec.interval)
+            partitions = 0
+            while start <= last:
+                _create_partition(cur, spec, start)
+                partitions += 1
+                start = next_bound(start, spec.interval)
+            cur.execute(f"CREATE TABLE IF NOT EXISTS {target}_default PARTITION OF {target} DEFAULT")
+
+            cur.execute(f"INSERT INTO {target} SELECT * FROM {source}")
+            copied = cur.rowcount
+            if drop_legacy:
+                cur.execute(f"TRUNCATE {source}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    _partitioned[table] = True
+    print(f"✅ {target}: {copied} rows into {partitions} partitions"
+          + ("" if drop_legacy else f" (old rows kept in {source})")
+          + " - restart the workers to pick it up")
+    return {"rows": copied, "partitions": partitions}
+
+
+def status() -> Dict[str, List[str]]:
+    return {table: list_partitions(table) if is_partitioned(table) else [] for table in SPECS}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aurora memory table partitioning")
+    parser.add_argument("command", choices=["migrate", "maintain", "status"])
+    parser.add_argument("table", nargs="?", choices=sorted(SPECS), help="Table to migrate")
+    parser.add_argument("--drop-legacy", action="store_true", help="Empty the public table after copying")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        if not args.table:
+            parser.error("migrate needs a table")
+        migrate(args.table, drop_legacy=args.drop_legacy)
+    elif args.command == "maintain":
+        for table, result in maintain_all().items():
+            print(f"📊 {table}: {len(result['created'])} created, {len(result['dropped'])} dropped")
+    else:
+        for table, partitions in status().items():
+            print(f"📊 {table}: {len(partitions)} partitions" if partitions else f"📊 {table}: not partitioned")
+            for name in partitions:
+                print(f"   • {name}")
@@ -10,16 +10,41 @@ Production-ready Retrieval-Augmented Generation:
 """
 
 import os
+import time
 import asyncio
+import numpy as np
 from typing import List, Dict, Optional, Tuple
 from dataclasses import dataclass
 import openai
 from memory import SemanticMemory, DatabaseConnection
+from retrieval import RetrievalEngine
+from response_cache import response_cache
+from singleflight import SingleFlight, normalize_query
+from metrics import metrics
+from deadline import Deadline, LLM_MIN_BUDGET, TEMPLATE_THRESHOLD
+from circuit_breaker import openai_breaker
+from vector_codec import to_vector
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 if OPENAI_API_KEY:
     openai.api_key = OPENAI_API_KEY
 
+# Speculative mode: start the completion while retrieval is still running
+SPECULATIVE_LLM = os.getenv("AURORA_SPECULATIVE_LLM", "false").lower() in ("1", "true", "yes")
+
+# Below this semantic similarity the KB context is irrelevant to the draft
+SPECULATIVE_CONTEXT_MIN_SIMILARITY = 0.5
+
+
+# Concurrent identical (normalized query, locale) requests share these calls
+embedding_flight = SingleFlight("embedding")
+retrieval_flight = SingleFlight("retrieval")
+completion_flight = SingleFlight("completion")
+
+# query_embedding value for "embedding stage already failed or timed out":
+# go straight to keyword search instead of re-joining the slow embedding call
+EMBEDDING_UNAVAILABLE = object()
+
 
 @dataclass
 class SearchResult:
@@ -45,37 +70,54 @@ class EmbeddingGenerator:
     """Manages OpenAI embeddings generation"""
     
     @staticmethod
-    async def generate(text: str, model: str = "text-embedding-3-small") -> Optional[List[float]]:
-        """Generate 1536D embedding using OpenAI"""
+    async def generate(text: str, model: str = "text-embedding-3-small",
+                       respect_breaker: bool = True) -> Optional[np.ndarray]:
+        """
+        Generate 1536D float32 embedding using OpenAI
+        
+        Returns None when the OpenAI circuit is open (unless respect_breaker=False,
+        used by the health monitor to probe recovery).
+        """
         if not OPENAI_API_KEY:
             print("⚠️ OPENAI_API_KEY not set - embeddings disabled")
             return None
         
+        if respect_breaker and not openai_breaker.allow_request():
+            return None
+        
         try:
             response = await asyncio.to_thread(
                 openai.embeddings.create,
                 model=model,
                 input=text
             )
-            return response.data[0].embedding
+            openai_breaker.record_success()
+            return to_vector(response.data[0].embedding)
         except Exception as e:
+            openai_breaker.record_failure(e)
             print(f"❌ Embedding generation error: {str(e)}")
             return None
     
     @staticmethod
-    async def batch_generate(texts: List[str], model: str = "text-embedding-3-small") -> List[Optional[List[float]]]:
+    async def batch_generate(texts: List[str], model: str = "text-embedding-3-small",
+                             respect_breaker: bool = True) -> List[Optional[np.ndarray]]:
         """Generate embeddings for multiple texts"""
         if not OPENAI_API_KEY:
             return [None] * len(texts)
         
+        if respect_breaker and not openai_breaker.allow_request():
+            return [None] * len(texts)
+        
         try:
             response = await asyncio.to_thread(
                 openai.embeddings.create,
                 model=model,
                 input=texts
             )
-            return [item.embedding for item in response.data]
+            openai_breaker.record_success()
+            return [to_vector(item.embedding) for item in response.data]
         except Exception as e:
+            openai_breaker.record_failure(e)
             print(f"❌ Batch embedding error: {str(e)}")
             return [None] * len(texts)
 
@@ -86,83 +128,71 @@ class RAGRetriever:
     def __init__(self):
         self.embedding_generator = EmbeddingGenerator()
         self.semantic_memory = SemanticMemory()
+        self.engine = RetrievalEngine()
     
     async def search(self, query: str, locale: str = "en", category: Optional[str] = None, 
-                    top_k: int = 5) -> List[SearchResult]:
-        """Perform semantic search with pgvector OR keyword fallback"""
-        # Generate query embedding
-        query_embedding = await self.embedding_generator.generate(query)
-        if not query_embedding:
+                    top_k: int = 5, query_embedding: Optional[np.ndarray] = None) -> List[SearchResult]:
+        """
+        Perform semantic search with pgvector OR keyword fallback
+        
+        query_embedding: reused if given; EMBEDDING_UNAVAILABLE skips
+        embedding entirely (keyword search).
+        """
+        # Generate query embedding (unless caller already has it)
+        if query_embedding is None:
+            query_embedding = await self.embed_query(query, locale)
+        if query_embedding is None or query_embedding is EMBEDDING_UNAVAILABLE:
             print("⚠️ Embeddings unavailable - using keyword search fallback")
             return self._keyword_fallback_search(query, locale, category, top_k)
         
-        # Perform vector similarity search
-        results = self.semantic_memory.semantic_search(
-            query_embedding=query_embedding,
-            locale=locale,
-            category=category,
-            limit=top_k
+        # Perform vector similarity search (shared by identical concurrent queries)
+        hits = await retrieval_flight.do(
+            (normalize_query(query), locale, category, top_k),
+            lambda: asyncio.to_thread(
+                self.engine.vector_search,
+                query_embedding,
+                locale,
+                category,
+                top_k
+            )
+        )
+        return self._to_results(hits)
+    
+    async def embed_query(self, query: str, locale: str = "en") -> Optional[np.ndarray]:
+        """Generate query embedding, coalescing identical concurrent queries"""
+        return await embedding_flight.do(
+            (normalize_query(query), locale),
+            lambda: self.embedding_generator.generate(query)
         )
-        
-        # Convert to SearchResult objects
-        search_results = []
-        content_fields = {
-            "en": "contentEn",
-            "pt": "contentPt",
-            "es": "contentEs"
-        }
-        content_field = content_fields.get(locale.lower(), "contentEn")
-        
-        for row in results:
-            search_results.append(SearchResult(
-                id=row['id'],
-                content=row.get(content_field, row.get('contentEn', '')),
-                similarity=float(row['similarity']),
-                confidence=float(row.get('confidence', 1.0)),
-                category=row['category'],
-                metadata=row.get('metadata', {})
-            ))
-        
-        return search_results
     
     def _keyword_fallback_search(self, query: str, locale: str, category: Optional[str], top_k: int) -> List[SearchResult]:
         """Fallback to keyword search when embeddings unavailable"""
-        results = self.semantic_memory.keyword_search(
-            query=query,
-            locale=locale,
-            category=category,
-            limit=top_k
-        )
-        
-        # Convert to SearchResult objects
-        search_results = []
-        content_fields = {
-            "en": "contentEn",
-            "pt": "contentPt",
-            "es": "contentEs"
-        }
-        content_field = content_fields.get(locale.lower(), "contentEn")
-        
-        for row in results:
-            search_results.append(SearchResult(
-                id=row['id'],
-                content=row.get(content_field, row.get('contentEn', '')),
-                similarity=float(row['similarity']),
-                confidence=float(row.get('confidence', 1.0)),
-                category=row['category'],
-                metadata=row.get('metadata', {})
-            ))
-        
-        return search_results
+        return self._to_results(self.engine.keyword_search(query, locale, category, top_k))
+    
+    @staticmethod
+    def _to_results(hits: List[Dict]) -> List[SearchResult]:
+        """Convert retrieval engine hits to SearchResult objects"""
+        return [
+            SearchResult(
+                id=hit['id'],
+                content=hit['content'],
+                similarity=hit['similarity'],
+                confidence=hit['confidence'],
+                category=hit['category'],
+                metadata=hit['metadata']
+            )
+            for hit in hits
+        ]
     
     async def hybrid_search(self, query: str, emotional_state: Dict, 
                            conversation_context: Dict, locale: str = "en",
-                           top_k: int = 5) -> List[Tuple[SearchResult, HybridScore]]:
+                           top_k: int = 5, query_embedding: Optional[np.ndarray] = None
+                           ) -> List[Tuple[SearchResult, HybridScore]]:
         """
         Hybrid scoring: λ₁=0.4 (affective) + λ₂=0.35 (semantic) + λ₃=0.25 (utility)
         """
         # Step 1: Semantic search
-        semantic_results = await self.search(query, locale, top_k=top_k)
+        semantic_results = await self.search(query, locale, top_k=top_k, query_embedding=query_embedding)
         
         # Step 2: Calculate hybrid scores
         scored_results = []
@@ -261,12 +291,14 @@ class RAGRetriever:
 class AutonomousDecisionEngine:
     """Decides when to use knowledge base vs ChatGPT fallback"""
     
-    def __init__(self, confidence_threshold: float = 0.85):
+    def __init__(self, confidence_threshold: float = 0.85, speculative: Optional[bool] = None):
         self.confidence_threshold = confidence_threshold
+        self.speculative = SPECULATIVE_LLM if speculative is None else speculative
         self.rag_retriever = RAGRetriever()
     
     async def should_use_chatgpt(self, query: str, emotional_state: Dict,
-                                 conversation_context: Dict, locale: str = "en") -> Tuple[bool, Optional[str]]:
+                                 conversation_context: Dict, locale: str = "en",
+                                 query_embedding: Optional[np.ndarray] = None) -> Tuple[bool, Optional[str]]:
         """
         Progressive autonomy: Use ChatGPT LESS as knowledge base grows
         Returns: (use_chatgpt: bool, reason: str)
@@ -276,9 +308,14 @@ class AutonomousDecisionEngine:
             # No OpenAI available - MUST use KB only
             return False, "openai_unavailable"
         
+        if openai_breaker.is_open():
+            # OpenAI failing (quota/outage) - degraded KB-only mode
+            return False, "openai_circuit_open"
+        
         # Perform hybrid search
         results = await self.rag_retriever.hybrid_search(
-            query, emotional_state, conversation_context, locale, top_k=3
+            query, emotional_state, conversation_context, locale, top_k=3,
+            query_embedding=query_embedding
         )
         
         if not results:
@@ -299,48 +336,247 @@ class AutonomousDecisionEngine:
     
     async def generate_response(self, query: str, emotional_state: Dict,
                                conversation_context: Dict, locale: str = "en",
-                               messages: List[Dict] = None) -> Dict:
+                               messages: List[Dict] = None,
+                               deadline: Optional[Deadline] = None) -> Dict:
         """
         Main response generation with autonomous decision
+        
+        Every stage is bounded by the request deadline. When the budget runs
+        low the engine degrades: KB answer only, then a template answer.
         """
-        # Check if we should use ChatGPT
-        use_chatgpt, reason = await self.should_use_chatgpt(
-            query, emotional_state, conversation_context, locale
-        )
+        messages = messages or []
+        deadline = deadline or Deadline()
         
-        # Get relevant knowledge regardless
-        results = await self.rag_retriever.hybrid_search(
-            query, emotional_state, conversation_context, locale, top_k=5
-        )
+        if not deadline.has_budget(TEMPLATE_THRESHOLD):
+            deadline.degrade("template")
+            return {
+                "message": self._generate_kb_response([], locale),
+                "source": "template",
+                "reason": "deadline_exhausted",
+                "confidence": 0.0,
+                "knowledge_used": []
+            }
+        
+        # Answers only depend on the query for single-turn conversations
+        cacheable = len(messages) <= 1
+        trajectory = conversation_context.get('emotional_trajectory')
         
-        if use_chatgpt:
-            # Fallback to ChatGPT with context from knowledge base
-            response = await self._generate_chatgpt_response(
-                query, results, emotional_state, messages, locale
+        # Speculative mode: draft completion races against retrieval
+        draft_task = None
+        if (self.speculative and OPENAI_API_KEY and not openai_breaker.is_open()
+                and deadline.has_budget(LLM_MIN_BUDGET)):
+            draft_task = asyncio.create_task(
+                self._complete(query, [], emotional_state, messages, locale, cacheable, trajectory)
+            )
+            metrics.increment("speculative.started")
+        draft_used = False
+        try:
+            retrieval_started = time.perf_counter()
+            
+            # Embed the query once and reuse it for decision, retrieval and cache
+            # (failure/timeout → EMBEDDING_UNAVAILABLE → keyword search fallback)
+            query_embedding = await deadline.run(
+                "embedding", self.rag_retriever.embed_query(query, locale)
+            )
+            if query_embedding is None:
+                query_embedding = EMBEDDING_UNAVAILABLE
+            cache_embedding = None if query_embedding is EMBEDDING_UNAVAILABLE else query_embedding
+            
+            # Check if we should use ChatGPT
+            use_chatgpt, reason = await deadline.run(
+                "decision",
+                self.should_use_chatgpt(
+                    query, emotional_state, conversation_context, locale,
+                    query_embedding=query_embedding
+                ),
+                default=(False, "deadline_decision")
             )
+            
+            # Get relevant knowledge regardless
+            results = await deadline.run(
+                "retrieval",
+                self.rag_retriever.hybrid_search(
+                    query, emotional_state, conversation_context, locale, top_k=5,
+                    query_embedding=query_embedding
+                ),
+                default=[]
+            )
+            retrieval_seconds = time.perf_counter() - retrieval_started
+            metrics.observe("retrieval.seconds", retrieval_seconds)
+            
+            confidence = results[0][1].total if results else 0.0
+            knowledge_used = [r[0].id for r in results]
+            
+            if use_chatgpt and cacheable:
+                cached = response_cache.lookup(cache_embedding, locale, emotional_state)
+                if cached:
+                    return {
+                        "message": cached.answer,
+                        "source": "response_cache",
+                        "reason": reason,
+                        "confidence": confidence,
+                        "knowledge_used": knowledge_used
+                    }
+            
+            if use_chatgpt and not deadline.has_budget(LLM_MIN_BUDGET):
+                # Not enough time left for a completion - answer from KB only
+                deadline.degrade("kb_only")
+                use_chatgpt, reason = False, "deadline_kb_only"
+            
+            if not use_chatgpt:
+                # Use knowledge base directly
+                response = self._generate_kb_response(results, locale)
+                return {
+                    "message": response,
+                    "source": "knowledge_base",
+                    "reason": reason,
+                    "confidence": confidence,
+                    "knowledge_used": knowledge_used
+                }
+            
+            if draft_task is not None:
+                draft_used = True
+                response = await deadline.run(
+                    "generation",
+                    self._resolve_draft(
+                        draft_task, query, results, emotional_state, locale, retrieval_seconds
+                    )
+                )
+            else:
+                # Fallback to ChatGPT with context from knowledge base
+                completion_started = time.perf_counter()
+                response = await deadline.run(
+                    "generation",
+                    self._complete(query, results, emotional_state, messages, locale, cacheable, trajectory)
+                )
+                metrics.observe("completion.seconds", time.perf_counter() - completion_started)
+            
+            if response is None:
+                # ChatGPT failed or timed out - answer from knowledge base instead
+                response = self._generate_kb_response(results, locale)
+            elif cacheable:
+                response_cache.store(query, cache_embedding, locale, emotional_state, response)
+            
             return {
                 "message": response,
                 "source": "chatgpt",
                 "reason": reason,
-                "confidence": results[0][1].total if results else 0.0,
-                "knowledge_used": [r[0].id for r in results]
+                "confidence": confidence,
+                "knowledge_used": knowledge_used
             }
+        finally:
+            # Cache/KB answers, degradation and errors all drop the unused draft
+            if not draft_used:
+                self._cancel_draft(draft_task)
+    
+    async def _complete(self, query: str, results: List[Tuple[SearchResult, HybridScore]],
+                        emotional_state: Dict, messages: List[Dict], locale: str,
+                        cacheable: bool, trajectory: Optional[Dict] = None) -> Optional[str]:
+        """ChatGPT completion; identical single-turn prompts share one call"""
+        if not cacheable:
+            metrics.increment("llm.completions")
+            return await self._generate_chatgpt_response(
+                query, results, emotional_state, messages, locale, trajectory
+            )
+        
+        completion_key = (
+            normalize_query(query), locale,
+            self._describe_emotion(emotional_state),
+            self._describe_trajectory(trajectory),
+            tuple(r[0].id for r in results[:3])
+        )
+        
+        async def leader_call():
+            # Only the leader reaches OpenAI; coalesced followers are not counted
+            metrics.increment("llm.completions")
+            return await self._generate_chatgpt_response(
+                query, results, emotional_state, messages, locale, trajectory
+            )
+        
+        return await completion_flight.do(completion_key, leader_call)
+    
+    def _cancel_draft(self, draft_task: Optional[asyncio.Task]):
+        """KB (or cache) answered - the speculative completion was not needed"""
+        if draft_task is None:
+            return
+        if draft_task.done():
+            metrics.increment("speculative.wasted")  # Already paid for
         else:
-            # Use knowledge base directly
-            response = self._generate_kb_response(results, locale)
-            return {
-                "message": response,
-                "source": "knowledge_base",
-                "reason": reason,
-                "confidence": results[0][1].total if results else 0.0,
-                "knowledge_used": [r[0].id for r in results]
-            }
+            # The HTTP call keeps running in its worker thread and is still billed
+            draft_task.cancel()
+            metrics.increment("speculative.cancelled")
+            metrics.increment("speculative.wasted")
+    
+    async def _resolve_draft(self, draft_task: asyncio.Task, query: str,
+                             results: List[Tuple[SearchResult, HybridScore]],
+                             emotional_state: Dict, locale: str,
+                             retrieval_seconds: float) -> Optional[str]:
+        """Use the speculative draft, refining it with KB context when relevant"""
+        wait_started = time.perf_counter()
+        draft = await draft_task
+        draft_wait = time.perf_counter() - wait_started
+        metrics.observe("speculative.draft_wait_seconds", draft_wait)
+        # Time the draft ran in parallel with retrieval
+        metrics.observe("speculative.overlap_seconds", retrieval_seconds)
+        
+        if draft is None:
+            metrics.increment("speculative.failed")
+            return None
+        
+        relevant = [r for r in results if r[0].similarity >= SPECULATIVE_CONTEXT_MIN_SIMILARITY]
+        if not relevant:
+            metrics.increment("speculative.used_direct")
+            return draft
+        
+        # Fast follow-up: short revision call that injects the KB facts
+        metrics.increment("speculative.followups")
+        metrics.increment("llm.completions")
+        followup_started = time.perf_counter()
+        refined = await self._refine_with_kb_context(draft, query, relevant, locale)
+        metrics.observe("speculative.followup_seconds", time.perf_counter() - followup_started)
+        return refined or draft
+    
+    async def _refine_with_kb_context(self, draft: str, query: str,
+                                      kb_results: List[Tuple[SearchResult, HybridScore]],
+                                      locale: str) -> Optional[str]:
+        """Revise a speculative draft so it agrees with knowledge base facts"""
+        if not openai_breaker.allow_request():
+            return None
+        
+        context_str = "\n\n".join([
+            f"[Context {i+1}] {result.content}"
+            for i, (result, score) in enumerate(kb_results[:3])
+        ])
+        
+        try:
+            response = await asyncio.to_thread(
+                openai.chat.completions.create,
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": f"""You are Aurora, YYD's AI sales assistant. Revise the DRAFT answer so every fact agrees with the KNOWLEDGE BASE CONTEXT. Keep tone and length, change only what is wrong or missing. Reply with the revised answer only.
+
+KNOWLEDGE BASE CONTEXT:
+{context_str}
+
+Language: {locale.upper()}"""},
+                    {"role": "user", "content": f"QUESTION: {query}\n\nDRAFT: {draft}"}
+                ],
+                temperature=0.3,
+                max_tokens=500
+            )
+            openai_breaker.record_success()
+            return response.choices[0].message.content
+        except Exception as e:
+            openai_breaker.record_failure(e)
+            print(f"❌ ChatGPT follow-up error: {str(e)}")
+            return None
     
     async def _generate_chatgpt_response(self, query: str, kb_results: List[Tuple[SearchResult, HybridScore]],
-                                        emotional_state: Dict, messages: List[Dict], locale: str) -> str:
-        """Generate response using ChatGPT with KB context"""
-        if not OPENAI_API_KEY:
-            return "I apologize, but I'm currently unable to process your request. Please contact our team directly."
+                                        emotional_state: Dict, messages: List[Dict], locale: str,
+                                        trajectory: Optional[Dict] = None) -> Optional[str]:
+        """Generate response using ChatGPT with KB context (None on failure)"""
+        if not OPENAI_API_KEY or not openai_breaker.allow_request():
+            return None
         
         # Build context from knowledge base
         context_str = "\n\n".join([
@@ -350,6 +586,9 @@ class AutonomousDecisionEngine:
         
         # Build emotion-aware system prompt
         emotion_desc = self._describe_emotion(emotional_state)
+        trajectory_desc = self._describe_trajectory(trajectory)
+        if trajectory_desc:
+            emotion_desc += f" ({trajectory_desc})"
         
         system_prompt = f"""You are Aurora, YYD's AI sales assistant for premium tuk-tuk tours in Sintra/Cascais, Portugal.
 
@@ -373,11 +612,12 @@ Language: {locale.upper()}"""
                 temperature=0.7,
                 max_tokens=500
             )
+            openai_breaker.record_success()
             return response.choices[0].message.content
         except Exception as e:
+            openai_breaker.record_failure(e)
             print(f"❌ ChatGPT error: {str(e)}")
-            # Fallback to KB response
-            return self._generate_kb_response(kb_results, locale)
+            return None
     
     def _generate_kb_response(self, results: List[Tuple[SearchResult, HybridScore]], locale: str) -> str:
         """Generate response from knowledge base results"""
@@ -412,6 +652,19 @@ Language: {locale.upper()}"""
             return "sad or discouraged"
         else:
             return "neutral"
+    
+    def _describe_trajectory(self, trajectory: Optional[Dict]) -> str:
+        """Summarize the conversation's mood trend ("" if too short to tell)"""
+        if not trajectory or trajectory.get('message_count', 0) < 3:
+            return ""
+        trend = trajectory.get('valence_trend', 0.0)
+        if trend < -0.1:
+            direction = "mood worsening"
+        elif trend > 0.1:
+            direction = "mood improving"
+        else:
+            direction = "mood stable"
+        return f"{direction} over {trajectory['message_count']} messages"
 
 
 # Global instance
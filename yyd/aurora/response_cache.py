@@ -0,0 +1,259 @@
+"""
+Aurora Semantic Response Cache
+==============================
+
+Caches ChatGPT fallback answers so paraphrased questions are answered
+without a new completion:
+- Keyed by query embedding (cosine similarity), locale and KB version stamp
+- Only served when the emotional bucket (negative/neutral/positive) matches
+- TTL + LRU eviction
+- Invalidated when the knowledge base changes
+- Hit-rate metrics exposed via GET /metrics
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from metrics import metrics
+
+CACHE_MAX_ENTRIES = int(os.getenv("AURORA_RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+CACHE_TTL_SECONDS = int(os.getenv("AURORA_RESPONSE_CACHE_TTL_SECONDS", str(6 * 3600)))
+CACHE_SIMILARITY_THRESHOLD = float(os.getenv("AURORA_RESPONSE_CACHE_THRESHOLD", "0.95"))
+KB_VERSION_REFRESH_SECONDS = int(os.getenv("AURORA_KB_VERSION_REFRESH_SECONDS", "60"))
+
+
+def emotional_bucket(emotional_state: Optional[Dict]) -> str:
+    """Coarse valence bucket used to keep cached answers tone-compatible"""
+    valence = (emotional_state or {}).get('valence', 0.0)
+    if valence < -0.3:
+        return "negative"
+    elif valence > 0.3:
+        return "positive"
+    return "neutral"
+
+
+@dataclass
+class CachedResponse:
+    """Cached ChatGPT answer"""
+    query: str
+    answer: str
+    embedding: np.ndarray  # unit-normalized float32
+    locale: str
+    bucket: str
+    kb_version: str
+    created_at: float
+    hits: int = 0
+
+
+class SemanticResponseCache:
+    """In-process semantic cache for LLM fallback answers"""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES,
+                 ttl_seconds: int = CACHE_TTL_SECONDS,
+                 similarity_threshold: float = CACHE_SIMILARITY_THRESHOLD,
+                 kb_version_refresh: int = KB_VERSION_REFRESH_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.kb_version_refresh = kb_version_refresh
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, CachedResponse]" = OrderedDict()
+        self._next_key = 0
+        # Per (locale, bucket) stacked embeddings for vectorized lookup
+        self._partitions: Dict[Tuple[str, str], Tuple[List[int], Optional[np.ndarray]]] = {}
+
+        self._db_version: Optional[str] = None
+        self._local_generation = 0
+        self._kb_checked_at = float("-inf")
+
+    # ---------- KB version stamp ----------
+
+    def _fetch_kb_version(self) -> Optional[str]:
+        """Read KB version stamp from database (row count + last update)"""
+        try:
+            from memory import DatabaseConnection
+
+            row = DatabaseConnection.execute_query(
+                """
+                SELECT COUNT(*) AS n, MAX("updatedAt") AS ts
+                FROM aurora_semantic_memory
+                WHERE active = true
+                """,
+                fetch="one"
+            )
+            if row:
+                return f"{row['n']}:{row['ts']}"
+        except Exception as e:
+            print(f"⚠️ KB version check failed: {e}")
+        return None
+
+    def current_kb_version(self) -> str:
+        """KB version stamp, refreshed from the database at most every N seconds"""
+        now = time.monotonic()
+        if now - self._kb_checked_at >= self.kb_version_refresh:
+            self._kb_checked_at = now
+            db_version = self._fetch_kb_version()
+            if db_version is not None and db_version != self._db_version:
+                if self._db_version is not None:
+                    self.invalidate("kb_version_changed")
+                self._db_version = db_version
+        return f"{self._db_version}#{self._local_generation}"
+
+    def refresh(self):
+        """
+        Off the request path (scheduler): re-read the KB stamp and drop expired answers
+
+        Resets the stamp timer, so lookups skip their own DB check meanwhile.
+        """
+        self._kb_checked_at = float("-inf")
+        self.current_kb_version()
+        now = time.monotonic()
+        with self._lock:
+            expired = [k for k, e in self._entries.items() if now - e.created_at > self.ttl_seconds]
+            for key in expired:
+                self._remove(key)
+            size = len(self._entries)
+        if expired:
+            metrics.increment("response_cache.expired", len(expired))
+        metrics.set_gauge("response_cache.size", size)
+
+    def invalidate(self, reason: str = "manual"):
+        """Drop all cached answers (KB changed)"""
+        with self._lock:
+            dropped = len(self._entries)
+            self._entries.clear()
+            self._partitions.clear()
+            self._local_generation += 1
+            self._kb_checked_at = float("-inf")  # Force stamp refresh on next lookup
+        metrics.increment("response_cache.invalidations")
+        metrics.set_gauge("response_cache.size", 0)
+        if dropped:
+            print(f"🧹 Response cache invalidated ({reason}): {dropped} entries dropped")
+
+    # ---------- Lookup / store ----------
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            return None
+        return vector / norm
+
+    def _partition_matrix(self, partition: Tuple[str, str]) -> Tuple[List[int], Optional[np.ndarray]]:
+        keys, matrix = self._partitions.get(partition, ([], None))
+        if matrix is None and keys:
+            matrix = np.stack([self._entries[k].embedding for k in keys])
+            self._partitions[partition] = (keys, matrix)
+        return keys, matrix
+
+    def _remove(self, key: int):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        partition = (entry.locale, entry.bucket)
+        keys, _ = self._partitions.get(partition, ([], None))
+        if key in keys:
+            keys.remove(key)
+            self._partitions[partition] = (keys, None)
+
+    def lookup(self, query_embedding: Optional[List[float]], locale: str,
+               emotional_state: Optional[Dict] = None) -> Optional[CachedResponse]:
+        """Return cached answer for a semantically equivalent query, if any"""
+        metrics.increment("response_cache.lookups")
+        vector = self._normalize(query_embedding) if query_embedding is not None else None
+        if vector is None:
+            metrics.increment("response_cache.misses")
+            return None
+
+        kb_version = self.current_kb_version()
+        partition = (locale, emotional_bucket(emotional_state))
+        now = time.monotonic()
+
+        with self._lock:
+            keys, matrix = self._partition_matrix(partition)
+            if matrix is None:
+                metrics.increment("response_cache.misses")
+                return None
+
+            similarities = matrix @ vector
+            for idx in np.argsort(-similarities):
+                if similarities[idx] < self.similarity_threshold:
+                    break
+                key = keys[idx]
+                entry = self._entries[key]
+                if now - entry.created_at > self.ttl_seconds or entry.kb_version != kb_version:
+                    continue
+                entry.hits += 1
+                self._entries.move_to_end(key)  # LRU touch
+                metrics.increment("response_cache.hits")
+                return entry
+
+            # Purge expired entries of this partition while we are here
+            for key in [k for k in keys if now - self._entries[k].created_at > self.ttl_seconds]:
+                self._remove(key)
+                metrics.increment("response_cache.expired")
+
+        metrics.increment("response_cache.misses")
+        return None
+
+    def store(self, query: str, query_embedding: Optional[List[float]], locale: str,
+              emotional_state: Optional[Dict], answer: str):
+        """Cache a freshly generated answer"""
+        vector = self._normalize(query_embedding) if query_embedding is not None else None
+        if vector is None or not answer:
+            return
+
+        entry = CachedResponse(
+            query=query,
+            answer=answer,
+            embedding=vector,
+            locale=locale,
+            bucket=emotional_bucket(emotional_state),
+            kb_version=self.current_kb_version(),
+            created_at=time.monotonic()
+        )
+
+        with self._lock:
+            key = self._next_key
+            self._next_key += 1
+            self._entries[key] = entry
+
+            partition = (entry.locale, entry.bucket)
+            keys, _ = self._partitions.get(partition, ([], None))
+            keys.append(key)
+            self._partitions[partition] = (keys, None)
+
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                metrics.increment("response_cache.evictions")
+
+            size = len(self._entries)
+
+        metrics.increment("response_cache.stores")
+        metrics.set_gauge("response_cache.size", size)
+
+    def stats(self) -> Dict[str, float]:
+        """Cache statistics for monitoring"""
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": metrics.counter("response_cache.hits"),
+            "misses": metrics.counter("response_cache.misses"),
+            "hit_rate": metrics.ratio("response_cache.hits", "response_cache.lookups"),
+            "evictions": metrics.counter("response_cache.evictions"),
+            "invalidations": metrics.counter("response_cache.invalidations"),
+            "kb_version": f"{self._db_version}#{self._local_generation}",
+        }
+
+
+# Global instance
+response_cache = SemanticResponseCache()
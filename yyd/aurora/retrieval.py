@@ -0,0 +1,231 @@
+"""
+Aurora Retrieval Engine
+=======================
+
+Single knowledge retrieval interface for both decision paths
+(/chat RAG and AutonomousIntelligence):
+- Pluggable backends behind one search API
+    semantic_memory - aurora_semantic_memory (default, per-locale embeddings)
+    knowledge       - legacy aurora_knowledge table (one row per language)
+- Same hit shape, similarity scale and keyword fallback for every caller
+- Backend chosen with AURORA_RETRIEVAL_BACKEND; knowledge writes
+  (RetrievalEngine.store, EmbeddingsService.add_knowledge) go to the same backend
+
+Consolidate the legacy table with:
+    python migrate_knowledge.py
+"""
+
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional
+
+from metrics import metrics
+
+RETRIEVAL_BACKEND = os.getenv("AURORA_RETRIEVAL_BACKEND", "semantic_memory").lower()
+
+CONTENT_FIELDS = {
+    "en": "contentEn",
+    "pt": "contentPt",
+    "es": "contentEs"
+}
+
+
+def make_hit(id: Any, content: str, similarity: float, category: str,
+             confidence: float = 1.0, metadata: Optional[Dict] = None,
+             source: str = "") -> Dict[str, Any]:
+    """Common result shape returned by every backend"""
+    return {
+        "id": str(id),
+        "content": content or "",
+        "similarity": float(similarity),
+        "confidence": float(confidence if confidence is not None else 1.0),
+        "category": category or "",
+        "metadata": metadata or {},
+        "source": source
+    }
+
+
+class RetrievalBackend(ABC):
+    """Backend interface: vector and keyword search over one store, and writes to it"""
+
+    name = "base"
+
+    @abstractmethod
+    def search(self, query_embedding: List[float], locale: str = "en",
+               category: Optional[str] = None, limit: int = 5) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def keyword_search(self, query: str, locale: str = "en",
+                       category: Optional[str] = None, limit: int = 5) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def store(self, contents: Dict[str, str], category: str, metadata: Optional[Dict] = None,
+              source_type: str = "manual") -> bool:
+        """Store one fact (contents: locale -> translation); True if stored"""
+
+class SemanticMemoryBackend(RetrievalBackend):
+    """aurora_semantic_memory (one row per fact, contentEn/Pt/Es + embeddings)"""
+
+    name = "semantic_memory"
+
+    def _hits(self, rows, locale: str) -> List[Dict[str, Any]]:
+        content_field = CONTENT_FIELDS.get(locale.lower(), "contentEn")
+        return [
+            make_hit(
+                row["id"],
+                row.get(content_field) or row.get("contentEn", ""),
+                row["similarity"],
+                row["category"],
+                confidence=row.get("confidence", 1.0),
+                metadata=row.get("metadata"),
+                source=self.name
+            )
+            for row in rows or []
+        ]
+
+    def search(self, query_embedding, locale="en", category=None, limit=5):
+        from memory import SemanticMemory
+        rows = SemanticMemory.semantic_search(
+            query_embedding=query_embedding, locale=locale, category=category, limit=limit
+        )
+        return self._hits(rows, locale)
+
+    def keyword_search(self, query, locale="en", category=None, limit=5):
+        from memory import SemanticMemory
+        rows = SemanticMemory.keyword_search(query=query, locale=locale, category=category, limit=limit)
+        return self._hits(rows, locale)
+
+    def store(self, contents, category, metadata=None, source_type="manual"):
+        """One row; missing locales reuse the English (or first) text, like migrate_knowledge.py"""
+        from memory import SemanticMemory
+        fallback = contents.get("en") or next(iter(contents.values()))
+        texts = {locale: contents.get(locale) or fallback for locale in CONTENT_FIELDS}
+        metadata = {**(metadata or {}), "languages": sorted(contents)}
+        memory_id = SemanticMemory.store(
+            texts["en"], texts["pt"], texts["es"], category=category,
+            subcategory=metadata.get("category"), source_type=source_type, metadata=metadata
+        )
+        return memory_id is not None
+
+
+class KnowledgeTableBackend(RetrievalBackend):
+    """Legacy aurora_knowledge (one row per language, content_type as category)"""
+
+    name = "knowledge"
+
+    def _hits(self, rows) -> List[Dict[str, Any]]:
+        return [
+            make_hit(
+                row["id"],
+                row["content"],
+                row["similarity"],
+                row["content_type"],
+                metadata=row.get("metadata"),
+                source=self.name
+            )
+            for row in rows or []
+        ]
+
+    def search(self, query_embedding, locale="en", category=None, limit=5):
+        from embeddings import embeddings_service
+        rows = embeddings_service.search_by_embedding(
+            query_embedding, content_type=category, language=locale, limit=limit,
+            similarity_threshold=0.0
+        )
+        return self._hits(rows)
+
+    def keyword_search(self, query, locale="en", category=None, limit=5):
+        from embeddings import embeddings_service
+        rows = embeddings_service.keyword_search(
+            query, content_type=category, language=locale, limit=limit, similarity_threshold=0.0
+        )
+        return self._hits(rows)
+
+    def store(self, contents, category, metadata=None, source_type="manual"):
+        """One row per language"""
+        from embeddings import embeddings_service
+        return all([
+            embeddings_service.insert_legacy_knowledge(content, category, locale, metadata)
+            for locale, content in contents.items()
+        ])
+
+
+BACKENDS = {
+    SemanticMemoryBackend.name: SemanticMemoryBackend,
+    KnowledgeTableBackend.name: KnowledgeTableBackend,
+}
+
+
+def get_backend(name: Optional[str] = None) -> RetrievalBackend:
+    """Backend by name (defaults to AURORA_RETRIEVAL_BACKEND)"""
+    name = (name or RETRIEVAL_BACKEND).lower()
+    if name not in BACKENDS:
+        print(f"⚠️ Unknown retrieval backend '{name}' - using {SemanticMemoryBackend.name}")
+        name = SemanticMemoryBackend.name
+    return BACKENDS[name]()
+
+
+class RetrievalEngine:
+    """Knowledge retrieval shared by RAGRetriever and AutonomousIntelligence"""
+
+    def __init__(self, backend: Optional[RetrievalBackend] = None,
+                 embedder: Optional[Callable[[str], Optional[List[float]]]] = None):
+        self.backend = backend or get_backend()
+        self.embedder = embedder
+
+    def search(self, query: str, locale: str = "en", category: Optional[str] = None,
+               limit: int = 5, min_similarity: float = 0.0,
+               query_embedding: Optional[List[float]] = None) -> List[Dict[str, Any]]:
+        """
+        Vector search, or keyword search when no embedding is available
+
+        query_embedding is reused when the caller already has it; otherwise
+        the engine's (sync) embedder is used if one was given.
+        """
+        if query_embedding is None and self.embedder is not None:
+            query_embedding = self.embedder(query)
+
+        if query_embedding is not None:
+            hits = self.vector_search(query_embedding, locale, category, limit)
+        else:
+            hits = self.keyword_search(query, locale, category, limit)
+
+        return [hit for hit in hits if hit["similarity"] >= min_similarity]
+
+    def vector_search(self, query_embedding: List[float], locale: str = "en",
+                      category: Optional[str] = None, limit: int = 5) -> List[Dict[str, Any]]:
+        started = time.perf_counter()
+        try:
+            hits = self.backend.search(query_embedding, locale=locale, category=category, limit=limit)
+        except Exception as e:
+            print(f"❌ Retrieval error ({self.backend.name}): {str(e)}")
+            metrics.increment(f"retrieval.{self.backend.name}.errors")
+            return []
+        metrics.observe(f"retrieval.{self.backend.name}.vector_seconds", time.perf_counter() - started)
+        return hits
+
+    def keyword_search(self, query: str, locale: str = "en",
+                       category: Optional[str] = None, limit: int = 5) -> List[Dict[str, Any]]:
+        started = time.perf_counter()
+        try:
+            hits = self.backend.keyword_search(query, locale=locale, category=category, limit=limit)
+        except Exception as e:
+            print(f"❌ Keyword retrieval error ({self.backend.name}): {str(e)}")
+            metrics.increment(f"retrieval.{self.backend.name}.errors")
+            return []
+        metrics.increment(f"retrieval.{self.backend.name}.keyword_fallbacks")
+        metrics.observe(f"retrieval.{self.backend.name}.keyword_seconds", time.perf_counter() - started)
+        return hits
+
+    def store(self, contents: Dict[str, str], category: str, metadata: Optional[Dict] = None,
+              source_type: str = "manual") -> bool:
+        """Write one fact (locale -> text) to the backend this engine searches"""
+        try:
+            return self.backend.store(contents, category, metadata, source_type=source_type)
+        except Exception as e:
+            print(f"❌ Knowledge store error ({self.backend.name}): {str(e)}")
+            metrics.increment(f"retrieval.{self.backend.name}.errors")
+            return False
@@ -0,0 +1,327 @@
+"""
+Aurora Maintenance Scheduler
+============================
+
+Periodic background jobs inside the FastAPI process (started from the app
+lifespan in main.py):
+- Jitter: the first run lands anywhere in the first interval and every sleep
+  varies by ±AURORA_SCHEDULER_JITTER, so workers and nodes do not fire together
+- Overlap protection: a job never starts while its previous run is still going
+- Leader jobs (database maintenance) take a pg_try_advisory_lock per job and
+  check the last cluster-wide run in aurora_maintenance_state, so one
+  worker/node runs each job per interval; worker jobs run in every process
+  (they maintain per-process state)
+
+Default jobs:
+    memory_cleanup      leader  WM/SC expiry, partition create/drop, UNLOGGED SC
+    lgpd_anonymize      leader  incremental episodic anonymization
+    embedding_backfill  leader  OpenAI health probe + pending embeddings
+    job_queue_reap      leader  requeue jobs abandoned by crashed workers
+    vector_index_tune   leader  build missing semantic HNSW indexes (CONCURRENTLY),
+                                resize the legacy aurora_knowledge ivfflat index
+    usage_flush         worker  buffered semantic memory usage counters
+    cache_refresh       worker  KB stamp/response cache, SC buffers
+
+Disable with AURORA_SCHEDULER_ENABLED=false (e.g. when running maintenance
+from cron with the CLIs instead).
+"""
+
+import asyncio
+import os
+import random
+import time
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from metrics import metrics
+
+SCHEDULER_ENABLED = os.getenv("AURORA_SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes")
+SCHEDULER_JITTER = float(os.getenv("AURORA_SCHEDULER_JITTER", "0.1"))
+
+CLEANUP_INTERVAL_SECONDS = int(os.getenv("AURORA_CLEANUP_INTERVAL_SECONDS", "300"))
+ANONYMIZE_INTERVAL_SECONDS = int(os.getenv("AURORA_ANONYMIZE_INTERVAL_SECONDS", "900"))
+EMBEDDING_BACKFILL_INTERVAL_SECONDS = int(os.getenv("AURORA_EMBEDDING_BACKFILL_INTERVAL_SECONDS", "1800"))
+USAGE_FLUSH_INTERVAL_SECONDS = int(os.getenv("AURORA_USAGE_FLUSH_INTERVAL_SECONDS", "30"))
+CACHE_REFRESH_INTERVAL_SECONDS = int(os.getenv("AURORA_CACHE_REFRESH_INTERVAL_SECONDS", "60"))
+JOB_REAP_INTERVAL_SECONDS = int(os.getenv("AURORA_JOB_REAP_INTERVAL_SECONDS", "120"))
+VECTOR_INDEX_TUNE_INTERVAL_SECONDS = int(os.getenv("AURORA_VECTOR_INDEX_TUNE_INTERVAL_SECONDS", "3600"))
+
+# First key of the two-int advisory lock, so job locks never collide with others
+ADVISORY_LOCK_NAMESPACE = 0x41555241  # "AURA"
+
+
+@dataclass
+class Job:
+    """A registered periodic job and its run bookkeeping"""
+    name: str
+    func: Callable[[], Any]                 # sync (run in a thread) or async
+    interval: float
+    leader: bool = True
+    jitter: float = SCHEDULER_JITTER
+    running: bool = False
+    runs: int = 0
+    failures: int = 0
+    skipped: int = 0
+    last_started: Optional[datetime] = None
+    last_duration: Optional[float] = None
+    last_error: Optional[str] = None
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    def next_delay(self) -> float:
+        return self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "interval": self.interval,
+            "leader": self.leader,
+            "running": self.running,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "last_started": self.last_started.isoformat() if self.last_started else None,
+            "last_duration": self.last_duration,
+            "last_error": self.last_error,
+        }
+
+
+class LeaderLock:
+    """
+    Session advisory lock per job on a dedicated connection
+
+    Also records the run in aurora_maintenance_state (job = 'schedule:<name>'),
+    so a job that another worker ran less than an interval ago is skipped.
+    """
+
+    def __init__(self, job: Job):
+        self.job = job
+        self.key = zlib.crc32(job.name.encode()) & 0x7FFFFFFF
+        self.conn = None
+
+    def acquire(self) -> bool:
+        from memory import DatabaseConnection
+        from lgpd_anonymizer import ensure_state_table
+
+        ensure_state_table()
+        self.conn = DatabaseConnection.get_connection()
+        self.conn.autocommit = True
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_lock(%s, %s)", (ADVISORY_LOCK_NAMESPACE, self.key))
+            if not cur.fetchone()[0]:
+                self.release()
+                return False
+            # Ran elsewhere within (most of) this interval?
+            cur.execute("""
+                SELECT EXTRACT(EPOCH FROM NOW() - "updatedAt")
+                FROM aurora_maintenance_state WHERE job = %s
+            """, (f"schedule:{self.job.name}",))
+            row = cur.fetchone()
+            if row is not None and row[0] < self.job.interval * (1 - self.job.jitter) - 1:
+                self.release()
+                return False
+            cur.execute("""
+                INSERT INTO aurora_maintenance_state (job, "updatedAt") VALUES (%s, NOW())
+                ON CONFLICT (job) DO UPDATE SET
+                    processed = aurora_maintenance_state.processed + 1,
+                    "updatedAt" = NOW()
+            """, (f"schedule:{self.job.name}",))
+        return True
+
+    def release(self):
+        if self.conn is None:
+            return
+        try:
+            if not self.conn.closed:
+                with self.conn.cursor() as cur:
+                    cur.execute("SELECT pg_advisory_unlock(%s, %s)", (ADVISORY_LOCK_NAMESPACE, self.key))
+        except Exception as e:
+            print(f"⚠️ Could not release scheduler lock for {self.job.name}: {e}")
+        finally:
+            self.conn.close()  # Session locks also end with the connection
+            self.conn = None
+
+
+class Scheduler:
+    """Runs registered jobs periodically on the event loop"""
+
+    def __init__(self):
+        self.jobs: Dict[str, Job] = {}
+        self._stopping: Optional[asyncio.Event] = None
+
+    def register(self, name: str, func: Callable[[], Any], interval: float,
+                 leader: bool = True, jitter: float = SCHEDULER_JITTER) -> Job:
+        if name in self.jobs:
+            raise ValueError(f"Job '{name}' already registered")
+        job = Job(name=name, func=func, interval=interval, leader=leader, jitter=jitter)
+        self.jobs[name] = job
+        return job
+
+    async def start(self):
+        self._stopping = asyncio.Event()
+        for job in self.jobs.values():
+            if job.task is None or job.task.done():
+                job.task = asyncio.create_task(self._loop(job), name=f"scheduler:{job.name}")
+        print(f"⏰ Scheduler started: {', '.join(self.jobs)}")
+
+    async def stop(self, timeout: float = 10.0):
+        """Stop scheduling; lets running jobs finish (up to timeout)"""
+        if self._stopping is None:
+            return
+        self._stopping.set()
+        tasks = [job.task for job in self.jobs.values() if job.task is not None]
+        if tasks:
+            done, pending = await asyncio.wait(tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+        print("⏰ Scheduler stopped")
+
+    async def _sleep(self, seconds: float) -> bool:
+        """Sleep unless stopping; True if the scheduler is stopping"""
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=seconds)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _loop(self, job: Job):
+        # Spread first runs over the interval (all workers boot together)
+        if await self._sleep(random.uniform(0, job.interval)):
+            return
+        while True:
+            await self.run_now(job.name)
+            if await self._sleep(job.next_delay()):
+                return
+
+    async def run_now(self, name: str) -> bool:
+        """Run one job now (unless already running); True if it ran"""
+        job = self.jobs[name]
+        if job.running:
+            job.skipped += 1
+            metrics.increment(f"scheduler.{name}.overlaps")
+            return False
+
+        job.running = True
+        lock = LeaderLock(job) if job.leader else None
+        try:
+            if lock is not None:
+                try:
+                    acquired = await asyncio.to_thread(lock.acquire)
+                except Exception as e:
+                    print(f"⚠️ Scheduler lock for {name} unavailable: {e}")
+                    acquired = False
+                if not acquired:
+                    job.skipped += 1
+                    metrics.increment(f"scheduler.{name}.not_leader")
+                    return False
+
+            job.last_started = datetime.now()
+            started = time.perf_counter()
+            try:
+                if asyncio.iscoroutinefunction(job.func):
+                    await job.func()
+                else:
+                    await asyncio.to_thread(job.func)
+                job.last_error = None
+                metrics.increment(f"scheduler.{name}.runs")
+            except Exception as e:
+                job.failures += 1
+                job.last_error = str(e)
+                metrics.increment(f"scheduler.{name}.failures")
+                print(f"❌ Scheduled job {name} failed: {e}")
+            finally:
+                job.runs += 1
+                job.last_duration = round(time.perf_counter() - started, 3)
+                metrics.observe(f"scheduler.{name}.seconds", job.last_duration)
+            return True
+        finally:
+            if lock is not None:
+                await asyncio.to_thread(lock.release)
+            job.running = False
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        return {name: job.to_dict() for name, job in self.jobs.items()}
+
+
+# ---------- Default jobs ----------
+
+def memory_cleanup():
+    """Expire WM (and table-backed SC) rows; create/drop time partitions"""
+    import partitioning
+    from memory import SensoryContextMemory, WorkingMemory
+
+    if SensoryContextMemory.BACKEND == "unlogged":
+        SensoryContextMemory.ensure_unlogged()
+    if SensoryContextMemory.BACKEND != "memory":
+        SensoryContextMemory.cleanup_expired()
+    WorkingMemory.cleanup_expired()
+    if partitioning.is_partitioned("aurora_episodic_memory"):
+        partitioning.maintain("aurora_episodic_memory")
+
+
+def lgpd_anonymize():
+    from lgpd_anonymizer import EpisodicAnonymizer
+
+    # Leave headroom before the next run; the watermark carries over
+    EpisodicAnonymizer().run(max_seconds=ANONYMIZE_INTERVAL_SECONDS / 2)
+
+
+_embedding_monitor = None
+
+
+async def embedding_backfill():
+    global _embedding_monitor
+    if _embedding_monitor is None:
+        from embedding_health_check import EmbeddingHealthMonitor
+        _embedding_monitor = EmbeddingHealthMonitor()
+    await _embedding_monitor.run_health_check_cycle()
+
+
+def job_queue_reap():
+    from job_queue import job_queue
+    job_queue.reap()
+
+
+def vector_index_tune():
+    """
+    Vector indexes are built here, never on the request path: semantic memory
+    HNSW (e.g. newly configured hot categories), and ivfflat lists following
+    aurora_knowledge growth (only used by the knowledge backend)
+    """
+    from memory import SemanticMemory
+    from retrieval import RETRIEVAL_BACKEND
+    
+    SemanticMemory.ensure_vector_indexes()
+    if RETRIEVAL_BACKEND != "knowledge":
+        return
+    from embeddings import embeddings_service
+    embeddings_service.tune_vector_index()
+
+
+def usage_flush():
+    from memory import SemanticMemory
+    SemanticMemory.flush_usage()
+
+
+def cache_refresh():
+    """Per-process caches: KB stamp + expired answers, SC ring buffers"""
+    from memory import SensoryContextMemory
+    from response_cache import response_cache
+
+    response_cache.refresh()
+    if SensoryContextMemory.BACKEND == "memory":
+        SensoryContextMemory.cleanup_expired()
+
+
+def register_default_jobs(scheduler: Scheduler) -> Scheduler:
+    scheduler.register("memory_cleanup", memory_cleanup, CLEANUP_INTERVAL_SECONDS)
+    scheduler.register("lgpd_anonymize", lgpd_anonymize, ANONYMIZE_INTERVAL_SECONDS)
+    scheduler.register("embedding_backfill", embedding_backfill, EMBEDDING_BACKFILL_INTERVAL_SECONDS)
+    scheduler.register("job_queue_reap", job_queue_reap, JOB_REAP_INTERVAL_SECONDS)
+    scheduler.register("vector_index_tune", vector_index_tune, VECTOR_INDEX_TUNE_INTERVAL_SECONDS)
+    scheduler.register("usage_flush", usage_flush, USAGE_FLUSH_INTERVAL_SECONDS, leader=False)
+    scheduler.register("cache_refresh", cache_refresh, CACHE_REFRESH_INTERVAL_SECONDS, leader=False)
+    return scheduler
+
+
+scheduler = register_default_jobs(Scheduler())
@@ -274,7 +274,7 @@ async def seed_knowledge():
                 entry['es']
             ])
             
-            if not all(embeddings):
+            if any(e is None for e in embeddings):
                 print(f"   ❌ Failed to generate embeddings")
                 error_count += 1
                 continue
@@ -61,8 +61,7 @@ def seed_without_embeddings():
                 json.dumps({
                     "source": "yesyoudeserve.tours",
                     "seed_date": "2025-01-15",
-                    "category": entry['category'],
-                    "needs_embeddings": True  # Flag for later processing
+                    "category": entry['category']
                 })
             ))
             
@@ -83,6 +82,7 @@ def seed_without_embeddings():
     print(f"   ❌ Errors: {error_count}")
     print(f"   📈 Success Rate: {(success_count/len(KNOWLEDGE_BASE)*100):.1f}%")
     print("\n⚠️  NOTE: Embeddings are NULL - Aurora will use ChatGPT fallback")
+    print("   Pending embeddings are tracked in aurora_pending_embeddings (embedding_health_check.py)")
     print("   Run seed_knowledge_base.py when OpenAI quota is restored")
     print("="*60)
 
@@ -0,0 +1,64 @@
+"""
+Aurora Single-Flight Coalescing
+===============================
+
+Concurrent identical requests share one in-flight call:
+- First caller starts the work as a task
+- Callers arriving while it runs await the same task
+- Result (or exception) is delivered to everyone, then the key is released
+
+Typical keys: (normalized query, locale) for embeddings and retrieval.
+Coalescing ratio per flight is exported as a gauge in GET /metrics.
+"""
+
+import asyncio
+import re
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+from metrics import metrics
+
+T = TypeVar("T")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Normalize query text for coalescing keys (case + whitespace)"""
+    return _WHITESPACE.sub(" ", (text or "").strip().lower())
+
+
+class SingleFlight:
+    """Deduplicates concurrent async calls sharing the same key"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, "asyncio.Task[Any]"] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn() once per key; concurrent callers share the result"""
+        metrics.increment(f"singleflight.{self.name}.calls")
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._release(k, t))
+        else:
+            metrics.increment(f"singleflight.{self.name}.coalesced")
+
+        metrics.set_gauge(
+            f"singleflight.{self.name}.coalescing_ratio",
+            metrics.ratio(f"singleflight.{self.name}.coalesced", f"singleflight.{self.name}.calls")
+        )
+
+        # Shield so a cancelled caller does not cancel the shared call
+        return await asyncio.shield(task)
+
+    def _release(self, key: Hashable, task: "asyncio.Task[Any]"):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Mark as retrieved (callers already got it)
+
+    def inflight_count(self) -> int:
+        return len(self._inflight)
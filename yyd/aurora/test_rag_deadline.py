@@ -0,0 +1,64 @@
+"""
+Embedding-stage timeout in AutonomousDecisionEngine.generate_response:
+the decision and retrieval stages must fall back to keyword search instead
+of re-joining the (shielded, still running) embedding call.
+
+Usage:
+    python -m pytest -q test_rag_deadline.py
+"""
+
+import asyncio
+
+import rag
+from deadline import Deadline
+
+
+class EmbeddingTimeoutDeadline(Deadline):
+    """Deadline whose embedding stage gets a tiny timeout (other stages: full budget)"""
+
+    async def run(self, stage, awaitable, default=None, min_timeout=0.0):
+        if stage == "embedding":
+            try:
+                return await asyncio.wait_for(awaitable, timeout=0.05)
+            except asyncio.TimeoutError:
+                return default
+        return await super().run(stage, awaitable, default=default, min_timeout=min_timeout)
+
+
+def test_embedding_timeout_uses_keyword_search_without_second_embed(monkeypatch):
+    monkeypatch.setattr(rag, "OPENAI_API_KEY", "test")
+    engine = rag.AutonomousDecisionEngine(speculative=False)
+    retriever = engine.rag_retriever
+    calls = {"embed": 0, "keyword": 0}
+    never = asyncio.Event()
+
+    async def slow_embed(query, locale="en"):
+        calls["embed"] += 1
+        await never.wait()
+
+    def keyword_search(query, locale="en", category=None, limit=5):
+        calls["keyword"] += 1
+        return [{
+            "id": "kb_1", "content": "Sintra tours leave at 9am", "similarity": 0.9,
+            "confidence": 1.0, "category": "tour_details", "metadata": {},
+        }]
+
+    def vector_search(*args, **kwargs):
+        raise AssertionError("vector search without an embedding")
+
+    async def chatgpt(*args, **kwargs):
+        return "answer"
+
+    monkeypatch.setattr(retriever, "embed_query", slow_embed)
+    monkeypatch.setattr(retriever.engine, "keyword_search", keyword_search)
+    monkeypatch.setattr(retriever.engine, "vector_search", vector_search)
+    monkeypatch.setattr(retriever.semantic_memory, "increment_usage", lambda memory_id: None)
+    monkeypatch.setattr(engine, "_generate_chatgpt_response", chatgpt)
+
+    result = asyncio.run(engine.generate_response(
+        "when do tours leave?", {}, {}, "en", deadline=EmbeddingTimeoutDeadline(budget_seconds=5)
+    ))
+
+    assert calls["embed"] == 1
+    assert calls["keyword"] == 2  # decision + retrieval
+    assert result["knowledge_used"] == ["kb_1"]
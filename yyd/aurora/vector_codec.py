@@ -0,0 +1,85 @@
+"""
+Aurora Vector Codec
+===================
+
+NumPy float32 arrays as the in-process embedding representation:
+- to_vector(): OpenAI floats / DB text → contiguous float32 array
+- Registered psycopg2 adapter: a 1-D float32/float64 array binds as a compact
+  pgvector literal ('[0.0123457,...]', 9 significant digits = exact float32
+  round trip) instead of psycopg2's ARRAY[<17-digit float>, ...] rendering
+- decode_vector(): pgvector text output → float32 array
+
+psycopg2 only sends text parameters (no binary protocol), so the adapter
+minimizes the text instead: ~21 KB per 1536-d vector instead of ~33 KB.
+
+Usage:
+    from vector_codec import register_vector_codec, to_vector
+    register_vector_codec()
+    cursor.execute("... ORDER BY embedding <=> %s::vector", (to_vector(embedding),))
+"""
+
+from typing import Dict, Iterable, Optional, Union
+
+import numpy as np
+from psycopg2.extensions import ISQLQuote, adapt, register_adapter
+
+VECTOR_DTYPE = np.float32
+
+# 9 significant digits round-trip any float32 exactly
+_FORMATS: Dict[int, str] = {}
+
+_registered = False
+
+
+def to_vector(values: Optional[Union[Iterable[float], np.ndarray]]) -> Optional[np.ndarray]:
+    """Canonical embedding: 1-D contiguous float32 array (None passes through)"""
+    if values is None:
+        return None
+    return np.ascontiguousarray(values, dtype=VECTOR_DTYPE).reshape(-1)
+
+
+def encode_vector(vector: np.ndarray) -> str:
+    """pgvector text literal, shortest exact float32 rendering"""
+    values = np.asarray(vector, dtype=VECTOR_DTYPE).tolist()
+    fmt = _FORMATS.get(len(values))
+    if fmt is None:
+        fmt = _FORMATS.setdefault(len(values), "[" + ",".join(["%.9g"] * len(values)) + "]")
+    return fmt % tuple(values)
+
+
+def decode_vector(text: Optional[str]) -> Optional[np.ndarray]:
+    """Parse pgvector text output ('[1,2,3]')"""
+    if text is None:
+        return None
+    return np.fromstring(text.strip()[1:-1], dtype=VECTOR_DTYPE, sep=",")
+
+
+class VectorAdapter:
+    """psycopg2 adapter: 1-D float arrays → quoted pgvector literal"""
+
+    def __init__(self, vector: np.ndarray):
+        self.vector = vector
+
+    def __conform__(self, protocol):
+        if protocol is ISQLQuote:
+            return self
+
+    def prepare(self, conn):
+        self._conn = conn
+
+    def getquoted(self) -> bytes:
+        if self.vector.ndim != 1 or self.vector.dtype.kind != "f":
+            # Not an embedding - keep psycopg2's default list rendering
+            fallback = adapt(self.vector.tolist())
+            if hasattr(fallback, "prepare") and getattr(self, "_conn", None) is not None:
+                fallback.prepare(self._conn)
+            return fallback.getquoted()
+        return ("'" + encode_vector(self.vector) + "'").encode("ascii")
+
+
+def register_vector_codec():
+    """Register the ndarray adapter (process-wide, idempotent)"""
+    global _registered
+    if not _registered:
+        register_adapter(np.ndarray, VectorAdapter)
+        _registered = True
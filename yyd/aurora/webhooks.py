@@ -6,6 +6,7 @@ from fastapi import APIRouter, Request, HTTPException, Query
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
 import os
+import asyncio
 import hmac
 import hashlib
 import httpx
@@ -28,6 +29,42 @@ WHATSAPP_API_URL = "https://graph.facebook.com/v18.0"
 FACEBOOK_ACCESS_TOKEN = os.getenv("FACEBOOK_PAGE_ACCESS_TOKEN", "")
 FACEBOOK_VERIFY_TOKEN = os.getenv("FACEBOOK_VERIFY_TOKEN", "aurora_verify_2024")
 
+
+class DeliveryError(Exception):
+    """
+    Channel API rejected an outbound message
+
+    job_queue retries it unless the API answered with a 4xx other than 429
+    (bad recipient, expired window, auth): those are dead-lettered at once.
+    """
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+    @property
+    def retryable(self) -> bool:
+        code = self.status_code
+        return code is None or code == 429 or not 400 <= code < 500
+
+
+async def queue_message(channel: str, to: str, text: str):
+    """
+    Hand a reply to the outbound_send queue (retried with backoff, dead-lettered)
+
+    Falls back to sending inline if the queue is unavailable.
+    """
+    from job_queue import job_queue
+    try:
+        await job_queue.enqueue_async("outbound_send", {"channel": channel, "to": to, "text": text})
+        return
+    except Exception as e:
+        print(f"⚠️ Outbound queue unavailable, sending inline: {e}")
+    try:
+        await SENDERS[channel](to, text)
+    except Exception as e:
+        print(f"❌ Error sending {channel} message: {str(e)}")
+
 # ============ Twilio WhatsApp Webhook (Sandbox) ============
 
 @router.post("/twilio/whatsapp")
@@ -70,7 +107,12 @@ async def process_twilio_whatsapp_message(from_number: str, text: str):
     try:
         from affective_mathematics import AffectiveAnalyzer
         from intelligence import aurora_intelligence
+        from memory import WorkingMemory
         from langdetect import detect, LangDetectException
+        from deadline import Deadline
+        import hashlib
+        
+        deadline = Deadline(name="twilio")
         
         # Auto-detect language from message
         language = "pt"  # Default to Portuguese
@@ -91,8 +133,15 @@ async def process_twilio_whatsapp_message(from_number: str, text: str):
             print(f"⚠️  Could not detect language, using default: {language}")
         
         # Analyze affective state
-        analyzer = AffectiveAnalyzer()
-        customer_state = analyzer.analyze_text(text, language)
+        with deadline.stage("affect"):
+            analyzer = AffectiveAnalyzer()
+            customer_state = analyzer.analyze_text(text, language)
+        
+        # Incremental emotional trajectory (session per sender)
+        session_id = hashlib.md5(f"twilio_{from_number}".encode()).hexdigest()
+        trajectory = await deadline.run("trajectory", asyncio.to_thread(
+            WorkingMemory.track_emotion, session_id, customer_state
+        ))
         
         # Generate intelligent response
         messages = [{"role": "user", "content": text}]
@@ -103,27 +152,34 @@ async def process_twilio_whatsapp_message(from_number: str, text: str):
                 {"name": "Sintra & Cascais Full Day", "price": 120, "duration": 8},
             ],
             "platform": "whatsapp",
-            "channel": "twilio_sandbox"
+            "channel": "twilio_sandbox",
+            "emotional_trajectory": trajectory
         }
         
-        response_data = aurora_intelligence.generate_response(
+        response_data = await deadline.run("generation", asyncio.to_thread(
+            aurora_intelligence.generate_response,
             messages=messages,
             language=language,
             customer_state=customer_state,
             context=context
-        )
+        ))
+        if response_data is None:
+            # Budget exhausted - send template instead of waiting on OpenAI
+            deadline.degrade("template")
+            response_data = {"message": aurora_intelligence._get_fallback_message(language)}
+        deadline.finish()
         
         # Send response back via Twilio
-        await send_twilio_whatsapp_message(from_number, response_data["message"])
+        await queue_message("twilio", from_number, response_data["message"])
         
         print(f"✅ Processed message with affective state: {customer_state.to_dict()}")
-        print(f"   Response sent: {response_data['message'][:100]}...")
+        print(f"   Response queued: {response_data['message'][:100]}...")
         
     except Exception as e:
         print(f"❌ Error processing Twilio message: {str(e)}")
         # Send fallback response
         fallback_msg = "Olá! Sou Aurora 🤖 Estou tendo problemas técnicos, mas logo estarei pronta para ajudá-lo!"
-        await send_twilio_whatsapp_message(from_number, fallback_msg)
+        await queue_message("twilio", from_number, fallback_msg)
 
 async def send_twilio_whatsapp_message(to_number: str, text: str):
     """Send WhatsApp message via Twilio API"""
@@ -131,30 +187,27 @@ async def send_twilio_whatsapp_message(to_number: str, text: str):
         print("⚠️  Twilio credentials not configured")
         return
     
-    try:
-        # Use Twilio REST API
-        url = f"https://api.twilio.com/2010-04-01/Accounts/{TWILIO_ACCOUNT_SID}/Messages.json"
-        
-        data = {
-            "From": TWILIO_WHATSAPP_NUMBER,
-            "To": to_number,
-            "Body": text
-        }
+    # Use Twilio REST API
+    url = f"https://api.twilio.com/2010-04-01/Accounts/{TWILIO_ACCOUNT_SID}/Messages.json"
+    
+    data = {
+        "From": TWILIO_WHATSAPP_NUMBER,
+        "To": to_number,
+        "Body": text
+    }
+    
+    async with httpx.AsyncClient() as client:
+        response = await client.post(
+            url,
+            data=data,
+            auth=(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+        )
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                url,
-                data=data,
-                auth=(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-            )
-            
-            if response.status_code in [200, 201]:
-                print(f"✅ Twilio WhatsApp message sent to {to_number}")
-            else:
-                print(f"❌ Twilio send failed: {response.status_code} - {response.text}")
-                
-    except Exception as e:
-        print(f"❌ Error sending Twilio message: {str(e)}")
+        if response.status_code in [200, 201]:
+            print(f"✅ Twilio WhatsApp message sent to {to_number}")
+        else:
+            raise DeliveryError(f"Twilio send failed: {response.status_code} - {response.text}",
+                                response.status_code)
 
 # ============ WhatsApp Webhook (Facebook Business API) ============
 
@@ -229,10 +282,13 @@ async def process_whatsapp_message(message: Dict[str, Any], value: Dict[str, Any
     try:
         from affective_mathematics import AffectiveAnalyzer
         from rag import decision_engine
-        from memory import MemoryManager
+        from memory import MemoryManager, WorkingMemory
         from langdetect import detect, LangDetectException
+        from deadline import Deadline, PERSISTENCE_MIN_BUDGET
         import uuid
         
+        deadline = Deadline(name="webhook")
+        
         # Auto-detect language
         language = "pt"
         try:
@@ -243,9 +299,10 @@ async def process_whatsapp_message(message: Dict[str, Any], value: Dict[str, Any
             pass
         
         # Analyze affective state
-        analyzer = AffectiveAnalyzer()
-        customer_state = analyzer.analyze_text(text, language)
-        emotional_dict = customer_state.to_dict()
+        with deadline.stage("affect"):
+            analyzer = AffectiveAnalyzer()
+            customer_state = analyzer.analyze_text(text, language)
+            emotional_dict = customer_state.to_dict()
         
         # Create persistent conversation ID based on channel + sender
         # This ensures all messages from same sender map to same conversation
@@ -253,22 +310,35 @@ async def process_whatsapp_message(message: Dict[str, Any], value: Dict[str, Any
         conversation_id = hashlib.md5(f"whatsapp_{from_number}".encode()).hexdigest()
         session_id = conversation_id
         
-        memory_manager = MemoryManager()
-        memory_manager.store_conversation_snapshot(
-            session_id=session_id,
-            conversation_id=conversation_id,
-            customer_id=from_number,
-            messages=[{"role": "user", "content": text}],
-            emotional_state=emotional_dict
-        )
+        # Incremental emotional trajectory for this conversation (WM)
+        trajectory = await deadline.run("trajectory", asyncio.to_thread(
+            WorkingMemory.track_emotion, session_id, customer_state
+        ))
+        
+        if deadline.has_budget(PERSISTENCE_MIN_BUDGET):
+            memory_manager = MemoryManager()
+            await deadline.run("memory", asyncio.to_thread(
+                memory_manager.store_conversation_snapshot,
+                session_id=session_id,
+                conversation_id=conversation_id,
+                customer_id=from_number,
+                new_messages=[{"role": "user", "content": text}],
+                emotional_state=emotional_dict,
+                trajectory=trajectory
+            ))
+        else:
+            memory_manager = None
+            deadline.degrade("skip_persistence")
         
         # Generate intelligent response using RAG
         response_data = await decision_engine.generate_response(
             query=text,
             emotional_state=emotional_dict,
-            conversation_context={"session_id": session_id, "conversation_id": conversation_id},
+            conversation_context={"session_id": session_id, "conversation_id": conversation_id,
+                                  "emotional_trajectory": trajectory},
             locale=language,
-            messages=[{"role": "user", "content": text}]
+            messages=[{"role": "user", "content": text}],
+            deadline=deadline
         )
         
         response_text = response_data['message']
@@ -279,26 +349,35 @@ async def process_whatsapp_message(message: Dict[str, Any], value: Dict[str, Any
         requires_handoff, handoff_reason = detect_handoff(
             user_message=text,
             emotional_state=emotional_dict,
-            response_confidence=response_data.get('confidence', 1.0)
+            response_confidence=response_data.get('confidence', 1.0),
+            trajectory=trajectory
         )
         
         # Create handoff record if needed
         if requires_handoff:
-            await create_handoff_record(
+            await deadline.run("handoff", create_handoff_record(
                 conversation_id=conversation_id,
                 lead_id=None,
                 reason=handoff_reason,
                 emotional_state=emotional_dict,
                 confidence=response_data.get('confidence', 1.0),
                 notes=f"WhatsApp auto-detected from {from_number}: {text[:100]}"
-            )
+            ), min_timeout=1.0)
+        
+        # WM: the reply completes the turn (if the user's turn was stored)
+        if memory_manager is not None:
+            await deadline.run("memory_reply", asyncio.to_thread(
+                memory_manager.store_reply, session_id, conversation_id, response_text
+            ), min_timeout=PERSISTENCE_MIN_BUDGET)
+        
+        deadline.finish()
         
     except Exception as e:
         print(f"❌ Error processing WhatsApp message with Aurora: {e}")
         response_text = "Olá! Sou Aurora 🤖 Estou tendo problemas técnicos temporários. Por favor, tente novamente em alguns momentos!"
     
     # Send response back to WhatsApp
-    await send_whatsapp_message(from_number, response_text)
+    await queue_message("whatsapp", from_number, response_text)
 
 async def send_whatsapp_message(to_number: str, text: str):
     """Send WhatsApp message via Facebook Graph API"""
@@ -323,7 +402,8 @@ async def send_whatsapp_message(to_number: str, text: str):
         if response.status_code == 200:
             print(f"✅ WhatsApp message sent to {to_number}")
         else:
-            print(f"❌ WhatsApp send failed: {response.text}")
+            raise DeliveryError(f"WhatsApp send failed: {response.status_code} - {response.text}",
+                                response.status_code)
 
 # ============ Facebook Messenger Webhook ============
 
@@ -375,10 +455,13 @@ async def process_facebook_message(event: Dict[str, Any]):
     try:
         from affective_mathematics import AffectiveAnalyzer
         from rag import decision_engine
-        from memory import MemoryManager
+        from memory import MemoryManager, WorkingMemory
         from langdetect import detect, LangDetectException
+        from deadline import Deadline, PERSISTENCE_MIN_BUDGET
         import uuid
         
+        deadline = Deadline(name="webhook")
+        
         # Auto-detect language
         language = "pt"
         try:
@@ -389,9 +472,10 @@ async def process_facebook_message(event: Dict[str, Any]):
             pass
         
         # Analyze affective state
-        analyzer = AffectiveAnalyzer()
-        customer_state = analyzer.analyze_text(text, language)
-        emotional_dict = customer_state.to_dict()
+        with deadline.stage("affect"):
+            analyzer = AffectiveAnalyzer()
+            customer_state = analyzer.analyze_text(text, language)
+            emotional_dict = customer_state.to_dict()
         
         # Create persistent conversation ID based on channel + sender  
         # This ensures all messages from same sender map to same conversation
@@ -399,22 +483,35 @@ async def process_facebook_message(event: Dict[str, Any]):
         conversation_id = hashlib.md5(f"facebook_{sender_id}".encode()).hexdigest()
         session_id = conversation_id
         
-        memory_manager = MemoryManager()
-        memory_manager.store_conversation_snapshot(
-            session_id=session_id,
-            conversation_id=conversation_id,
-            customer_id=sender_id,
-            messages=[{"role": "user", "content": text}],
-            emotional_state=emotional_dict
-        )
+        # Incremental emotional trajectory for this conversation (WM)
+        trajectory = await deadline.run("trajectory", asyncio.to_thread(
+            WorkingMemory.track_emotion, session_id, customer_state
+        ))
+        
+        if deadline.has_budget(PERSISTENCE_MIN_BUDGET):
+            memory_manager = MemoryManager()
+            await deadline.run("memory", asyncio.to_thread(
+                memory_manager.store_conversation_snapshot,
+                session_id=session_id,
+                conversation_id=conversation_id,
+                customer_id=sender_id,
+                new_messages=[{"role": "user", "content": text}],
+                emotional_state=emotional_dict,
+                trajectory=trajectory
+            ))
+        else:
+            memory_manager = None
+            deadline.degrade("skip_persistence")
         
         # Generate intelligent response using RAG
         response_data = await decision_engine.generate_response(
             query=text,
             emotional_state=emotional_dict,
-            conversation_context={"session_id": session_id, "conversation_id": conversation_id},
+            conversation_context={"session_id": session_id, "conversation_id": conversation_id,
+                                  "emotional_trajectory": trajectory},
             locale=language,
-            messages=[{"role": "user", "content": text}]
+            messages=[{"role": "user", "content": text}],
+            deadline=deadline
         )
         
         response_text = response_data['message']
@@ -425,26 +522,35 @@ async def process_facebook_message(event: Dict[str, Any]):
         requires_handoff, handoff_reason = detect_handoff(
             user_message=text,
             emotional_state=emotional_dict,
-            response_confidence=response_data.get('confidence', 1.0)
+            response_confidence=response_data.get('confidence', 1.0),
+            trajectory=trajectory
         )
         
         # Create handoff record if needed
         if requires_handoff:
-            await create_handoff_record(
+            await deadline.run("handoff", create_handoff_record(
                 conversation_id=conversation_id,
                 lead_id=None,
                 reason=handoff_reason,
                 emotional_state=emotional_dict,
                 confidence=response_data.get('confidence', 1.0),
                 notes=f"Facebook auto-detected from {sender_id}: {text[:100]}"
-            )
+            ), min_timeout=1.0)
+        
+        # WM: the reply completes the turn (if the user's turn was stored)
+        if memory_manager is not None:
+            await deadline.run("memory_reply", asyncio.to_thread(
+                memory_manager.store_reply, session_id, conversation_id, response_text
+            ), min_timeout=PERSISTENCE_MIN_BUDGET)
+        
+        deadline.finish()
         
     except Exception as e:
         print(f"❌ Error processing Facebook message with Aurora: {e}")
         response_text = "Olá! Sou Aurora 🤖 Estou tendo problemas técnicos temporários. Por favor, tente novamente!"
     
     # Send response
-    await send_facebook_message(sender_id, response_text)
+    await queue_message("facebook", sender_id, response_text)
 
 async def send_facebook_message(recipient_id: str, text: str):
     """Send Facebook Messenger message"""
@@ -466,4 +572,13 @@ async def send_facebook_message(recipient_id: str, text: str):
         if response.status_code == 200:
             print(f"✅ Facebook message sent to {recipient_id}")
         else:
-            print(f"❌ Facebook send failed: {response.text}")
+            raise DeliveryError(f"Facebook send failed: {response.status_code} - {response.text}",
+                                response.status_code)
+
+
+# Channel -> sender, used by queue_message and the outbound_send job handler
+SENDERS = {
+    "twilio": send_twilio_whatsapp_message,
+    "whatsapp": send_whatsapp_message,
+    "facebook": send_facebook_message,
+}